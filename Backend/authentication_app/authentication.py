@@ -1,6 +1,115 @@
+"""
+JWT authentication with the user and their profile resolved together.
+
+The user row is loaded with clinic_profile, doctor_profile (and its clinic)
+and patient_profile joined in, and that snapshot is kept in the cache for
+AUTH_USER_CACHE_TIMEOUT seconds, so steady traffic authenticates without a
+database hit.  signals.py drops the snapshot whenever the user or one of
+their profiles is saved or deleted (password changes and deletions
+included), and LogoutAPIView drops it explicitly.
+
+Invalidation only reaches other processes through a shared cache, so the
+snapshot is only cached when the default cache is shared (CACHE_URL); with
+the per-process LocMemCache a deleted, deactivated or demoted user would
+keep authenticating on other workers until the entry expired.
+AUTH_USER_CACHE = True / False overrides the detection.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+# the profile relation of each role, loaded together with the user
+PROFILE_RELATIONS = {
+    "Clinic": "clinic_profile",
+    "Doctor": "doctor_profile",
+    "Patient": "patient_profile",
+}
+
+USER_CACHE_KEY = "auth-user:{user_id}"
+USER_CACHE_TIMEOUT = getattr(settings, "AUTH_USER_CACHE_TIMEOUT", 300)
+
+# cache backends private to one process
+LOCAL_CACHE_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def shared_cache_enabled(setting_name):
+    """
+    Whether to cache data that signals invalidate: the `setting_name`
+    setting when set, otherwise only when the default cache is shared.
+    """
+    enabled = getattr(settings, setting_name, None)
+    if enabled is None:
+        return settings.CACHES["default"]["BACKEND"] not in LOCAL_CACHE_BACKENDS
+    return enabled
+
+
+def user_cache_enabled():
+    return shared_cache_enabled("AUTH_USER_CACHE")
+
+
+def invalidate_cached_users(user_ids):
+    """Drop cached user snapshots, now and again once the transaction commits."""
+    keys = [USER_CACHE_KEY.format(user_id=user_id) for user_id in user_ids]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    # a request running meanwhile may have cached the row as it was before
+    # this transaction, so clear it again when the change becomes visible
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def get_profile(user):
+    """The Clinic / Doctor / Patient row of a user's role, or None."""
+    relation = PROFILE_RELATIONS.get(getattr(user, "role", None))
+    return getattr(user, relation, None) if relation else None
+
+
+class ProfileJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that loads the user together with every profile in
+    one joined query, or from the cached snapshot.  request.user.clinic_profile
+    / doctor_profile (with its clinic) / patient_profile are then cached on the
+    user, so views read the caller's profile without another lookup; a
+    missing profile still raises the model's DoesNotExist.
+    """
+
+    def get_user(self, validated_token):
+        # same checks as JWTAuthentication.get_user, with the profiles joined in
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        use_cache = user_cache_enabled()
+        key = USER_CACHE_KEY.format(user_id=user_id)
+        user = cache.get(key) if use_cache else None
+        if user is None:
+            user = self.user_model.objects.select_related(
+                "clinic_profile", "doctor_profile__clinic", "patient_profile",
+            ).filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+            if user is None:
+                raise AuthenticationFailed("User not found", code="user_not_found")
+            if use_cache:
+                cache.set(key, user, USER_CACHE_TIMEOUT)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
+        return user
+
 
-class CookieJWTAuthentication(JWTAuthentication):
+class CookieJWTAuthentication(ProfileJWTAuthentication):
     def authenticate(self, request):
         # Try to get access token from "Authorization" header (default)
         header = self.get_header(request)
@@ -0,0 +1,20 @@
+from rest_framework import permissions
+
+from .authentication import PROFILE_RELATIONS, get_profile
+
+
+class HasRole(permissions.BasePermission):
+    """Authenticated users of one of `roles` that have their profile row."""
+    roles = ()
+
+    def has_permission(self, request, view):
+        user = request.user
+        if not (user.is_authenticated and user.role in self.roles):
+            return False
+        # the profile comes with the user from ProfileJWTAuthentication
+        return user.role not in PROFILE_RELATIONS or get_profile(user) is not None
+
+
+# Custom permission: Only Doctors and Clinics can access.
+class IsDoctorOrClinic(HasRole):
+    roles = ("Doctor", "Clinic")
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from superadmin_app.models import Clinic, Doctor, Patient, ProfileUser
+from .authentication import invalidate_cached_users
+
+
+# the cached user snapshot (authentication.py) holds the user and profiles:
+# drop it when any of them changes
+@receiver([post_save, post_delete], sender=ProfileUser)
+def user_changed(sender, instance, **kwargs):
+    invalidate_cached_users([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Doctor)
+@receiver([post_save, post_delete], sender=Patient)
+def profile_changed(sender, instance, **kwargs):
+    invalidate_cached_users([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=Clinic)
+def clinic_changed(sender, instance, **kwargs):
+    # the clinic is also cached with each of its doctors
+    doctor_users = Doctor.objects.filter(clinic_id=instance.pk).values_list("user_id", flat=True)
+    invalidate_cached_users([instance.user_id, *doctor_users])
@@ -1,3 +1,54 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
 
-# Create your tests here.
+from superadmin_app.models import Clinic, Doctor, ProfileUser
+
+
+# the tests run on LocMemCache; pretend it is shared so snapshots are cached
+@override_settings(AUTH_USER_CACHE=True)
+class ProfileJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clinic_user = ProfileUser.objects.create_user(email="clinic@example.com", password="x", role="Clinic")
+        clinic = Clinic.objects.create(
+            user=clinic_user, clinic_name="Clinic", license_number="L-1",
+            location="x", address="x", phone="1", email="clinic@example.com",
+        )
+        self.doctor_user = ProfileUser.objects.create_user(email="doctor@example.com", password="x", role="Doctor")
+        self.doctor = Doctor.objects.create(
+            user=self.doctor_user, doctor_name="Doctor", specialization="General", clinic=clinic,
+            phone="1", email="doctor@example.com", additional_qualification=[],
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.doctor_user).access_token}")
+
+    def get_profile(self):
+        response = self.client.get(reverse("get-doctor-profile"))
+        self.assertEqual(response.status_code, 200)
+        return response.json()["data"]
+
+    def test_profile_is_loaded_with_the_user(self):
+        # the user, doctor and clinic come back in the single authentication
+        # query, after which the cached snapshot needs none
+        with self.assertNumQueries(1):
+            self.get_profile()
+        with self.assertNumQueries(0):
+            self.get_profile()
+
+    def test_saving_the_profile_or_user_drops_the_snapshot(self):
+        self.get_profile()
+        self.doctor.doctor_name = "Renamed"
+        self.doctor.save()
+        self.assertEqual(self.get_profile()["doctor_name"], "Renamed")
+
+        self.doctor_user.delete()
+        self.assertEqual(self.client.get(reverse("get-doctor-profile")).status_code, 401)
+
+    @override_settings(AUTH_USER_CACHE=None)
+    def test_snapshot_is_not_cached_in_a_per_process_cache(self):
+        self.get_profile()
+        with self.assertNumQueries(1):
+            self.get_profile()
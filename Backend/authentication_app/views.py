@@ -8,6 +8,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from django.shortcuts import get_object_or_404
 from . serializers import *
 from superadmin_app.utils import send_otp_via_email, generate_otp
+from .authentication import invalidate_cached_users
 from rest_framework import status
 from  superadmin_app.models import ProfileUser
 from .serializers import SuperUserCreateSerializer  # Create a serializer for validation
@@ -263,6 +264,7 @@ class LogoutAPIView(APIView):
 
             token = RefreshToken(refresh_token)
             token.blacklist()   # ✅ Blacklist token
+            invalidate_cached_users([request.user.pk])
 
             return custom_200("Successfully logged out")
         except TokenError:
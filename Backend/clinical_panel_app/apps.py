@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ClinicalPanelAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'clinical_panel_app'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,381 @@
+"""
+Compiled doctor availability index.
+
+DoctorAvailability rows are stored the way the clinic enters them (weekday
+names in a JSON list, durations as free text).  Expanding those rows into
+slots on every request means re-parsing the same strings again and again,
+so each doctor's rules are compiled into plain integers and kept in the
+cache until the availability changes (see signals.py).  The invalidation
+only reaches other processes through a shared cache, so the index is only
+cached when the default cache is shared (CACHE_URL); with the per-process
+LocMemCache it is compiled per request from one query, and other workers
+never list slots from rules that were deleted or edited elsewhere.
+AVAILABILITY_INDEX_CACHE = True / False overrides the detection.
+
+Times are minutes from midnight, dates are ordinals and weekdays are a
+bitmask (bit 0 = Monday), so generating the slots of a day is integer
+arithmetic only.
+"""
+import calendar
+import heapq
+from collections import defaultdict, namedtuple
+from datetime import time, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from authentication_app.authentication import shared_cache_enabled
+
+from .models import (
+    AppointmentBooking, DoctorAvailability, DoctorBlockedSlot, DoctorUnavailableSlot, SlotHold,
+)
+
+
+INDEX_CACHE_KEY = "doctor-availability-index:{doctor_id}"
+
+# seconds a compiled index is kept; signals drop it earlier on every change
+INDEX_CACHE_TIMEOUT = getattr(settings, "AVAILABILITY_INDEX_CACHE_TIMEOUT", 300)
+
+# longest date range a single slot listing request may cover
+MAX_RANGE_DAYS = getattr(settings, "AVAILABILITY_MAX_RANGE_DAYS", 92)
+
+# bookings in these states no longer occupy their slot
+INACTIVE_BOOKING_STATUSES = ("Cancelled",)
+
+WEEKDAY_BITS = {name: 1 << number for number, name in enumerate(calendar.day_name)}
+ALL_DAYS = frozenset(calendar.day_name)
+DAY_NAMES_BY_LOWER = {name.lower(): name for name in calendar.day_name}
+
+# "HH:MM" for every minute of the day, so slots are never strftime'd
+MINUTE_LABELS = tuple(f"{m // 60:02d}:{m % 60:02d}" for m in range(24 * 60 + 1))
+
+
+# one compiled DoctorAvailability row
+# breaks are (start, end) in half minutes, because the break starts at the
+# midpoint of the window which is not always a whole minute
+AvailabilityRule = namedtuple(
+    "AvailabilityRule",
+    ["availability_id", "start_date", "end_date", "weekdays",
+     "start", "end", "slot_minutes", "breaks"],
+)
+
+
+class InvalidSlotDuration(ValueError):
+    """Raised when a matching availability has no usable slot_duration."""
+
+
+def parse_minutes(value):
+    """Pull the integer minutes out of values like '15', '15m' or 15."""
+    digits = "".join(c for c in str(value) if c.isdigit())
+    return int(digits) if digits else None
+
+
+def normalize_days(value):
+    """
+    Weekday names of a day_of_week value (list, or comma separated string),
+    matched case-insensitively.  Empty or unrecognised values mean every day.
+    """
+    if not value:
+        return ALL_DAYS
+    if isinstance(value, str):
+        items = value.split(",")
+    elif isinstance(value, (list, tuple, set)):
+        items = [str(item) for item in value if item is not None]
+    else:
+        return ALL_DAYS
+
+    days = {DAY_NAMES_BY_LOWER.get(item.strip().lower()) for item in items}
+    days.discard(None)
+    return frozenset(days) or ALL_DAYS
+
+
+def overlapping_availabilities(doctor, days, start_time, end_time, start_date, end_date, exclude_pk=None):
+    """
+    Existing availabilities of a doctor overlapping the given one in
+    weekdays, date range and time range.
+
+    Missing dates are open ended and a missing end time means end of day.
+    Date and time ranges are filtered in SQL, so only real candidates are
+    loaded; the weekday lists are then compared in Python.
+    """
+    candidates = DoctorAvailability.objects.filter(doctor=doctor)
+    if exclude_pk:
+        candidates = candidates.exclude(pk=exclude_pk)
+    if end_date:
+        candidates = candidates.filter(Q(start_date__isnull=True) | Q(start_date__lte=end_date))
+    if start_date:
+        candidates = candidates.filter(Q(end_date__isnull=True) | Q(end_date__gte=start_date))
+    candidates = candidates.filter(start_time__lt=end_time or time(23, 59, 59))
+    candidates = candidates.filter(Q(end_time__isnull=True) | Q(end_time__gt=start_time))
+
+    return [
+        availability for availability in candidates.order_by("id")
+        if not days.isdisjoint(normalize_days(availability.day_of_week))
+    ]
+
+
+def availabilities_overlap(first, second):
+    """
+    Whether two validated availability dicts overlap, with the same rules as
+    overlapping_availabilities (for rules that are not saved yet).
+    """
+    if first.get("start_date") and second.get("end_date") and first["start_date"] > second["end_date"]:
+        return False
+    if second.get("start_date") and first.get("end_date") and second["start_date"] > first["end_date"]:
+        return False
+    if first["start_time"] >= (second.get("end_time") or time(23, 59, 59)):
+        return False
+    if second["start_time"] >= (first.get("end_time") or time(23, 59, 59)):
+        return False
+    return not normalize_days(first.get("day_of_week")).isdisjoint(normalize_days(second.get("day_of_week")))
+
+
+def to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def compile_availability(availability):
+    """Turn a DoctorAvailability row into an AvailabilityRule (or None)."""
+    # rows without a start date are never matched by the date filter
+    if availability.start_date is None or availability.end_time is None:
+        return None
+
+    days = availability.day_of_week or []
+    weekdays = 0
+    for name, bit in WEEKDAY_BITS.items():
+        if name in days:
+            weekdays |= bit
+
+    start = to_minutes(availability.start_time)
+    end = to_minutes(availability.end_time)
+
+    slot_minutes = parse_minutes(availability.slot_duration)
+    if not slot_minutes:
+        slot_minutes = None
+
+    breaks = ()
+    if availability.break_duration:
+        break_minutes = parse_minutes(availability.break_duration)
+        if break_minutes is not None:
+            mid_point = start + end  # doubled: midpoint in half minutes
+            breaks = ((mid_point, mid_point + 2 * break_minutes),)
+
+    return AvailabilityRule(
+        availability_id=availability.id,
+        start_date=availability.start_date.toordinal(),
+        end_date=availability.end_date.toordinal() if availability.end_date else None,
+        weekdays=weekdays,
+        start=start,
+        end=end,
+        slot_minutes=slot_minutes,
+        breaks=breaks,
+    )
+
+
+def build_availability_index(doctor_id):
+    rules = []
+    for availability in DoctorAvailability.objects.filter(doctor_id=doctor_id).order_by("id"):
+        rule = compile_availability(availability)
+        if rule is not None:
+            rules.append(rule)
+    return tuple(rules)
+
+
+def index_cache_enabled():
+    return shared_cache_enabled("AVAILABILITY_INDEX_CACHE")
+
+
+def get_availability_index(doctor_id):
+    """Compiled rules for a doctor, built on first use and then cached."""
+    if not index_cache_enabled():
+        return build_availability_index(doctor_id)
+    key = INDEX_CACHE_KEY.format(doctor_id=doctor_id)
+    rules = cache.get(key)
+    if rules is None:
+        rules = build_availability_index(doctor_id)
+        cache.set(key, rules, INDEX_CACHE_TIMEOUT)
+    return rules
+
+
+def get_availability_indexes(doctor_ids):
+    """Compiled rules for several doctors with one cache round trip."""
+    keys = {doctor_id: INDEX_CACHE_KEY.format(doctor_id=doctor_id) for doctor_id in doctor_ids}
+    cached = cache.get_many(keys.values()) if index_cache_enabled() else {}
+    indexes = {doctor_id: cached[key] for doctor_id, key in keys.items() if key in cached}
+
+    missing = [doctor_id for doctor_id in doctor_ids if doctor_id not in indexes]
+    if missing:
+        rules_by_doctor = defaultdict(list)
+        for availability in DoctorAvailability.objects.filter(doctor_id__in=missing).order_by("id"):
+            rule = compile_availability(availability)
+            if rule is not None:
+                rules_by_doctor[availability.doctor_id].append(rule)
+        built = {doctor_id: tuple(rules_by_doctor[doctor_id]) for doctor_id in missing}
+        if index_cache_enabled():
+            cache.set_many({keys[doctor_id]: rules for doctor_id, rules in built.items()}, INDEX_CACHE_TIMEOUT)
+        indexes.update(built)
+    return indexes
+
+
+def invalidate_availability_index(doctor_id):
+    cache.delete(INDEX_CACHE_KEY.format(doctor_id=doctor_id))
+
+
+def rules_for_date(rules, day):
+    """Rules that apply on the given date."""
+    ordinal = day.toordinal()
+    bit = 1 << day.weekday()
+    return [
+        rule for rule in rules
+        if rule.weekdays & bit
+        and rule.start_date <= ordinal
+        and (rule.end_date is None or ordinal <= rule.end_date)
+    ]
+
+
+def expand_rule(rule):
+    """(start, end) minute pairs of every slot a rule produces."""
+    if rule.slot_minutes is None:
+        raise InvalidSlotDuration(rule.availability_id)
+
+    step = rule.slot_minutes
+    slots = []
+    for slot_start in range(rule.start, rule.end - step + 1, step):
+        slot_end = slot_start + step
+        # compare in half minutes against the break window
+        if any(2 * slot_start < b_end and 2 * slot_end > b_start for b_start, b_end in rule.breaks):
+            continue
+        slots.append((slot_start, slot_end))
+    return slots
+
+
+def format_slot(slot_start, slot_end):
+    return {"slot_start": MINUTE_LABELS[slot_start], "slot_end": MINUTE_LABELS[slot_end]}
+
+
+def expand_day(rules, day):
+    """Sorted (start, end) minute pairs of every slot offered on a date."""
+    slots = []
+    for rule in rules_for_date(rules, day):
+        slots.extend(expand_rule(rule))
+    slots.sort()
+    return slots
+
+
+def date_range(start_date, end_date):
+    day = start_date
+    while day <= end_date:
+        yield day
+        day += timedelta(days=1)
+
+
+def load_busy_intervals(doctor_ids, start_date, end_date, viewer=None):
+    """
+    Busy (start, end) minute pairs keyed by (doctor_id, date).
+
+    Deleted slots, blocked slots, active bookings and unexpired holds of
+    every given doctor over the whole range are read with one query per
+    source.  Holds placed by `viewer` are not treated as busy, so users
+    still see the slot they are holding.
+    """
+    holds = SlotHold.objects.filter(
+        doctor_id__in=doctor_ids, date__range=(start_date, end_date), expires_at__gt=timezone.now(),
+    )
+    if viewer is not None:
+        holds = holds.exclude(held_by=viewer)
+
+    sources = (
+        DoctorUnavailableSlot.objects.filter(
+            doctor_id__in=doctor_ids, date__range=(start_date, end_date),
+        ).values_list("doctor_id", "date", "slot_start", "slot_end"),
+        DoctorBlockedSlot.objects.filter(
+            doctor_id__in=doctor_ids, date__range=(start_date, end_date), is_blocked=True,
+        ).values_list("doctor_id", "date", "slot_start", "slot_end"),
+        AppointmentBooking.objects.filter(
+            doctor_id__in=doctor_ids, appointment_date__range=(start_date, end_date),
+        ).exclude(
+            status__in=INACTIVE_BOOKING_STATUSES,
+        ).values_list("doctor_id", "appointment_date", "start_time", "end_time"),
+        holds.values_list("doctor_id", "date", "slot_start", "slot_end"),
+    )
+
+    busy = defaultdict(list)
+    for rows in sources:
+        for doctor_id, day, start, end in rows:
+            busy[(doctor_id, day)].append((to_minutes(start), to_minutes(end)))
+    return busy
+
+
+def merge_intervals(intervals):
+    """Sort and merge (start, end) pairs into disjoint intervals."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def subtract_busy(slots, busy):
+    """
+    Drop every slot that overlaps a busy interval.
+
+    Slots must be sorted by start.  Busy intervals are merged first, so a
+    single forward sweep over both lists is enough.
+    """
+    if not busy:
+        return slots
+
+    busy = merge_intervals(busy)
+    free = []
+    index = 0
+    for slot_start, slot_end in slots:
+        # intervals ending before this slot can't touch any later slot either
+        while index < len(busy) and busy[index][1] <= slot_start:
+            index += 1
+        if index < len(busy) and busy[index][0] < slot_end:
+            continue
+        free.append((slot_start, slot_end))
+    return free
+
+
+def iter_free_slots(doctor_id, rules, first_day, last_day, busy, not_before=None):
+    """
+    Lazily yield (date, start, end, doctor_id) for a doctor's free slots in
+    chronological order.  Rules with a broken slot_duration are skipped.
+    not_before is a (date, minute) pair; earlier slots are left out.
+    """
+    for day in date_range(first_day, last_day):
+        if not_before and day < not_before[0]:
+            continue
+        slots = []
+        for rule in rules_for_date(rules, day):
+            try:
+                slots.extend(expand_rule(rule))
+            except InvalidSlotDuration:
+                continue
+        slots.sort()
+        for slot_start, slot_end in subtract_busy(slots, busy.get((doctor_id, day))):
+            if not_before and day == not_before[0] and slot_start < not_before[1]:
+                continue
+            yield day, slot_start, slot_end, doctor_id
+
+
+def earliest_free_slots(doctor_ids, first_day, last_day, limit, not_before=None, viewer=None):
+    """
+    The `limit` earliest free slots across several doctors.
+
+    Each doctor's slots are a sorted stream, so a heap merge only expands
+    as many days per doctor as it needs to fill the result.
+    """
+    indexes = get_availability_indexes(doctor_ids)
+    busy = load_busy_intervals(doctor_ids, first_day, last_day, viewer)
+    streams = [
+        iter_free_slots(doctor_id, indexes[doctor_id], first_day, last_day, busy, not_before)
+        for doctor_id in doctor_ids
+    ]
+    return list(islice(heapq.merge(*streams), limit))
@@ -0,0 +1,167 @@
+"""
+In-process endpoint benchmarks.
+
+run_benchmarks() drives the hot endpoints (slot listing, booking,
+dashboards, searches and list views) through the DRF test client against
+whatever data is in the database, normally the synthetic set from
+`manage.py generate_synthetic_data`, and reports per endpoint the p50 / p95
+/ p99 latency and the query counts.  Requests authenticate with real JWTs,
+so authentication is part of the measurement.
+
+Writes (booking) run in a transaction that is rolled back after every
+request, so a run never changes the data and runs stay comparable.  The
+report is plain JSON with sorted keys: save one per commit and diff them.
+"""
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from superadmin_app.models import Clinic, Patient
+from .models import AppointmentBooking
+from .synthetic import SYNTHETIC_EMAIL_DOMAIN, slot_times
+
+
+class NoBenchmarkData(Exception):
+    """The database has no clinic with doctors and booked patients to benchmark."""
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def next_weekday(day):
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+
+def pick_fixtures():
+    """A clinic (synthetic ones first), one of its doctors and one of that doctor's patients."""
+    clinics = Clinic.objects.filter(doctors__isnull=False).distinct().order_by("id")
+    clinic = (
+        clinics.filter(user__email__endswith=f"@{SYNTHETIC_EMAIL_DOMAIN}").first() or clinics.first()
+    )
+    if clinic is None:
+        raise NoBenchmarkData("No clinic with doctors; run generate_synthetic_data first")
+    doctor = clinic.doctors.order_by("id").first()
+    booking = AppointmentBooking.objects.filter(doctor=doctor).order_by("id").first()
+    if booking is None:
+        raise NoBenchmarkData(f"Doctor {doctor.id} has no bookings; run generate_synthetic_data first")
+    patient = Patient.objects.select_related("user").get(pk=booking.patient_id)
+    return clinic, doctor, patient
+
+
+def scenarios(clinic, doctor, patient):
+    """(name, role, method, url, payload) of every benchmarked request."""
+    today = timezone.localdate()
+    day = next_weekday(today + timedelta(days=7))
+    week_end = day + timedelta(days=6)
+    # past the synthetic bookings, so the slot is free on every (rolled back) run
+    booking_day = next_weekday(today + timedelta(days=60))
+    start, end = slot_times(0)
+    search_term = patient.full_name.split()[0][:4]
+
+    return [
+        ("booking.create", "Patient", "post", reverse("appointment-booking"), {
+            "doctor": doctor.id, "appointment_date": booking_day.isoformat(),
+            "start_time": start.strftime("%H:%M"), "end_time": end.strftime("%H:%M"),
+            "reason_for_visit": "Benchmark",
+        }),
+        ("dashboard.clinic", "Clinic", "get", reverse("dashboard-counts"), None),
+        ("dashboard.doctor", "Doctor", "get", reverse("dashboard-doctor-stats"), None),
+        ("list.clinic_appointments", "Clinic", "get", reverse("list-all-appointments-clinic"), None),
+        ("list.clinic_doctors", "Clinic", "get", reverse("list-all-doctors"), None),
+        ("list.clinic_patients", "Clinic", "get", reverse("list-all-patients"), None),
+        ("list.doctor_appointments", "Doctor", "get", reverse("list-doctor-appointments"), None),
+        ("list.medical_reports", "Clinic", "get", reverse("add-medical-reports"), None),
+        ("list.patient_appointments", "Patient", "get", reverse("list-patient-appointments"), None),
+        ("list.appointments_by_specialization", "Clinic", "get",
+         reverse("list-appointments-by-specialization", args=[doctor.specialization]), None),
+        ("search.doctors", "Clinic", "get", reverse("search-doctors"), {"q": doctor.specialization[:6]}),
+        ("search.patients", "Doctor", "get", reverse("patients-search"), {"query": search_term}),
+        ("slots.day", "Clinic", "get", reverse("list-doctor-availability", args=[doctor.id, day.isoformat()]), None),
+        ("slots.earliest", "Clinic", "get", reverse("search-earliest-slots"), {"specialization": doctor.specialization}),
+        ("slots.range", "Clinic", "get",
+         reverse("list-doctor-availability-range", args=[doctor.id, day.isoformat(), week_end.isoformat()]), None),
+    ]
+
+
+def timed_request(client, method, url, payload):
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        if method == "get":
+            response = client.get(url, payload)
+        else:
+            response = getattr(client, method)(url, payload, format="json")
+        elapsed = time.perf_counter() - started
+    return response.status_code, elapsed, len(queries.captured_queries)
+
+
+def run_scenario(client, method, url, payload, repeat, warmup):
+    timings, query_counts, statuses = [], [], set()
+    for run in range(warmup + repeat):
+        if method == "get":
+            status, elapsed, queries = timed_request(client, method, url, payload)
+        else:
+            try:
+                with transaction.atomic():
+                    status, elapsed, queries = timed_request(client, method, url, payload)
+                    raise Rollback()
+            except Rollback:
+                pass
+        if run >= warmup:
+            timings.append(elapsed * 1000)
+            query_counts.append(queries)
+            statuses.add(status)
+
+    return {
+        "p50_ms": round(percentile(timings, 0.50), 2),
+        "p95_ms": round(percentile(timings, 0.95), 2),
+        "p99_ms": round(percentile(timings, 0.99), 2),
+        "mean_ms": round(statistics.fmean(timings), 2),
+        "queries": max(query_counts),
+        "queries_min": min(query_counts),
+        "status": sorted(statuses),
+    }
+
+
+def run_benchmarks(repeat=30, warmup=3, only=None):
+    """Benchmark every scenario (or those whose name starts with one of `only`)."""
+    clinic, doctor, patient = pick_fixtures()
+    users = {"Clinic": clinic.user, "Doctor": doctor.user, "Patient": patient.user}
+    clients = {}
+    for role, user in users.items():
+        clients[role] = APIClient()
+        clients[role].credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+
+    results = {}
+    # the test client talks to "testserver"; emails only reach the outbox
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+        for name, role, method, url, payload in scenarios(clinic, doctor, patient):
+            if only and not name.startswith(tuple(only)):
+                continue
+            results[name] = run_scenario(clients[role], method, url, payload, repeat, warmup)
+
+    return {
+        "data": {
+            "appointments": AppointmentBooking.objects.count(),
+            "clinic_doctors": clinic.doctors.count(),
+            "patients": Patient.objects.count(),
+        },
+        "repeat": repeat,
+        "results": results,
+    }
@@ -0,0 +1,180 @@
+"""
+Race-free appointment booking.
+
+Checking for an overlapping appointment and inserting the new one are two
+statements, so two requests for the same slot can both pass the check.
+Every booking therefore runs inside a transaction that first locks the
+DoctorDayLock row of its doctor and date (SELECT ... FOR UPDATE).  Bookings
+for the same doctor and day queue behind each other, everything else runs
+in parallel.  The partial unique constraint on AppointmentBooking catches
+whatever slips past on backends without row locks.
+
+That constraint only stops two active bookings starting at the same time.
+On PostgreSQL, ensure_booking_overlap_constraint() (run after migrate, see
+signals.py) adds an exclusion constraint on the booked time range, so no
+writer can store overlapping bookings, not even the ones that bypass
+book_appointment (admin, bulk_create).  On other backends
+book_appointment is the only writer that prevents overlaps.
+
+Slot holds take the same lock, so a slot is either booked, held by one
+user until its hold expires, or free.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connections, transaction
+from django.utils import timezone
+
+from .availability import INACTIVE_BOOKING_STATUSES
+from .models import AppointmentBooking, DoctorDayLock, SlotHold
+
+
+# how long a slot stays reserved for the user who picked it
+SLOT_HOLD_TTL = timedelta(seconds=getattr(settings, "SLOT_HOLD_TTL_SECONDS", 600))
+
+BOOKING_OVERLAP_CONSTRAINT = "no_overlapping_active_appointments"
+
+logger = logging.getLogger(__name__)
+
+
+class SlotUnavailable(Exception):
+    """The requested time overlaps an active appointment or someone else's hold."""
+
+
+def overlapping_appointments(doctor, date, start, end, exclude_pk=None):
+    overlapping = AppointmentBooking.objects.filter(
+        doctor=doctor,
+        appointment_date=date,
+        start_time__lt=end,
+        end_time__gt=start
+    ).exclude(status__in=INACTIVE_BOOKING_STATUSES)
+    if exclude_pk:
+        overlapping = overlapping.exclude(pk=exclude_pk)
+    return overlapping
+
+
+def active_holds(doctor, date, start, end, exclude_user=None):
+    holds = SlotHold.objects.filter(
+        doctor=doctor,
+        date=date,
+        slot_start__lt=end,
+        slot_end__gt=start,
+        expires_at__gt=timezone.now(),
+    )
+    if exclude_user is not None:
+        holds = holds.exclude(held_by=exclude_user)
+    return holds
+
+
+def lock_doctor_day(doctor, date):
+    """Take the row lock serialising bookings of a doctor on a date."""
+    lock, _ = DoctorDayLock.objects.get_or_create(doctor=doctor, date=date)
+    return DoctorDayLock.objects.select_for_update().get(pk=lock.pk)
+
+
+def book_appointment(serializer, **save_kwargs):
+    """
+    Save a validated appointment serializer without double booking.
+
+    Raises SlotUnavailable when the slot was taken in the meantime.
+    """
+    data = {**serializer.validated_data, **save_kwargs}
+    doctor = data["doctor"]
+    date = data["appointment_date"]
+    start, end = data["start_time"], data["end_time"]
+    request = serializer.context.get("request")
+    user = request.user if request else None
+
+    with transaction.atomic():
+        lock_doctor_day(doctor, date)
+
+        if overlapping_appointments(doctor, date, start, end).exists():
+            raise SlotUnavailable()
+        if active_holds(doctor, date, start, end, exclude_user=user).exists():
+            raise SlotUnavailable()
+
+        try:
+            with transaction.atomic():
+                appointment = serializer.save(**save_kwargs)
+        except IntegrityError:
+            # only the slot constraint means someone else got there first
+            if overlapping_appointments(doctor, date, start, end).exists():
+                raise SlotUnavailable()
+            raise
+
+        # the booking consumes the user's own hold on this slot
+        if user is not None:
+            SlotHold.objects.filter(
+                doctor=doctor, date=date, held_by=user,
+                slot_start__lt=end, slot_end__gt=start,
+            ).delete()
+        return appointment
+
+
+def hold_slot(user, doctor, date, start, end):
+    """
+    Reserve a slot for `user` for SLOT_HOLD_TTL.
+
+    A user keeps at most one hold per doctor: picking another slot releases
+    the previous one.  Raises SlotUnavailable when the slot is booked or
+    held by someone else.
+    """
+    with transaction.atomic():
+        lock_doctor_day(doctor, date)
+
+        if overlapping_appointments(doctor, date, start, end).exists():
+            raise SlotUnavailable()
+        if active_holds(doctor, date, start, end, exclude_user=user).exists():
+            raise SlotUnavailable()
+
+        SlotHold.objects.filter(doctor=doctor, held_by=user).delete()
+        return SlotHold.objects.create(
+            doctor=doctor,
+            held_by=user,
+            date=date,
+            slot_start=start,
+            slot_end=end,
+            expires_at=timezone.now() + SLOT_HOLD_TTL,
+        )
+
+
+def sweep_expired_holds(now=None):
+    """Delete every expired hold in one statement; returns how many."""
+    deleted, _ = SlotHold.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
+
+
+def ensure_booking_overlap_constraint(using="default"):
+    """
+    Exclude overlapping active bookings of a doctor in the database, on
+    PostgreSQL only; returns whether the constraint was created.
+
+    Needs the btree_gist extension (for the doctor equality in the GiST
+    index).  When it can't be installed, or existing rows already overlap,
+    the constraint is left out with a warning and the unique constraint
+    remains the only backstop.
+    """
+    database = connections[using]
+    if database.vendor != "postgresql":
+        return False
+    table = AppointmentBooking._meta.db_table
+    with database.cursor() as cursor:
+        if BOOKING_OVERLAP_CONSTRAINT in database.introspection.get_constraints(cursor, table):
+            return False
+
+    quote = database.ops.quote_name
+    inactive = ", ".join(f"'{status}'" for status in INACTIVE_BOOKING_STATUSES)
+    try:
+        with transaction.atomic(using=using), database.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+            cursor.execute(
+                f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(BOOKING_OVERLAP_CONSTRAINT)} EXCLUDE USING gist ("
+                f"doctor_id WITH =, "
+                f"tsrange(appointment_date + start_time, appointment_date + end_time) WITH &&"
+                f") WHERE (status NOT IN ({inactive}))"
+            )
+    except DatabaseError as error:
+        logger.warning("Booking overlap constraint not created: %s", error)
+        return False
+    return True
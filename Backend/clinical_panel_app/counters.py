@@ -0,0 +1,140 @@
+"""
+Incrementally maintained dashboard counters.
+
+Every AppointmentBooking counts once towards the appointment counters of its
+doctor and its clinic, both on its day and on the lifetime row (date NULL),
+and once towards the counter of its status.  Signals apply the difference
+whenever a booking is created, moves, changes status or is deleted, inside
+one transaction, so dashboards read two rows instead of counting history.
+
+Bulk .update() / .delete() / bulk_create() calls bypass signals: run
+`manage.py rebuild_dashboard_counters` after them.  The initial backfill
+happens on `migrate`: while no counter row exists yet but bookings do, the
+counters are rebuilt once (see backfill_counters).
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .models import AppointmentBooking, ClinicDailyStats, DoctorDailyStats
+
+
+# statuses with their own counter column
+STATUS_COUNTERS = {
+    "Completed": "completed",
+    "Waiting List": "waiting_list",
+    "No-Show": "no_show",
+}
+
+# the fields of a booking the counters depend on
+BookingSnapshot = namedtuple("BookingSnapshot", ["pk", "doctor_id", "clinic_id", "patient_id", "date", "status"])
+
+
+def snapshot(booking):
+    return BookingSnapshot(
+        booking.pk, booking.doctor_id, booking.doctor.clinic_id,
+        booking.patient_id, booking.appointment_date, booking.status,
+    )
+
+
+def stored_snapshot(pk):
+    """Snapshot of a booking as it currently is in the database (or None)."""
+    row = AppointmentBooking.objects.filter(pk=pk).values_list(
+        "pk", "doctor_id", "doctor__clinic_id", "patient_id", "appointment_date", "status",
+    ).first()
+    return BookingSnapshot(*row) if row else None
+
+
+def bump(model, owner_field, owner_id, date, deltas, create=True):
+    rows = model.objects.filter(**{owner_field: owner_id, "date": date})
+    if create:
+        row, _ = model.objects.get_or_create(**{owner_field: owner_id, "date": date})
+        rows = model.objects.filter(pk=row.pk)
+    rows.update(**{field: F(field) + delta for field, delta in deltas.items()})
+
+
+def apply_booking(booking, sign):
+    """Add (sign=1) or remove (sign=-1) one booking snapshot from the counters."""
+    deltas = {"appointments": sign}
+    if booking.status in STATUS_COUNTERS:
+        deltas[STATUS_COUNTERS[booking.status]] = sign
+
+    scopes = (
+        (DoctorDailyStats, "doctor_id", booking.doctor_id, Q(doctor_id=booking.doctor_id)),
+        (ClinicDailyStats, "clinic_id", booking.clinic_id, Q(doctor__clinic_id=booking.clinic_id)),
+    )
+    # removing never creates rows: when a doctor or clinic is deleted its
+    # counter rows may already be gone while its bookings cascade
+    create = sign > 0
+    for model, owner_field, owner_id, scope in scopes:
+        bump(model, owner_field, owner_id, booking.date, deltas, create)
+
+        # the patient is new (or gone) for this doctor / clinic when no other
+        # booking links them
+        lifetime = dict(deltas)
+        others = AppointmentBooking.objects.filter(scope, patient_id=booking.patient_id).exclude(pk=booking.pk)
+        if not others.exists():
+            lifetime["patients"] = sign
+        bump(model, owner_field, owner_id, None, lifetime, create)
+
+
+def booking_changed(previous, current):
+    """Move the counters from one snapshot of a booking to another (either may be None)."""
+    if previous == current:
+        return
+    with transaction.atomic():
+        if previous is not None:
+            apply_booking(previous, -1)
+        if current is not None:
+            apply_booking(current, 1)
+
+
+def read_counters(model, owner_field, owner_id, date):
+    """(lifetime, daily) counter rows; missing rows read as zero."""
+    rows = {
+        row.date: row
+        for row in model.objects.filter(Q(date=date) | Q(date__isnull=True), **{owner_field: owner_id})
+    }
+    lifetime = rows.get(None) or model(**{owner_field: owner_id})
+    daily = rows.get(date) or model(**{owner_field: owner_id, "date": date})
+    return lifetime, daily
+
+
+def count_bookings(model, owner_field, lookup, by_date):
+    """Counter rows of one model computed with a grouped aggregate."""
+    group = (lookup, "appointment_date") if by_date else (lookup,)
+    counts = {"appointments": Count("id")}
+    for status, field in STATUS_COUNTERS.items():
+        counts[field] = Count("id", filter=Q(status=status))
+    if not by_date:
+        # distinct patients are only kept on the lifetime row
+        counts["patients"] = Count("patient", distinct=True)
+
+    rows = []
+    for values in AppointmentBooking.objects.order_by().values(*group).annotate(**counts):
+        owner_id = values.pop(lookup)
+        date = values.pop("appointment_date", None)
+        rows.append(model(**{owner_field: owner_id, "date": date}, **values))
+    return rows
+
+
+def rebuild_counters():
+    """Recompute every counter row from AppointmentBooking; returns the row count."""
+    created = 0
+    with transaction.atomic():
+        for model, owner_field, lookup in (
+            (DoctorDailyStats, "doctor_id", "doctor_id"),
+            (ClinicDailyStats, "clinic_id", "doctor__clinic_id"),
+        ):
+            model.objects.all().delete()
+            for by_date in (False, True):
+                created += len(model.objects.bulk_create(count_bookings(model, owner_field, lookup, by_date)))
+    return created
+
+
+def backfill_counters():
+    """Build the counters when bookings exist but no counter row does yet; returns the row count."""
+    if DoctorDailyStats.objects.exists() or not AppointmentBooking.objects.exists():
+        return 0
+    return rebuild_counters()
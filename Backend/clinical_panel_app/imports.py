@@ -0,0 +1,354 @@
+"""
+Bulk patient import from CSV, NDJSON or JSON files, and bulk doctor
+onboarding.
+
+Patient rows are read lazily and handled in chunks of IMPORT_CHUNK_SIZE.
+For each chunk:
+
+* every row is validated with the registration serializer, except for the
+  "email already taken" check, which is one email__in query for the chunk
+  (plus a set of the emails already seen earlier in the same file);
+* passwords are generated and hashed in a process pool, since PBKDF2 is
+  what makes one-at-a-time registration slow;
+* users, patients and the credential emails (through the outbox) are
+  inserted with bulk_create in one transaction.
+
+Invalid and duplicate rows are skipped and reported with their row number;
+the valid rows of the file are imported.  Doctor onboarding (onboard_doctors)
+works the same way on one request body: doctors, users and availability
+rules of the whole batch are created in a single transaction.
+"""
+import csv
+import io
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import BaseUserManager
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from superadmin_app.models import Doctor, Patient, ProfileUser, index_patient_names
+from superadmin_app.outbox import queue_emails
+from superadmin_app.search import get_doctor_search
+from superadmin_app.utils import doctor_credentials_email, generate_random_password
+from .availability import availabilities_overlap
+from .models import DoctorAvailability
+from .serializers import DoctorAvailabilitySerializer, DoctorRegisterSerializer, PatientRegisterSerializer
+
+
+IMPORT_CHUNK_SIZE = getattr(settings, "IMPORT_CHUNK_SIZE", 500)
+# processes hashing passwords; 1 hashes in the calling process
+IMPORT_HASH_WORKERS = getattr(settings, "IMPORT_HASH_WORKERS", os.cpu_count() or 1)
+# processes an import started from an HTTP request may use: a web worker
+# shouldn't fork a pool per upload (the management command uses the above)
+IMPORT_REQUEST_HASH_WORKERS = getattr(settings, "IMPORT_REQUEST_HASH_WORKERS", 1)
+# errors listed in the import summary (all are counted)
+IMPORT_MAX_ERRORS = getattr(settings, "IMPORT_MAX_ERRORS", 200)
+
+IMPORT_FORMATS = ("csv", "ndjson", "json")
+
+# doctors a single onboarding request may carry
+DOCTOR_ONBOARDING_MAX_BATCH = getattr(settings, "DOCTOR_ONBOARDING_MAX_BATCH", 500)
+
+
+class ImportFormatError(ValueError):
+    """The file can't be read in the requested format."""
+
+
+def guess_format(name):
+    extension = os.path.splitext(name or "")[1].lstrip(".").lower()
+    return extension if extension in IMPORT_FORMATS else None
+
+
+def read_records(binary_file, import_format):
+    """Yield the rows of an uploaded / opened binary file as dicts."""
+    if import_format not in IMPORT_FORMATS:
+        raise ImportFormatError("format must be one of: " + ", ".join(IMPORT_FORMATS))
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+
+    if import_format == "csv":
+        yield from csv.DictReader(text)
+    elif import_format == "ndjson":
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                raise ImportFormatError(f"Line {number} is not valid JSON")
+    else:
+        # a JSON array has to be parsed whole; prefer NDJSON for big files
+        try:
+            rows = json.load(text)
+        except ValueError:
+            raise ImportFormatError("The file is not valid JSON")
+        if not isinstance(rows, list):
+            raise ImportFormatError("The JSON file must contain a list of objects")
+        yield from rows
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+@contextmanager
+def password_hasher(workers=IMPORT_HASH_WORKERS):
+    """A function hashing a list of raw passwords, in a process pool when workers > 1."""
+    if workers <= 1:
+        yield lambda passwords: [make_password(password) for password in passwords]
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield lambda passwords: list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // workers)))
+
+
+class PatientImportSerializer(PatientRegisterSerializer):
+    # uniqueness is checked once per chunk (see import_patients)
+    def validate_email(self, value):
+        return BaseUserManager.normalize_email(value)
+
+
+def patient_credentials_email(full_name, email, password):
+    subject = "Your Patient Profile has been created"
+    message = (
+        f"Hello {full_name},\n\n"
+        f"Your patient account has been created successfully.\n\n"
+        f"Login Credentials:\n"
+        f"Username (Email): {email}\n"
+        f"Password: {password}\n\n"
+        f"Please log in and change your password after first login."
+    )
+    return subject, message, settings.DEFAULT_FROM_EMAIL, [email]
+
+
+class ImportSummary:
+    def __init__(self, max_errors=IMPORT_MAX_ERRORS):
+        self.max_errors = max_errors
+        self.created = 0
+        self.skipped = 0
+        self.errors = []
+
+    def error(self, row, errors):
+        self.skipped += 1
+        if self.max_errors is None or len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "errors": errors})
+
+    def as_dict(self):
+        return {
+            "created": self.created,
+            "skipped": self.skipped,
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+            "errors_truncated": self.skipped > len(self.errors),
+        }
+
+
+EMAIL_TAKEN = "A user with this email already exists."
+
+
+def taken_emails(rows):
+    emails = [data["email"] for _, data in rows]
+    return set(ProfileUser.objects.filter(email__in=emails).values_list("email", flat=True))
+
+
+def validate_chunk(rows, first_row, seen, summary, serializer_class):
+    """(row number, validated data) pairs of the valid rows of a chunk with a free, unseen email."""
+    valid = []
+    for number, row in enumerate(rows, start=first_row):
+        if not isinstance(row, dict):
+            summary.error(number, "Row must be an object")
+            continue
+        serializer = serializer_class(data=row)
+        if serializer.is_valid():
+            valid.append((number, serializer.validated_data))
+        else:
+            summary.error(number, serializer.errors)
+
+    taken = taken_emails(valid)
+    fresh = []
+    for number, data in valid:
+        email = data["email"]
+        if email in taken:
+            summary.error(number, {"email": [EMAIL_TAKEN]})
+        elif email in seen:
+            summary.error(number, {"email": ["Duplicate email in the file."]})
+        else:
+            seen.add(email)
+            fresh.append((number, data))
+    return fresh
+
+
+def create_users(rows, role, hash_passwords):
+    """Bulk-create users for validated rows; returns (users by email, raw passwords by email)."""
+    passwords = {data["email"]: generate_random_password() for data in rows}
+    hashes = hash_passwords(list(passwords.values()))
+    ProfileUser.objects.bulk_create([
+        ProfileUser(email=email, role=role, phone=data.get("phone_number", ""), password=hashed)
+        for (email, _), data, hashed in zip(passwords.items(), rows, hashes)
+    ])
+    # not every backend returns primary keys from bulk_create
+    users = {user.email: user for user in ProfileUser.objects.filter(email__in=list(passwords))}
+    return users, passwords
+
+
+def insert_rows(rows, summary, insert):
+    """
+    Run insert(rows) in one transaction and return (rows, its result).
+
+    The emails were checked before the transaction, so a user registering
+    meanwhile makes the insert fail; those rows are then reported as
+    skipped and the rest inserted again.  Other integrity errors propagate.
+    """
+    try:
+        with transaction.atomic():
+            return rows, insert(rows)
+    except IntegrityError:
+        taken = taken_emails(rows)
+        if not taken:
+            raise
+    fresh = []
+    for number, data in rows:
+        if data["email"] in taken:
+            summary.error(number, {"email": [EMAIL_TAKEN]})
+        else:
+            fresh.append((number, data))
+    if not fresh:
+        return fresh, None
+    with transaction.atomic():
+        return fresh, insert(fresh)
+
+
+def import_patients(records, chunk_size=IMPORT_CHUNK_SIZE, workers=IMPORT_HASH_WORKERS):
+    """Import an iterable of patient dicts; returns the summary dict."""
+    summary = ImportSummary()
+    seen = set()
+    first_row = 1
+    with password_hasher(workers) as hash_passwords:
+
+        def insert(rows):
+            fresh = [data for _, data in rows]
+            users, passwords = create_users(fresh, "Patient", hash_passwords)
+            Patient.objects.bulk_create([
+                Patient(
+                    user=users[data["email"]],
+                    full_name=data["full_name"],
+                    age=data["age"],
+                    gender=data["gender"],
+                    phone_number=data["phone_number"],
+                    blood_group=data["blood_group"],
+                    emergency_contact_name=data["emergency_contact_name"],
+                    emergency_contact_phone=data["emergency_contact_phone"],
+                    address=data["address"],
+                    known_allergies=data.get("known_allergies", ""),
+                    **Patient.search_values(data["full_name"], data["phone_number"], data["email"]),
+                )
+                for data in fresh
+            ])
+            # not every backend returns primary keys from bulk_create
+            index_patient_names(Patient.objects.filter(user__in=users.values()).only("id", "search_name"))
+            queue_emails(
+                patient_credentials_email(data["full_name"], data["email"], passwords[data["email"]])
+                for data in fresh
+            )
+
+        for rows in chunks(records, chunk_size):
+            valid = validate_chunk(rows, first_row, seen, summary, PatientImportSerializer)
+            first_row += len(rows)
+            if valid:
+                created, _ = insert_rows(valid, summary, insert)
+                summary.created += len(created)
+    return summary.as_dict()
+
+
+class OnboardingAvailabilitySerializer(DoctorAvailabilitySerializer):
+    class Meta(DoctorAvailabilitySerializer.Meta):
+        fields = [field for field in DoctorAvailabilitySerializer.Meta.fields if field != "doctor"]
+
+
+class DoctorOnboardingSerializer(DoctorRegisterSerializer):
+    availability = OnboardingAvailabilitySerializer(many=True, required=False)
+
+    class Meta(DoctorRegisterSerializer.Meta):
+        fields = DoctorRegisterSerializer.Meta.fields + ["availability"]
+
+    # uniqueness is checked once per batch (see onboard_doctors)
+    def validate_email(self, value):
+        return BaseUserManager.normalize_email(value)
+
+    def validate_availability(self, value):
+        # the doctor is new, so its rules can only overlap each other
+        for number, rule in enumerate(value, start=1):
+            for other_number, other in enumerate(value[:number - 1], start=1):
+                if availabilities_overlap(rule, other):
+                    raise serializers.ValidationError(
+                        f"Availability {number} overlaps with availability {other_number}."
+                    )
+        return value
+
+
+def onboard_doctors(clinic, entries, workers=IMPORT_HASH_WORKERS):
+    """
+    Register a list of doctor dicts (each with an optional "availability"
+    list) under a clinic in one transaction; returns the summary dict with
+    a result for every created doctor.
+    """
+    summary = ImportSummary(max_errors=None)
+    rows = validate_chunk(entries, 1, set(), summary, DoctorOnboardingSerializer)
+    results = []
+    if not rows:
+        return {**summary.as_dict(), "doctors": results}
+
+    with password_hasher(workers) as hash_passwords:
+
+        def insert(rows):
+            users, passwords = create_users([data for _, data in rows], "Doctor", hash_passwords)
+            profiles = []
+            for _, data in rows:
+                fields = {name: value for name, value in data.items() if name != "availability"}
+                fields.setdefault("additional_qualification", [])
+                profiles.append(Doctor(user=users[data["email"]], clinic=clinic, **fields))
+            Doctor.objects.bulk_create(profiles)
+            doctors = {doctor.user_id: doctor for doctor in Doctor.objects.filter(user__in=list(users.values()))}
+
+            rules = []
+            for _, data in rows:
+                doctor = doctors[users[data["email"]].id]
+                rules.extend(DoctorAvailability(doctor=doctor, **rule) for rule in data.get("availability", []))
+            DoctorAvailability.objects.bulk_create(rules)
+            rule_ids = defaultdict(list)
+            for doctor_id, rule_id in DoctorAvailability.objects.filter(
+                doctor__in=list(doctors.values()),
+            ).order_by("id").values_list("doctor_id", "id"):
+                rule_ids[doctor_id].append(rule_id)
+
+            queue_emails(
+                doctor_credentials_email(data["email"], passwords[data["email"]], clinic.clinic_name)
+                for _, data in rows
+            )
+            # bulk_create skips the signals that index doctors for search
+            transaction.on_commit(get_doctor_search().invalidate)
+            return users, doctors, rule_ids
+
+        rows, created = insert_rows(rows, summary, insert)
+
+    if created:
+        users, doctors, rule_ids = created
+        for number, data in rows:
+            user = users[data["email"]]
+            doctor = doctors[user.id]
+            results.append({
+                "row": number,
+                "doctor_id": doctor.id,
+                "doctor_name": doctor.doctor_name,
+                "user_id": user.id,
+                "email": user.email,
+                "availability_ids": rule_ids[doctor.id],
+            })
+    summary.created = len(results)
+    return {**summary.as_dict(), "doctors": results}
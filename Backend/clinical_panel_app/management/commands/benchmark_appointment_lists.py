@@ -0,0 +1,111 @@
+import time
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from clinical_panel_app.models import AppointmentBooking
+from clinical_panel_app.views import AppointmentFilterBySpecializationAPI, ClinicAppointmentsListAPIView
+from doctor_app.views import DoctorAppointmentsListAPIView
+from patient_app.views import PatientAppointmentsListAPIView
+from superadmin_app.models import Clinic, Doctor, Patient, ProfileUser
+from superadmin_app.pagination import MAX_PAGE_SIZE
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the appointment list endpoints against growing numbers of synthetic appointments "
+        "and report queries and latency per size.  Every page is fetched (at the largest page size), so "
+        "queries per page and time per row should stay flat.  Everything runs in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per endpoint and size (best is reported)")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options["sizes"], options["repeat"])
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def run(self, sizes, repeat):
+        users = {
+            role: ProfileUser.objects.create_user(email=f"benchmark-{role.lower()}@example.invalid", password=None, role=role)
+            for role in ("Clinic", "Doctor", "Patient")
+        }
+        clinic = Clinic.objects.create(
+            user=users["Clinic"], clinic_name="Benchmark clinic", license_number="BENCHMARK",
+            location="x", address="x", phone="0", email="benchmark-clinic@example.invalid",
+        )
+        doctor = Doctor.objects.create(
+            user=users["Doctor"], doctor_name="Benchmark doctor", specialization="Benchmarkology",
+            clinic=clinic, phone="0", email="benchmark-doctor@example.invalid", additional_qualification=[],
+        )
+        patient = Patient.objects.create(
+            user=users["Patient"], full_name="Benchmark patient", age=30, gender="Other",
+            phone_number="0000000000", blood_group="O+", emergency_contact_name="x",
+            emergency_contact_phone="0", address="x",
+        )
+
+        endpoints = (
+            ("clinic appointments", ClinicAppointmentsListAPIView, users["Clinic"], {}),
+            ("doctor appointments", DoctorAppointmentsListAPIView, users["Doctor"], {}),
+            ("patient appointments", PatientAppointmentsListAPIView, users["Patient"], {}),
+            ("by specialization", AppointmentFilterBySpecializationAPI, users["Clinic"], {"specialization": "benchmarkology"}),
+        )
+        factory = APIRequestFactory()
+
+        self.stdout.write(f"{'endpoint':<22}{'rows':>8}{'pages':>7}{'queries/page':>14}{'ms':>10}{'us/row':>9}")
+        created = 0
+        for size in sorted(sizes):
+            # bulk_create skips the booking signals, which is what we want here
+            AppointmentBooking.objects.bulk_create([
+                AppointmentBooking(
+                    patient=patient, doctor=doctor,
+                    appointment_date=date(2000, 1, 1) + timedelta(days=number // 40),
+                    start_time=(datetime(2000, 1, 1, 8) + timedelta(minutes=15 * (number % 40))).time(),
+                    end_time=(datetime(2000, 1, 1, 8, 15) + timedelta(minutes=15 * (number % 40))).time(),
+                )
+                for number in range(created, size)
+            ], batch_size=1000)
+            created = max(created, size)
+
+            for name, view_class, user, kwargs in endpoints:
+                view = view_class.as_view()
+                best = None
+                for _ in range(repeat):
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        rows, pages = self.fetch_all(factory, view, user, kwargs)
+                        elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                self.stdout.write(
+                    f"{name:<22}{rows:>8}{pages:>7}{len(queries.captured_queries) / pages:>14.1f}"
+                    f"{best * 1000:>10.1f}{best * 1e6 / max(rows, 1):>9.0f}"
+                )
+
+    def fetch_all(self, factory, view, user, kwargs):
+        """Follow next_cursor to the last page; returns the rows and pages fetched."""
+        params = {"page_size": MAX_PAGE_SIZE}
+        rows = pages = 0
+        while True:
+            request = factory.get("/", params)
+            force_authenticate(request, user=user)
+            response = view(request, **kwargs)
+            pages += 1
+            if not response.data["status"]:
+                return rows, pages
+            rows += len(response.data["data"])
+            cursor = response.data["pagination"]["next_cursor"]
+            if cursor is None:
+                return rows, pages
+            params["cursor"] = cursor
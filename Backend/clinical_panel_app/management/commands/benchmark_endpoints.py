@@ -0,0 +1,32 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from clinical_panel_app.benchmarks import NoBenchmarkData, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the hot endpoints in-process and report p50/p95/p99 latency and query counts as JSON "
+        "(run generate_synthetic_data first).  Writes are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=30, help="measured requests per endpoint")
+        parser.add_argument("--warmup", type=int, default=3, help="unmeasured requests per endpoint")
+        parser.add_argument("--only", nargs="+", help="scenario name prefixes, e.g. slots list.clinic")
+        parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+
+    def handle(self, *args, **options):
+        try:
+            report = run_benchmarks(options["repeat"], options["warmup"], options["only"])
+        except NoBenchmarkData as e:
+            raise CommandError(str(e))
+
+        output = json.dumps(report, indent=2, sort_keys=True) + "\n"
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output)
+            self.stdout.write(f"Wrote {len(report['results'])} result(s) to {options['output']}")
+        else:
+            self.stdout.write(output, ending="")
@@ -0,0 +1,41 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from clinical_panel_app.synthetic import delete_synthetic_data, generate_synthetic_data, synthetic_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Create a reproducible synthetic data set (clinics, doctors with availability, patients, "
+        "bookings, reports, vitals) with bulk_create.  --flush removes a previous synthetic set first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clinics", type=int, default=2)
+        parser.add_argument("--doctors-per-clinic", type=int, default=5)
+        parser.add_argument("--patients", type=int, default=2000)
+        parser.add_argument("--days", type=int, default=365, help="days of booking history before today")
+        parser.add_argument("--bookings-per-day", type=int, default=8, help="per doctor and working day")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--flush", action="store_true", help="delete existing synthetic data first")
+        parser.add_argument("--flush-only", action="store_true", help="only delete existing synthetic data")
+
+    def handle(self, *args, **options):
+        if options["flush"] or options["flush_only"]:
+            self.stdout.write(f"Deleted {delete_synthetic_data()} synthetic row(s)")
+            if options["flush_only"]:
+                return
+        elif synthetic_users().exists():
+            raise CommandError("Synthetic data already exists; pass --flush to replace it")
+
+        counts = generate_synthetic_data(
+            clinics=options["clinics"],
+            doctors_per_clinic=options["doctors_per_clinic"],
+            patients=options["patients"],
+            days=options["days"],
+            bookings_per_day=options["bookings_per_day"],
+            seed=options["seed"],
+            stdout=self.stdout,
+        )
+        self.stdout.write(json.dumps(counts, sort_keys=True))
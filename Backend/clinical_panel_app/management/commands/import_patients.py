@@ -0,0 +1,37 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from clinical_panel_app.imports import (
+    IMPORT_CHUNK_SIZE, IMPORT_FORMATS, IMPORT_HASH_WORKERS, ImportFormatError, guess_format, import_patients,
+    read_records,
+)
+
+
+class Command(BaseCommand):
+    help = "Import patients from a CSV, NDJSON or JSON file (credential emails go to the outbox)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", dest="import_format", choices=IMPORT_FORMATS, help="default: from the file extension")
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument("--workers", type=int, default=IMPORT_HASH_WORKERS, help="password hashing processes")
+
+    def handle(self, *args, **options):
+        import_format = options["import_format"] or guess_format(options["path"])
+        if import_format is None:
+            raise CommandError("Can't tell the format from the file name; pass --format")
+
+        started = time.perf_counter()
+        try:
+            with open(options["path"], "rb") as f:
+                summary = import_patients(read_records(f, import_format), options["chunk_size"], options["workers"])
+        except (OSError, ImportFormatError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(json.dumps(summary, indent=2, default=str))
+        self.stdout.write(
+            f"Imported {summary['created']} patient(s), skipped {summary['skipped']} "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
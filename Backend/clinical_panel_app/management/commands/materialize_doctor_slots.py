@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from clinical_panel_app.slots import extend_doctor_window, slot_horizon
+from superadmin_app.models import Doctor
+
+
+class Command(BaseCommand):
+    help = "Generate materialized DoctorSlot rows up to the end of the horizon (run daily from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--doctor", type=int, action="append", help="Only this doctor id (repeatable)")
+        parser.add_argument("--rebuild", action="store_true", help="Regenerate every day instead of only new ones")
+
+    def handle(self, *args, **options):
+        doctor_ids = options["doctor"] or Doctor.objects.values_list("id", flat=True)
+        first_day, last_day = slot_horizon()
+
+        total = 0
+        for doctor_id in doctor_ids:
+            total += extend_doctor_window(doctor_id, rebuild=options["rebuild"])
+        self.stdout.write(f"Generated {total} slot(s) for {first_day} - {last_day}")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from clinical_panel_app.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the doctor and clinic dashboard counters from all appointments (backfill / repair)"
+
+    def handle(self, *args, **options):
+        rows = rebuild_counters()
+        self.stdout.write(f"Rebuilt {rows} counter row(s)")
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from clinical_panel_app.booking import sweep_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Delete expired slot holds (run from cron, or with --loop as a worker)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep sweeping instead of running once")
+        parser.add_argument("--interval", type=int, default=60, help="Seconds between sweeps with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = sweep_expired_holds()
+            self.stdout.write(f"Deleted {deleted} expired slot hold(s)")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -15,6 +15,12 @@ class DoctorAvailability(models.Model):
     notes = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # overlap checks filter a doctor's rules by date range
+            models.Index(fields=["doctor", "start_date", "end_date"]),
+        ]
+
     def __str__(self):
         return f"{self.doctor.doctor_name} - {self.day_of_week} ({self.start_time} to {self.end_time})"
 
@@ -80,9 +86,142 @@ class AppointmentBooking(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # dashboard counters filter a clinic's doctors by day and status
+            models.Index(fields=["doctor", "appointment_date", "status"]),
+            # keyset pagination orderings of the appointment lists
+            models.Index(fields=["appointment_date", "start_time", "id"]),
+            models.Index(fields=["patient", "appointment_date", "start_time", "id"]),
+        ]
+        constraints = [
+            # last line of defence against double booking: same start time
+            # only; overlapping times are excluded by a PostgreSQL-only
+            # constraint, see booking.py
+            models.UniqueConstraint(
+                fields=["doctor", "appointment_date", "start_time"],
+                condition=~models.Q(status="Cancelled"),
+                name="unique_active_appointment_slot",
+            ),
+        ]
+
     def __str__(self):
         return f"Appointment: {self.patient.full_name} with Dr. {self.doctor.doctor_name} on {self.appointment_date} at {self.start_time}"
-<<<<<<< HEAD
+
+
+# one row per doctor and day; booking locks it so bookings of the same
+# doctor on the same day run one after another
+class DoctorDayLock(models.Model):
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name="day_locks")
+    date = models.DateField()
+
+    class Meta:
+        unique_together = ("doctor", "date")
+
+    def __str__(self):
+        return f"{self.doctor.doctor_name} - {self.date}"
+
+
+# short-lived reservation of a slot while the user finishes booking / payment
+class SlotHold(models.Model):
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name="slot_holds")
+    held_by = models.ForeignKey(ProfileUser, on_delete=models.CASCADE, related_name="slot_holds")
+    date = models.DateField()
+    slot_start = models.TimeField()
+    slot_end = models.TimeField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["doctor", "date", "expires_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.doctor.doctor_name} - {self.date} {self.slot_start}-{self.slot_end} (held until {self.expires_at})"
+
+
+# materialized slots of the next few weeks, see slots.py
+class DoctorSlot(models.Model):
+    FREE = "Free"
+    BOOKED = "Booked"
+    BLOCKED = "Blocked"
+    DELETED = "Deleted"
+
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name="slots")
+    date = models.DateField()
+    slot_start = models.TimeField()
+    slot_end = models.TimeField()
+    state = models.CharField(max_length=20, choices=[
+        (FREE, "Free"),
+        (BOOKED, "Booked"),
+        (BLOCKED, "Blocked"),
+        (DELETED, "Deleted"),
+    ], default=FREE)
+
+    class Meta:
+        unique_together = ("doctor", "date", "slot_start", "slot_end")
+        indexes = [
+            models.Index(fields=["doctor", "date", "state"]),
+        ]
+
+    def __str__(self):
+        return f"{self.doctor.doctor_name} - {self.date} {self.slot_start}-{self.slot_end} ({self.state})"
+
+
+# last day up to which a doctor's DoctorSlot rows have been generated
+class DoctorSlotWindow(models.Model):
+    doctor = models.OneToOneField(Doctor, on_delete=models.CASCADE, related_name="slot_window")
+    generated_until = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.doctor.doctor_name} - slots until {self.generated_until}"
+
+# appointment counters of a doctor per day, kept up to date by signals (see
+# counters.py).  The row with date NULL holds the lifetime totals; patients
+# (distinct patients seen) is only maintained on that row.
+class DoctorDailyStats(models.Model):
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name="daily_stats")
+    date = models.DateField(null=True, blank=True)
+    appointments = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    waiting_list = models.IntegerField(default=0)
+    no_show = models.IntegerField(default=0)
+    patients = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["doctor", "date"], name="unique_doctor_daily_stats"),
+            models.UniqueConstraint(
+                fields=["doctor"], condition=models.Q(date__isnull=True), name="unique_doctor_lifetime_stats",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.doctor.doctor_name} - {self.date or 'lifetime'}"
+
+
+# same counters for all doctors of a clinic
+class ClinicDailyStats(models.Model):
+    clinic = models.ForeignKey(Clinic, on_delete=models.CASCADE, related_name="daily_stats")
+    date = models.DateField(null=True, blank=True)
+    appointments = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    waiting_list = models.IntegerField(default=0)
+    no_show = models.IntegerField(default=0)
+    patients = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["clinic", "date"], name="unique_clinic_daily_stats"),
+            models.UniqueConstraint(
+                fields=["clinic"], condition=models.Q(date__isnull=True), name="unique_clinic_lifetime_stats",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.clinic.clinic_name} - {self.date or 'lifetime'}"
 
 # ("No-Show", "No-Show") can be done by doctor or clinic.
 class PatientVitals(models.Model):
@@ -126,7 +265,6 @@ class PatientVitals(models.Model):
 
     def __str__(self):
         return f"Vitals for {self.patient.full_name} at {self.created_at}"
-=======
     
 
 # Payment model
@@ -179,6 +317,13 @@ class MedicalReport(models.Model):
     document = models.FileField(upload_to="medical-reports/", null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # keyset pagination orderings of the report lists
+            models.Index(fields=["created_at", "id"]),
+            models.Index(fields=["patient", "created_at", "id"]),
+        ]
+
     def save(self, *args, **kwargs):
         # auto-fill patient from appointment if not provided
         if self.appointment and not self.patient:
@@ -186,4 +331,4 @@ class MedicalReport(models.Model):
         super().save(*args, **kwargs)
     def __str__(self):
         return f"Report: {self.report_type} for {self.patient.full_name} - {self.created_at.date()}"
->>>>>>> 8c4c14b04225f36ed5634b20fa4755841e0dfe89
+
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from superadmin_app.models import *
 from .models import *
+from .booking import active_holds, overlapping_appointments
+from django.db.models import Count
 from datetime import timedelta, datetime
 from django.contrib.auth import authenticate
 from django.utils import timezone
@@ -122,7 +124,17 @@ class DoctorRegisterSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id","patients_count","created_at"]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Select the clinic and annotate patients_count so lists don't query per doctor."""
+        return queryset.select_related("clinic").annotate(
+            patients_count=Count("appointments__patient", distinct=True)
+        )
+
     def get_patients_count(self, obj):
+        # list views annotate it, see setup_eager_loading
+        if hasattr(obj, "patients_count"):
+            return obj.patients_count
         return obj.appointments.values("patient").distinct().count()  # assumes Clinic has related_name="patients"    
 
     def create(self, validated_data):
@@ -281,20 +293,24 @@ class BaseAppointmentBookingSerializer(serializers.ModelSerializer):
             })
 
         # 2️⃣ Prevent overlapping appointments
-        overlapping = AppointmentBooking.objects.filter(
-            doctor=doctor,
-            appointment_date=date,
-            start_time__lt=end,
-            end_time__gt=start
+        # (re-checked under a lock by booking.book_appointment on save)
+        overlapping = overlapping_appointments(
+            doctor, date, start, end,
+            exclude_pk=self.instance.pk if self.instance else None,  # exclude self if update
         )
-        if self.instance:  # exclude self if update
-            overlapping = overlapping.exclude(pk=self.instance.pk)
 
         if overlapping.exists():
             raise serializers.ValidationError({
                 "appointment": "This time slot is already booked."
             })
 
+        # 3️⃣ Respect slots other users are holding
+        request = self.context.get("request")
+        if active_holds(doctor, date, start, end, exclude_user=request.user if request else None).exists():
+            raise serializers.ValidationError({
+                "appointment": "This time slot is currently held by another user."
+            })
+
         return data
 
 
@@ -337,6 +353,14 @@ class AppointmentBookingSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['id','created_at','doctor_name','patient_name']    
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Join doctor and patient for list views, loading only the names shown."""
+        booking_fields = [field.name for field in AppointmentBooking._meta.concrete_fields]
+        return queryset.select_related("doctor", "patient").only(
+            *booking_fields, "doctor__doctor_name", "patient__full_name"
+        )
+
 
 
 # clinic profile serlaizers
@@ -0,0 +1,87 @@
+from django.db.models.signals import post_migrate, post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from .models import AppointmentBooking, DoctorAvailability, DoctorBlockedSlot, DoctorUnavailableSlot
+from .availability import INACTIVE_BOOKING_STATUSES, invalidate_availability_index
+from .booking import ensure_booking_overlap_constraint
+from .counters import backfill_counters, booking_changed, snapshot, stored_snapshot
+from .slots import mark_slots_booked, refresh_doctor_slots, slots_enabled
+
+
+# drop the compiled availability index whenever a doctor's rules change
+@receiver([post_save, post_delete], sender=DoctorAvailability)
+def availability_changed(sender, instance, **kwargs):
+    invalidate_availability_index(instance.doctor_id)
+
+
+# remember where a changed row used to be, so its old days get refreshed too
+@receiver(pre_save, sender=DoctorAvailability)
+@receiver(pre_save, sender=AppointmentBooking)
+def remember_previous_days(sender, instance, **kwargs):
+    if not slots_enabled() or instance.pk is None:
+        return
+    if sender is DoctorAvailability:
+        fields = ("doctor_id", "start_date", "end_date")
+    else:
+        fields = ("doctor_id", "appointment_date", "appointment_date")
+    instance._previous_days = sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+
+
+def refresh_previous_days(instance):
+    previous = getattr(instance, "_previous_days", None)
+    if previous:
+        refresh_doctor_slots(*previous)
+
+
+# keep materialized slots (slots.py) in step with rules, blocks and bookings
+@receiver([post_save, post_delete], sender=DoctorAvailability)
+def availability_slots_changed(sender, instance, **kwargs):
+    if not slots_enabled():
+        return
+    refresh_previous_days(instance)
+    refresh_doctor_slots(instance.doctor_id, instance.start_date, instance.end_date)
+
+
+@receiver([post_save, post_delete], sender=DoctorBlockedSlot)
+@receiver([post_save, post_delete], sender=DoctorUnavailableSlot)
+def slot_state_changed(sender, instance, **kwargs):
+    if not slots_enabled():
+        return
+    refresh_doctor_slots(instance.doctor_id, instance.date, instance.date)
+
+
+@receiver([post_save, post_delete], sender=AppointmentBooking)
+def booking_slots_changed(sender, instance, created=False, **kwargs):
+    if not slots_enabled():
+        return
+    if created and instance.status not in INACTIVE_BOOKING_STATUSES:
+        mark_slots_booked(instance.doctor_id, instance.appointment_date, instance.start_time, instance.end_time)
+        return
+    refresh_previous_days(instance)
+    refresh_doctor_slots(instance.doctor_id, instance.appointment_date, instance.appointment_date)
+
+
+# dashboard counters (counters.py): remember the stored booking, then move
+# the counters from it to the saved one
+@receiver(pre_save, sender=AppointmentBooking)
+def remember_previous_booking(sender, instance, **kwargs):
+    instance._previous_booking = stored_snapshot(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=AppointmentBooking)
+def booking_counters_saved(sender, instance, **kwargs):
+    booking_changed(getattr(instance, "_previous_booking", None), snapshot(instance))
+
+
+@receiver(post_delete, sender=AppointmentBooking)
+def booking_counters_deleted(sender, instance, **kwargs):
+    booking_changed(snapshot(instance), None)
+
+
+# dashboards of a database that had bookings before the counters existed,
+# and the booking overlap constraint (PostgreSQL only)
+@receiver(post_migrate)
+def counters_backfilled(sender, using="default", **kwargs):
+    if sender.name == "clinical_panel_app":
+        backfill_counters()
+        ensure_booking_overlap_constraint(using)
@@ -0,0 +1,210 @@
+"""
+Optional materialized slot table.
+
+With MATERIALIZE_DOCTOR_SLOTS enabled, every doctor's slots for the next
+DOCTOR_SLOT_HORIZON_DAYS days are stored as DoctorSlot rows together with
+their state (free, booked, blocked or deleted).  Listing slots is then one
+indexed range scan instead of expanding the availability rules and
+subtracting bookings on every request.
+
+Rows are rebuilt per doctor and day whenever something that affects the day
+changes (see signals.py); a new booking only flips the state of the slots it
+covers, inside the booking transaction.  `manage.py materialize_doctor_slots`
+rolls the window forward and is meant to run daily.  Days outside a doctor's
+generated window fall back to on-the-fly expansion, and so do ranges where a
+rule has an unusable slot_duration, so both paths report it the same way.
+"""
+import logging
+from collections import defaultdict
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .availability import (
+    INACTIVE_BOOKING_STATUSES, InvalidSlotDuration, build_availability_index, date_range,
+    expand_rule, get_availability_index, rules_for_date, subtract_busy, to_minutes,
+)
+from .models import (
+    AppointmentBooking, DoctorBlockedSlot, DoctorSlot, DoctorSlotWindow, DoctorUnavailableSlot, SlotHold,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+def slots_enabled():
+    return getattr(settings, "MATERIALIZE_DOCTOR_SLOTS", False)
+
+
+def slot_horizon(today=None):
+    """First and last day of the materialized window."""
+    first_day = today or timezone.localdate()
+    days = getattr(settings, "DOCTOR_SLOT_HORIZON_DAYS", 90)
+    return first_day, first_day + timedelta(days=days - 1)
+
+
+def minute_to_time(minute):
+    return time(minute // 60, minute % 60)
+
+
+def load_slot_states(doctor_id, first_day, last_day):
+    """Busy intervals of a doctor per (state, date), one query per source."""
+    sources = (
+        (DoctorSlot.BOOKED, AppointmentBooking.objects.filter(
+            doctor_id=doctor_id, appointment_date__range=(first_day, last_day),
+        ).exclude(
+            status__in=INACTIVE_BOOKING_STATUSES,
+        ).values_list("appointment_date", "start_time", "end_time")),
+        (DoctorSlot.DELETED, DoctorUnavailableSlot.objects.filter(
+            doctor_id=doctor_id, date__range=(first_day, last_day),
+        ).values_list("date", "slot_start", "slot_end")),
+        (DoctorSlot.BLOCKED, DoctorBlockedSlot.objects.filter(
+            doctor_id=doctor_id, date__range=(first_day, last_day), is_blocked=True,
+        ).values_list("date", "slot_start", "slot_end")),
+    )
+
+    busy = defaultdict(list)
+    for state, rows in sources:
+        for day, start, end in rows:
+            busy[(state, day)].append((to_minutes(start), to_minutes(end)))
+    return busy
+
+
+def build_day(doctor_id, rules, day, busy):
+    """DoctorSlot rows of one day; a booking wins over a deletion over a block."""
+    slots = []
+    for rule in rules_for_date(rules, day):
+        try:
+            slots.extend(expand_rule(rule))
+        except InvalidSlotDuration:
+            # listing these days falls back to expansion, which reports it
+            logger.warning(
+                "Availability %s of doctor %s has an invalid slot_duration", rule.availability_id, doctor_id,
+            )
+    slots.sort()
+
+    # a slot is in a state when subtracting that state's intervals removes it
+    taken = {
+        state: set(slots) - set(subtract_busy(slots, busy.get((state, day))))
+        for state in (DoctorSlot.BOOKED, DoctorSlot.DELETED, DoctorSlot.BLOCKED)
+    }
+
+    rows = []
+    for slot in slots:
+        state = next((state for state, members in taken.items() if slot in members), DoctorSlot.FREE)
+        rows.append(DoctorSlot(
+            doctor_id=doctor_id,
+            date=day,
+            slot_start=minute_to_time(slot[0]),
+            slot_end=minute_to_time(slot[1]),
+            state=state,
+        ))
+    return rows
+
+
+def generate_doctor_slots(doctor_id, first_day, last_day):
+    """Replace a doctor's DoctorSlot rows between two dates; returns the row count."""
+    rules = build_availability_index(doctor_id)
+    busy = load_slot_states(doctor_id, first_day, last_day)
+
+    rows = []
+    for day in date_range(first_day, last_day):
+        rows.extend(build_day(doctor_id, rules, day, busy))
+
+    with transaction.atomic():
+        DoctorSlot.objects.filter(doctor_id=doctor_id, date__range=(first_day, last_day)).delete()
+        DoctorSlot.objects.bulk_create(rows)
+    return len(rows)
+
+
+def refresh_doctor_slots(doctor_id, first_day, last_day):
+    """
+    Regenerate the already materialized days of a doctor between two dates.
+
+    Doctors without a window, and days outside it, are left alone: they are
+    expanded on the fly until the next materialize_doctor_slots run.
+    """
+    window = DoctorSlotWindow.objects.filter(doctor_id=doctor_id).first()
+    if window is None:
+        return 0
+    today, _ = slot_horizon()
+    first_day = max(first_day or today, today)
+    last_day = min(last_day or window.generated_until, window.generated_until)
+    if first_day > last_day:
+        return 0
+    return generate_doctor_slots(doctor_id, first_day, last_day)
+
+
+def extend_doctor_window(doctor_id, rebuild=False):
+    """
+    Roll a doctor's window forward to the end of the horizon, generating only
+    the days not generated yet (or every day with rebuild=True), and drop the
+    rows of past days.
+    """
+    first_day, last_day = slot_horizon()
+    window = DoctorSlotWindow.objects.filter(doctor_id=doctor_id).first()
+    if window and not rebuild and window.generated_until >= first_day:
+        first_day = window.generated_until + timedelta(days=1)
+
+    with transaction.atomic():
+        DoctorSlot.objects.filter(doctor_id=doctor_id, date__lt=slot_horizon()[0]).delete()
+        created = 0
+        if first_day <= last_day:
+            created = generate_doctor_slots(doctor_id, first_day, last_day)
+        DoctorSlotWindow.objects.update_or_create(doctor_id=doctor_id, defaults={"generated_until": last_day})
+    return created
+
+
+def mark_slots_booked(doctor_id, day, start, end):
+    """Flip the slots a new booking covers to booked (one UPDATE)."""
+    return DoctorSlot.objects.filter(
+        doctor_id=doctor_id, date=day, slot_start__lt=end, slot_end__gt=start,
+    ).exclude(state=DoctorSlot.BOOKED).update(state=DoctorSlot.BOOKED)
+
+
+def materialized_slots(doctor_id, first_day, last_day, viewer=None):
+    """
+    Free (start, end) minute pairs per date read from DoctorSlot, or None
+    when the range is not fully materialized or a rule in it is invalid.
+
+    Days with rows but no free slot map to an empty list; days without any
+    slot are missing from the result.  Unexpired holds of other users are
+    subtracted the same way the on-the-fly listing does.
+    """
+    if not slots_enabled():
+        return None
+    today, _ = slot_horizon()
+    if first_day < today:
+        return None
+    window = DoctorSlotWindow.objects.filter(doctor_id=doctor_id).values_list("generated_until", flat=True).first()
+    if window is None or last_day > window:
+        return None
+    # a broken rule has no rows; let the on-the-fly path report it
+    rules = get_availability_index(doctor_id)
+    for day in date_range(first_day, last_day):
+        if any(rule.slot_minutes is None for rule in rules_for_date(rules, day)):
+            return None
+
+    days = {}
+    rows = DoctorSlot.objects.filter(
+        doctor_id=doctor_id, date__range=(first_day, last_day),
+    ).order_by("date", "slot_start").values_list("date", "slot_start", "slot_end", "state")
+    for day, start, end, state in rows:
+        free = days.setdefault(day, [])
+        if state == DoctorSlot.FREE:
+            free.append((to_minutes(start), to_minutes(end)))
+
+    holds = SlotHold.objects.filter(
+        doctor_id=doctor_id, date__range=(first_day, last_day), expires_at__gt=timezone.now(),
+    )
+    if viewer is not None:
+        holds = holds.exclude(held_by=viewer)
+    held = defaultdict(list)
+    for day, start, end in holds.values_list("date", "slot_start", "slot_end"):
+        held[day].append((to_minutes(start), to_minutes(end)))
+    for day, intervals in held.items():
+        if day in days:
+            days[day] = subtract_busy(days[day], intervals)
+    return days
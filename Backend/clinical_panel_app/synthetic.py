@@ -0,0 +1,189 @@
+"""
+Synthetic clinic data for benchmarks and load tests.
+
+generate_synthetic_data() fills the database with clinics, doctors with
+weekly DoctorAvailability rules, patients, and a history of bookings (with
+medical reports and vitals for the completed ones) ending a few weeks into
+the future.  Everything goes through bulk_create and a seeded random
+generator, so the same arguments always produce the same rows.
+
+All users get SYNTHETIC_EMAIL_DOMAIN addresses, which is how
+delete_synthetic_data() finds them again.  bulk_create skips signals, so the
+derived data (dashboard counters, doctor search index) is rebuilt at the end.
+"""
+import random
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from superadmin_app.models import Clinic, Doctor, Patient, ProfileUser, index_patient_names
+from superadmin_app.search import get_doctor_search
+from .counters import rebuild_counters
+from .models import AppointmentBooking, DoctorAvailability, MedicalReport, PatientVitals
+
+
+SYNTHETIC_EMAIL_DOMAIN = "synthetic.example.invalid"
+SYNTHETIC_PASSWORD = "synthetic-password"
+
+SPECIALIZATIONS = ("Cardiology", "Dermatology", "General", "Neurology", "Orthopedics", "Pediatrics")
+FIRST_NAMES = ("Aarav", "Anika", "Diya", "Ishaan", "Kabir", "Meera", "Nikhil", "Priya", "Rahul", "Sara", "Vikram", "Zoya")
+LAST_NAMES = ("Iyer", "Khan", "Menon", "Nair", "Patel", "Rao", "Reddy", "Shah", "Singh", "Verma")
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+# working day of the generated availability rules, in 15 minute slots
+DAY_START = time(9, 0)
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 32
+# days after today that still get bookings
+FUTURE_DAYS = 30
+
+
+def slot_times(index):
+    minutes = DAY_START.hour * 60 + DAY_START.minute + index * SLOT_MINUTES
+    return time(minutes // 60, minutes % 60), time((minutes + SLOT_MINUTES) // 60, (minutes + SLOT_MINUTES) % 60)
+
+
+def synthetic_users():
+    return ProfileUser.objects.filter(email__endswith=f"@{SYNTHETIC_EMAIL_DOMAIN}")
+
+
+def delete_synthetic_data():
+    """Delete every synthetic user; profiles, bookings and reports cascade."""
+    with transaction.atomic():
+        deleted, _ = synthetic_users().delete()
+        rebuild_counters()
+    get_doctor_search().invalidate()
+    return deleted
+
+
+def create_users(role, count, password):
+    users = [
+        ProfileUser(email=f"{role.lower()}{number}@{SYNTHETIC_EMAIL_DOMAIN}", role=role, password=password, is_verified=True)
+        for number in range(count)
+    ]
+    ProfileUser.objects.bulk_create(users, batch_size=1000)
+    # bulk_create only returns primary keys on some backends
+    return list(ProfileUser.objects.filter(email__in=[user.email for user in users]).order_by("id"))
+
+
+def person_name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def generate_synthetic_data(clinics=2, doctors_per_clinic=5, patients=2000, days=365,
+                            bookings_per_day=8, seed=1, stdout=None):
+    """Create a synthetic data set; returns the number of rows per model."""
+    rng = random.Random(seed)
+    password = make_password(SYNTHETIC_PASSWORD)  # hashed once, shared by every user
+    today = timezone.localdate()
+
+    def log(message):
+        if stdout is not None:
+            stdout.write(message)
+
+    with transaction.atomic():
+        clinic_users = create_users("Clinic", clinics, password)
+        Clinic.objects.bulk_create([
+            Clinic(
+                user=user, clinic_name=f"{rng.choice(LAST_NAMES)} Clinic {number}",
+                license_number=f"SYNTHETIC-{number}", location="Synthetic City", address=f"{number} Synthetic Road",
+                phone=f"9{number:09d}", email=user.email, about_clinic="Synthetic clinic",
+            )
+            for number, user in enumerate(clinic_users)
+        ])
+        clinic_rows = list(Clinic.objects.filter(user__in=clinic_users).order_by("id"))
+
+        doctor_users = create_users("Doctor", clinics * doctors_per_clinic, password)
+        Doctor.objects.bulk_create([
+            Doctor(
+                user=user, doctor_name=person_name(rng), specialization=SPECIALIZATIONS[number % len(SPECIALIZATIONS)],
+                clinic=clinic_rows[number // doctors_per_clinic], phone=f"8{number:09d}", email=user.email,
+                bio=f"{rng.randint(2, 30)} years of {SPECIALIZATIONS[number % len(SPECIALIZATIONS)].lower()} practice",
+                experince_years=rng.randint(2, 30), additional_qualification=[],
+                appointment_amount=Decimal(rng.choice((300, 500, 800))),
+            )
+            for number, user in enumerate(doctor_users)
+        ], batch_size=1000)
+        doctors = list(Doctor.objects.filter(user__in=doctor_users).order_by("id"))
+
+        first_day = today - timedelta(days=days)
+        last_day = today + timedelta(days=FUTURE_DAYS)
+        DoctorAvailability.objects.bulk_create([
+            DoctorAvailability(
+                doctor=doctor, day_of_week=WEEKDAYS, start_time=DAY_START, end_time=slot_times(SLOTS_PER_DAY - 1)[1],
+                start_date=first_day, end_date=last_day + timedelta(days=365),
+                slot_duration=str(SLOT_MINUTES), break_duration="0",
+            )
+            for doctor in doctors
+        ])
+        log(f"{len(clinic_rows)} clinics, {len(doctors)} doctors")
+
+        patient_users = create_users("Patient", patients, password)
+        patient_rows = []
+        for number, user in enumerate(patient_users):
+            name = person_name(rng)
+            phone = f"7{number:09d}"
+            patient_rows.append(Patient(
+                user=user, full_name=name, age=rng.randint(1, 90), gender=rng.choice(("Male", "Female", "Other")),
+                phone_number=phone, blood_group=rng.choice(Patient.BLOOD_GROUP_CHOICES)[0],
+                emergency_contact_name=person_name(rng), emergency_contact_phone=f"6{number:09d}",
+                address=f"{number} Patient Street", known_allergies=rng.choice(("", "", "Penicillin", "Peanuts")),
+                **Patient.search_values(name, phone, user.email),
+            ))
+        Patient.objects.bulk_create(patient_rows, batch_size=1000)
+        index_patient_names(Patient.objects.filter(user__in=patient_users).only("id", "search_name"))
+        patient_ids = list(Patient.objects.filter(user__in=patient_users).order_by("id").values_list("id", flat=True))
+        log(f"{len(patient_ids)} patients")
+
+        bookings = []
+        day = first_day
+        while day <= last_day:
+            if day.weekday() < len(WEEKDAYS):
+                for doctor in doctors:
+                    for index in sorted(rng.sample(range(SLOTS_PER_DAY), min(bookings_per_day, SLOTS_PER_DAY))):
+                        start, end = slot_times(index)
+                        if day < today:
+                            status = rng.choices(("Completed", "Cancelled", "No-Show"), (85, 10, 5))[0]
+                        else:
+                            status = rng.choice(("Scheduled", "Confirmed", "Waiting List"))
+                        bookings.append(AppointmentBooking(
+                            patient_id=rng.choice(patient_ids), doctor=doctor, appointment_date=day,
+                            start_time=start, end_time=end, status=status, reason_for_visit="Synthetic visit",
+                        ))
+            day += timedelta(days=1)
+        AppointmentBooking.objects.bulk_create(bookings, batch_size=2000)
+        log(f"{len(bookings)} bookings")
+
+        completed = AppointmentBooking.objects.filter(
+            doctor__in=doctors, status="Completed",
+        ).order_by("id").values_list("id", "patient_id")
+        reports, vitals = [], []
+        for appointment_id, patient_id in completed.iterator():
+            # a report for about a third of the visits, vitals for every one
+            if rng.random() < 0.33:
+                reports.append(MedicalReport(
+                    appointment_id=appointment_id, patient_id=patient_id,
+                    report_title="Synthetic report", priority=rng.choice(("Normal", "Normal", "Urgent", "High")),
+                    report_type=rng.choice(("Lab", "Radiology", "Discharge")), description="Synthetic findings",
+                ))
+            weight, height = Decimal(rng.randint(40, 110)), Decimal(rng.randint(140, 195))
+            vitals.append(PatientVitals(
+                patient_id=patient_id, blood_pressure=f"{rng.randint(100, 150)}/{rng.randint(60, 95)}",
+                heart_rate=rng.randint(55, 110), temperature=Decimal("98.6"), oxygen_saturation=rng.randint(94, 100),
+                respiratory_rate=rng.randint(12, 20), weight=weight, height=height,
+                bmi=round(weight / (height / 100) ** 2, 2),
+            ))
+        MedicalReport.objects.bulk_create(reports, batch_size=2000)
+        PatientVitals.objects.bulk_create(vitals, batch_size=2000)
+        log(f"{len(reports)} medical reports, {len(vitals)} vitals")
+
+        rebuild_counters()
+
+    get_doctor_search().invalidate()
+    return {
+        "clinics": len(clinic_rows), "doctors": len(doctors), "patients": len(patient_ids),
+        "appointments": len(bookings), "medical_reports": len(reports), "vitals": len(vitals),
+    }
@@ -1,3 +1,1057 @@
-from django.test import TestCase
+import calendar
+import csv
+import io
+import json
+import threading
+import unittest
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from superadmin_app.models import *
+from superadmin_app.pagination import encode_cursor
+from superadmin_app.search import get_doctor_search
+from .models import *
+from .availability import (
+    MAX_RANGE_DAYS, earliest_free_slots, load_busy_intervals, merge_intervals, normalize_days,
+    overlapping_availabilities, rules_for_date, subtract_busy,
+)
+from .benchmarks import run_benchmarks
+from .booking import (
+    BOOKING_OVERLAP_CONSTRAINT, SLOT_HOLD_TTL, SlotUnavailable, book_appointment, ensure_booking_overlap_constraint,
+    hold_slot, sweep_expired_holds,
+)
+from .counters import backfill_counters, rebuild_counters
+from .exports import APPOINTMENT_EXPORT_FIELDS
+from . import imports
+from .imports import import_patients, read_records
+from .serializers import ClinicAppointmentBookingSerializer
+from .slots import extend_doctor_window, materialized_slots
+from .synthetic import generate_synthetic_data
+
+
+class ClinicFixtures:
+    """Builders for the clinic, doctor and patient rows the tests start from."""
+
+    def create_clinic(self, suffix="", **fields):
+        user = ProfileUser.objects.create_user(email=f"clinic{suffix}@example.com", role="Clinic")
+        values = {
+            "clinic_name": f"Clinic {suffix}".strip(), "license_number": f"L-clinic{suffix}",
+            "location": "x", "address": "x", "phone": "1", "email": user.email,
+        }
+        values.update(fields)
+        return Clinic.objects.create(user=user, **values)
+
+    def create_doctor(self, clinic, suffix="", **fields):
+        user = ProfileUser.objects.create_user(email=f"doctor{suffix}@example.com", role="Doctor")
+        values = {
+            "doctor_name": f"Doctor {suffix}".strip(), "specialization": "General", "phone": "1",
+            "email": user.email, "additional_qualification": [],
+        }
+        values.update(fields)
+        return Doctor.objects.create(user=user, clinic=clinic, **values)
+
+    def create_patient(self, suffix="", **fields):
+        user = ProfileUser.objects.create_user(email=f"patient{suffix}@example.com", role="Patient")
+        values = {
+            "full_name": f"Patient {suffix}".strip(), "age": 30, "gender": "Other", "phone_number": "1234567890",
+            "blood_group": "O+", "emergency_contact_name": "x", "emergency_contact_phone": "1", "address": "x",
+        }
+        values.update(fields)
+        return Patient.objects.create(user=user, **values)
+
+
+class BookingConcurrencyTests(ClinicFixtures, TransactionTestCase):
+    threads = 16
+
+    def setUp(self):
+        self.doctor = self.create_doctor(self.create_clinic())
+        self.patients = [self.create_patient(i) for i in range(self.threads)]
+        self.day = date.today() + timedelta(days=7)
+
+    def book(self, patient, offset, results):
+        # every request overlaps every other one, half of them exactly
+        start = time(10, 0) if offset % 2 == 0 else time(10, offset % 20)
+        serializer = ClinicAppointmentBookingSerializer(data={
+            "doctor": self.doctor.id,
+            "patient": patient.id,
+            "appointment_date": self.day,
+            "start_time": start,
+            "end_time": time(10, 30),
+        })
+        try:
+            self.barrier.wait()
+            if serializer.is_valid():
+                book_appointment(serializer)
+                results.append("booked")
+            else:
+                results.append("rejected")
+        except SlotUnavailable:
+            results.append("rejected")
+        except OperationalError:
+            # sqlite reports write contention instead of waiting on a row lock
+            results.append("locked")
+        finally:
+            connection.close()
+
+    def test_one_slot_hammered_from_many_threads(self):
+        self.barrier = threading.Barrier(self.threads)
+        results = []
+        workers = [threading.Thread(target=self.book, args=(p, i, results))
+                   for i, p in enumerate(self.patients)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        booked = AppointmentBooking.objects.filter(doctor=self.doctor, appointment_date=self.day)
+        self.assertEqual(booked.count(), 1)
+        self.assertEqual(results.count("booked"), 1)
+        self.assertEqual(len(results), self.threads)
+
+
+class BookingOverlapConstraintTests(ClinicFixtures, TestCase):
+    def setUp(self):
+        self.doctor = self.create_doctor(self.create_clinic())
+        self.patient = self.create_patient()
+        self.day = date.today() + timedelta(days=7)
+
+    def booking(self, start, end, **fields):
+        return AppointmentBooking(
+            patient=self.patient, doctor=self.doctor, appointment_date=self.day, start_time=start, end_time=end,
+            **fields,
+        )
+
+    def test_constraint_is_created_on_postgres_only(self):
+        # the model (and so its migrations) never depends on the backend
+        self.assertNotIn(BOOKING_OVERLAP_CONSTRAINT, [c.name for c in AppointmentBooking._meta.constraints])
+        if connection.vendor != "postgresql":
+            self.assertFalse(ensure_booking_overlap_constraint())
+
+    @unittest.skipUnless(connection.vendor == "postgresql", "the constraint is PostgreSQL only")
+    def test_writes_bypassing_book_appointment_cannot_overlap(self):
+        AppointmentBooking.objects.bulk_create([
+            self.booking(time(10, 0), time(10, 30)),
+            # cancelled and back to back bookings don't conflict
+            self.booking(time(10, 15), time(10, 45), status="Cancelled"),
+            self.booking(time(10, 30), time(11, 0)),
+        ])
+        with self.assertRaises(IntegrityError):
+            AppointmentBooking.objects.bulk_create([self.booking(time(10, 20), time(10, 40))])
+
+
+class AvailabilityIndexTests(ClinicFixtures, TestCase):
+    def setUp(self):
+        cache.clear()
+        clinic = self.create_clinic()
+        self.doctor = self.create_doctor(clinic)
+        today = date.today()
+        self.rules = [
+            # open ended, with a break starting half way through a minute
+            DoctorAvailability.objects.create(
+                doctor=self.doctor, day_of_week=["Monday", "Wednesday", "Friday"], start_time=time(9, 0),
+                end_time=time(10, 15), start_date=today, slot_duration="15", break_duration="10m",
+            ),
+            DoctorAvailability.objects.create(
+                doctor=self.doctor, day_of_week=["Tuesday", "Wednesday"], start_time=time(14, 0),
+                end_time=time(15, 0), start_date=today, end_date=today + timedelta(days=14),
+                slot_duration="20 min",
+            ),
+            DoctorAvailability.objects.create(
+                doctor=self.doctor, day_of_week=list(calendar.day_name), start_time=time(18, 0),
+                end_time=time(19, 0), start_date=today + timedelta(days=21), slot_duration="30",
+            ),
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(clinic.user)
+
+    def listed(self, day):
+        response = self.client.get(reverse("list-doctor-availability", args=[self.doctor.id, day.isoformat()]))
+        data = response.json()
+        return data["data"]["slots"] if data["status"] else None
+
+    def uncompiled(self, day):
+        # the per-request expansion the compiled index replaced
+        day_name = calendar.day_name[day.weekday()]
+        slots = []
+        for availability in DoctorAvailability.objects.filter(doctor=self.doctor).order_by("id"):
+            if availability.start_date > day or (availability.end_date and availability.end_date < day):
+                continue
+            if day_name not in availability.day_of_week:
+                continue
+            start = datetime.combine(day, availability.start_time)
+            end = datetime.combine(day, availability.end_time)
+            duration = timedelta(minutes=int("".join(c for c in availability.slot_duration if c.isdigit())))
+            breaks = []
+            if availability.break_duration:
+                break_start = start + (end - start) / 2
+                minutes = int("".join(c for c in availability.break_duration if c.isdigit()))
+                breaks.append((break_start, break_start + timedelta(minutes=minutes)))
+            current = start
+            while current + duration <= end:
+                slot_end = current + duration
+                if not any(current < b_end and slot_end > b_start for b_start, b_end in breaks):
+                    slots.append({"slot_start": current.strftime("%H:%M"), "slot_end": slot_end.strftime("%H:%M")})
+                current = slot_end
+        return slots or None
+
+    def test_listing_matches_the_uncompiled_rules(self):
+        for offset in range(35):
+            day = date.today() + timedelta(days=offset)
+            self.assertEqual(self.listed(day), self.uncompiled(day), day)
+
+    def test_index_is_not_cached_in_a_per_process_cache(self):
+        day = date.today() + timedelta(days=(2 - date.today().weekday()) % 7)   # a Wednesday
+        self.listed(day)
+        # a change made by another worker: its signal never reaches this process
+        DoctorAvailability.objects.filter(pk=self.rules[1].pk).update(slot_duration="30")
+        self.assertEqual(self.listed(day), self.uncompiled(day))
+
+        with self.settings(AVAILABILITY_INDEX_CACHE=True):
+            self.listed(day)
+            DoctorAvailability.objects.filter(pk=self.rules[1].pk).update(slot_duration="60")
+            self.assertNotEqual(self.listed(day), self.uncompiled(day))
+
+
+class BusyIntervalTests(SimpleTestCase):
+    slots = [(540, 555), (555, 570), (570, 585), (585, 600)]   # 09:00-10:00 in quarters
+
+    def test_adjacent_and_overlapping_intervals_merge(self):
+        self.assertEqual(merge_intervals([(600, 615), (540, 555), (555, 570)]), [[540, 570], [600, 615]])
+        self.assertEqual(merge_intervals([(540, 580), (560, 570), (575, 590)]), [[540, 590]])
+        self.assertEqual(merge_intervals([]), [])
+
+    def test_any_overlap_removes_the_slot(self):
+        # a busy interval covering part of two slots removes both
+        self.assertEqual(subtract_busy(self.slots, [(550, 560)]), [(570, 585), (585, 600)])
+        # touching the edge of a slot doesn't
+        self.assertEqual(subtract_busy(self.slots, [(500, 540), (600, 700)]), self.slots)
+        # unsorted, overlapping intervals
+        self.assertEqual(subtract_busy(self.slots, [(590, 592), (556, 560), (557, 559)]), [(540, 555), (570, 585)])
+        self.assertEqual(subtract_busy(self.slots, []), self.slots)
+
+
+class FreeSlotListingTests(ClinicFixtures, TestCase):
+    def setUp(self):
+        cache.clear()
+        clinic = self.create_clinic()
+        self.doctor = self.create_doctor(clinic)
+        self.patients = [self.create_patient(number) for number in range(2)]
+        self.day = date.today() + timedelta(days=7)
+        DoctorAvailability.objects.create(
+            doctor=self.doctor, day_of_week=list(calendar.day_name), start_time=time(9, 0), end_time=time(12, 0),
+            start_date=date.today(), slot_duration="15",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.patients[0].user)
+
+    def book(self, patient, start, end, **fields):
+        return AppointmentBooking.objects.create(
+            patient=patient, doctor=self.doctor, appointment_date=self.day, start_time=start, end_time=end, **fields,
+        )
+
+    def test_cancelled_bookings_do_not_block(self):
+        self.book(self.patients[1], time(9, 0), time(9, 15), status="Cancelled")
+        self.book(self.patients[1], time(9, 15), time(9, 30))
+        busy = load_busy_intervals([self.doctor.id], self.day, self.day)
+        self.assertEqual(busy[(self.doctor.id, self.day)], [(555, 570)])
+
+    def test_every_listed_slot_can_be_booked(self):
+        # bookings off the slot grid, a cancelled one and another patient's hold
+        self.book(self.patients[1], time(9, 10), time(9, 20))
+        self.book(self.patients[1], time(10, 0), time(10, 45), status="Cancelled")
+        self.book(self.patients[1], time(10, 50), time(11, 5))
+        hold_slot(self.patients[1].user, self.doctor, self.day, time(11, 30), time(11, 45))
+
+        url = reverse("list-doctor-availability", args=[self.doctor.id, self.day.isoformat()])
+        slots = self.client.get(url).json()["data"]["slots"]
+        self.assertEqual(
+            [slot["slot_start"] for slot in slots],
+            ["09:30", "09:45", "10:00", "10:15", "10:30", "11:15", "11:45"],
+        )
+        request = SimpleNamespace(user=self.patients[0].user)
+        for slot in slots:
+            serializer = ClinicAppointmentBookingSerializer(data={
+                "doctor": self.doctor.id, "patient": self.patients[0].id, "appointment_date": self.day,
+                "start_time": slot["slot_start"], "end_time": slot["slot_end"],
+            }, context={"request": request})
+            self.assertTrue(serializer.is_valid(), (slot, serializer.errors))
+
+
+class AvailabilityOverlapTests(ClinicFixtures, TestCase):
+    def setUp(self):
+        clinic = self.create_clinic()
+        self.doctor = self.create_doctor(clinic)
+        self.today = date.today()
+        # open ended: no end_date
+        self.weekdays = DoctorAvailability.objects.create(
+            doctor=self.doctor, day_of_week=["Monday", "Tuesday"], start_time=time(9, 0), end_time=time(12, 0),
+            start_date=self.today, slot_duration="15",
+        )
+        self.weekend = DoctorAvailability.objects.create(
+            doctor=self.doctor, day_of_week=["Saturday"], start_time=time(9, 0), end_time=time(12, 0),
+            start_date=self.today, end_date=self.today + timedelta(days=30), slot_duration="15",
+        )
+
+    def overlapping(self, days, start, end, start_date, end_date, **kwargs):
+        return [
+            availability.id for availability in overlapping_availabilities(
+                self.doctor, normalize_days(days), start, end, start_date, end_date, **kwargs,
+            )
+        ]
+
+    def test_open_ended_rule_overlaps_any_later_range(self):
+        far = self.today + timedelta(days=1000)
+        self.assertEqual(self.overlapping(["Monday"], time(11, 0), time(13, 0), far, far), [self.weekdays.id])
+        self.assertEqual(self.overlapping(["Monday"], time(11, 0), None, far, None), [self.weekdays.id])
+        # ends before the rule starts, or doesn't reach its hours
+        before = self.today - timedelta(days=1)
+        self.assertEqual(self.overlapping(["Monday"], time(9, 0), time(10, 0), None, before), [])
+        self.assertEqual(self.overlapping(["Monday"], time(12, 0), time(13, 0), far, None), [])
+
+    def test_disjoint_weekdays_do_not_overlap(self):
+        self.assertEqual(self.overlapping(["Wednesday", "Sunday"], time(9, 0), time(12, 0), None, None), [])
+        self.assertEqual(
+            self.overlapping(["Tuesday", "Saturday"], time(9, 0), time(12, 0), None, None),
+            [self.weekdays.id, self.weekend.id],
+        )
+        self.assertEqual(self.overlapping(["Saturday"], time(9, 0), time(12, 0), None, None, exclude_pk=self.weekend.id), [])
+
+    def test_update_is_checked_against_the_other_rules(self):
+        client = APIClient()
+        client.force_authenticate(self.doctor.user)
+        url = reverse("update-doctor-availability", args=[self.weekend.id])
+
+        # overlapping its own old hours is fine
+        response = client.patch(url, {"start_time": "10:00", "end_time": "13:00"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        response = client.patch(url, {"day_of_week": ["Saturday", "Monday"]}, format="json")
+        self.assertEqual(response.status_code, 404)
+        self.assertIn(f"id={self.weekdays.id}", response.json()["message"])
+        self.weekend.refresh_from_db()
+        self.assertEqual(self.weekend.day_of_week, ["Saturday"])
+
+
+class SlotRangeTests(ClinicFixtures, TestCase):
+    def setUp(self):
+        cache.clear()
+        clinic = self.create_clinic()
+        self.doctor = self.create_doctor(clinic)
+        self.patient = self.create_patient()
+        self.day = date.today() + timedelta(days=7)
+        # one rule for three days, then another one open ended
+        DoctorAvailability.objects.create(
+            doctor=self.doctor, day_of_week=list(calendar.day_name), start_time=time(9, 0), end_time=time(10, 0),
+            start_date=self.day, end_date=self.day + timedelta(days=2), slot_duration="15",
+        )
+        DoctorAvailability.objects.create(
+            doctor=self.doctor, day_of_week=list(calendar.day_name), start_time=time(14, 0), end_time=time(15, 0),
+            start_date=self.day + timedelta(days=3), slot_duration="30",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(clinic.user)
+
+    def listing(self, first_day, last_day):
+        url = reverse("list-doctor-availability-range", args=[self.doctor.id, str(first_day), str(last_day)])
+        return self.client.get(url).json()
+
+    def test_range_crosses_rule_boundaries_and_skips_busy_slots(self):
+        busy_day = self.day + timedelta(days=1)
+        DoctorUnavailableSlot.objects.create(doctor=self.doctor, date=busy_day, slot_start=time(9, 0), slot_end=time(9, 15))
+        DoctorBlockedSlot.objects.create(doctor=self.doctor, date=busy_day, slot_start=time(9, 15), slot_end=time(9, 30))
+        # unblocked again: still free
+        DoctorBlockedSlot.objects.create(
+            doctor=self.doctor, date=busy_day, slot_start=time(9, 45), slot_end=time(10, 0), is_blocked=False,
+        )
+        AppointmentBooking.objects.create(
+            patient=self.patient, doctor=self.doctor, appointment_date=busy_day,
+            start_time=time(9, 30), end_time=time(9, 45),
+        )
+
+        data = self.listing(self.day - timedelta(days=1), self.day + timedelta(days=4))["data"]
+        starts = {day["date"]: [slot["slot_start"] for slot in day["slots"]] for day in data["days"]}
+        self.assertEqual(list(starts), [str(self.day + timedelta(days=offset)) for offset in range(-1, 5)])
+        self.assertEqual(list(starts.values()), [
+            [],                                      # no rule yet
+            ["09:00", "09:15", "09:30", "09:45"],
+            ["09:45"],                               # deleted, blocked and booked
+            ["09:00", "09:15", "09:30", "09:45"],
+            ["14:00", "14:30"],                      # the open ended rule
+            ["14:00", "14:30"],
+        ])
+
+    def test_range_is_validated(self):
+        self.assertEqual(
+            self.listing(self.day, self.day - timedelta(days=1))["message"], "end_date must be on or after start_date",
+        )
+        self.assertEqual(
+            self.listing(self.day, self.day + timedelta(days=MAX_RANGE_DAYS))["message"],
+            f"Date range cannot exceed {MAX_RANGE_DAYS} days",
+        )
+        days = self.listing(self.day, self.day + timedelta(days=MAX_RANGE_DAYS - 1))["data"]["days"]
+        self.assertEqual(len(days), MAX_RANGE_DAYS)
+
+
+class EarliestSlotTests(ClinicFixtures, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.localdate()
+        self.clinic = self.create_clinic()
+        other_clinic = self.create_clinic(1)
+        self.doctors = [
+            self.create_doctor(self.clinic, 0, specialization="Cardiology"),
+            self.create_doctor(self.clinic, 1, specialization="Cardiology"),
+            self.create_doctor(other_clinic, 2, specialization="Cardiology"),
+        ]
+        # staggered by a quarter hour, half hour slots every day
+        for number, doctor in enumerate(self.doctors):
+            DoctorAvailability.objects.create(
+                doctor=doctor, day_of_week=list(calendar.day_name), start_time=time(9, 15 * number),
+                end_time=time(11, 15 * number), start_date=self.today, slot_duration="30",
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.create_patient().user)
+
+    def search(self, **params):
+        return self.client.get(reverse("search-earliest-slots"), params).json()
+
+    def slots(self, results):
+        return [(result["doctor_id"], result["date"], result["slot_start"]) for result in results]
+
+    def test_slots_of_several_doctors_merge_in_time_order(self):
+        day = str(self.today + timedelta(days=1))
+        results = self.search(specialization="cardiology", start_date=day, limit=5)["data"]
+        first, second, third = (doctor.id for doctor in self.doctors)
+        self.assertEqual(self.slots(results), [
+            # same start: the lower doctor id first
+            (first, day, "09:00"), (second, day, "09:15"), (first, day, "09:30"),
+            (third, day, "09:30"), (second, day, "09:45"),
+        ])
+
+    def test_clinic_login_defaults_to_its_own_doctors(self):
+        self.assertEqual(self.search(start_date=str(self.today))["message"], "specialization or clinic_id is required")
+
+        self.client.force_authenticate(self.clinic.user)
+        day = str(self.today + timedelta(days=1))
+        results = self.search(specialization="cardiology", start_date=day, limit=3)["data"]
+        first, second, _ = (doctor.id for doctor in self.doctors)
+        self.assertEqual(self.slots(results), [(first, day, "09:00"), (second, day, "09:15"), (first, day, "09:30")])
+
+        # an explicit clinic_id still wins
+        other = self.search(start_date=day, clinic_id=self.doctors[2].clinic_id, limit=1)["data"]
+        self.assertEqual(self.slots(other), [(self.doctors[2].id, day, "09:30")])
+
+    def test_limit_stops_expanding_days(self):
+        with mock.patch("clinical_panel_app.availability.rules_for_date", wraps=rules_for_date) as expanded:
+            results = earliest_free_slots(
+                [doctor.id for doctor in self.doctors], self.today + timedelta(days=1),
+                self.today + timedelta(days=60), limit=2,
+            )
+        self.assertEqual(len(results), 2)
+        # one day per doctor, not sixty
+        self.assertEqual(expanded.call_count, len(self.doctors))
+
+    def test_slots_that_already_started_today_are_skipped(self):
+        now = timezone.make_aware(datetime.combine(self.today, time(9, 20)))
+        with mock.patch("clinical_panel_app.views.timezone.localtime", return_value=now):
+            results = self.search(specialization="cardiology", limit=3)["data"]
+        today = str(self.today)
+        first, second, third = (doctor.id for doctor in self.doctors)
+        self.assertEqual(self.slots(results), [(first, today, "09:30"), (third, today, "09:30"), (second, today, "09:45")])
+
+
+class SlotHoldTests(ClinicFixtures, TestCase):
+    def setUp(self):
+        self.doctor = self.create_doctor(self.create_clinic())
+        self.patients = [self.create_patient(i) for i in range(2)]
+        self.day = date.today() + timedelta(days=7)
+
+    def hold(self, patient, start=time(10, 0), end=time(10, 30)):
+        return hold_slot(patient.user, self.doctor, self.day, start, end)
+
+    def booking(self, patient, start=time(10, 0), end=time(10, 30)):
+        return ClinicAppointmentBookingSerializer(
+            data={
+                "doctor": self.doctor.id, "patient": patient.id, "appointment_date": self.day,
+                "start_time": start, "end_time": end,
+            },
+            context={"request": SimpleNamespace(user=patient.user)},
+        )
+
+    def book(self, patient, start=time(10, 0), end=time(10, 30)):
+        serializer = self.booking(patient, start, end)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        return book_appointment(serializer)
+
+    def expire(self, hold):
+        SlotHold.objects.filter(pk=hold.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_held_slot_is_refused_to_other_patients(self):
+        first, second = self.patients
+        hold = self.hold(first)
+        self.assertAlmostEqual(hold.expires_at, timezone.now() + SLOT_HOLD_TTL, delta=timedelta(seconds=5))
+
+        with self.assertRaises(SlotUnavailable):
+            self.hold(second, time(10, 15), time(10, 45))
+        self.assertFalse(self.booking(second).is_valid())
+
+        # a hold taken between validation and saving still wins
+        hold.delete()
+        serializer = self.booking(second)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.hold(first)
+        with self.assertRaises(SlotUnavailable):
+            book_appointment(serializer)
+
+        # next to the hold is free
+        self.hold(second, time(10, 30), time(11, 0))
+
+        # the holder books, which consumes the hold
+        self.book(first)
+        self.assertFalse(SlotHold.objects.filter(held_by=first.user).exists())
+
+    def test_a_patient_keeps_one_hold_per_doctor(self):
+        first, second = self.patients
+        self.hold(first)
+        # holding the same slot again, or another one, replaces the hold
+        self.hold(first)
+        self.hold(first, time(11, 0), time(11, 30))
+        self.assertEqual(
+            list(SlotHold.objects.filter(held_by=first.user).values_list("slot_start", flat=True)), [time(11, 0)],
+        )
+        self.hold(second)
+
+    def test_expired_holds_free_the_slot_and_are_swept(self):
+        first, second = self.patients
+        expired = self.hold(first)
+        live = self.hold(second, time(11, 0), time(11, 30))
+        self.expire(expired)
+
+        self.book(second)
+        self.assertEqual(sweep_expired_holds(), 1)
+        self.assertEqual(list(SlotHold.objects.values_list("id", flat=True)), [live.id])
+        self.assertEqual(sweep_expired_holds(), 0)
+
+    def test_hold_endpoint(self):
+        first, second = self.patients
+        clients = []
+        for patient in self.patients:
+            client = APIClient()
+            client.force_authenticate(patient.user)
+            clients.append(client)
+        payload = {"doctor_id": self.doctor.id, "date": self.day.isoformat(), "slot_start": "10:00", "slot_end": "10:30"}
+
+        response = clients[0].post(reverse("slot-hold"), payload, format="json")
+        self.assertEqual(response.status_code, 201)
+        hold_id = response.json()["data"]["hold_id"]
+
+        response = clients[1].post(reverse("slot-hold"), payload, format="json")
+        self.assertEqual(response.json()["message"], "This time slot is already booked or held")
+
+        # only the holder can release it
+        release = reverse("release-slot-hold", args=[hold_id])
+        self.assertEqual(clients[1].delete(release).json()["message"], "Hold not found")
+        self.assertEqual(clients[0].delete(release).status_code, 200)
+        self.assertEqual(clients[1].post(reverse("slot-hold"), payload, format="json").status_code, 201)
+
+
+@override_settings(MATERIALIZE_DOCTOR_SLOTS=True)
+class MaterializedSlotTests(ClinicFixtures, TestCase):
+    def setUp(self):
+        cache.clear()
+        clinic = self.create_clinic()
+        self.doctor = self.create_doctor(clinic)
+        self.patient = self.create_patient()
+        self.day = date.today() + timedelta(days=3)
+        self.availability = DoctorAvailability.objects.create(
+            doctor=self.doctor, day_of_week=list(calendar.day_name), start_time=time(9, 0), end_time=time(10, 0),
+            start_date=date.today(), end_date=date.today() + timedelta(days=30), slot_duration="15",
+        )
+        extend_doctor_window(self.doctor.id)
+        self.client = APIClient()
+        self.client.force_authenticate(clinic.user)
+
+    def free_slots(self):
+        return materialized_slots(self.doctor.id, self.day, self.day)[self.day]
+
+    def test_rule_changes_rebuild_the_rows(self):
+        self.assertEqual(DoctorSlot.objects.filter(doctor=self.doctor, date=self.day).count(), 4)
+        self.availability.end_time = time(11, 0)
+        self.availability.save()
+        self.assertEqual(len(self.free_slots()), 8)
+
+    def test_bookings_flip_their_slots(self):
+        booking = AppointmentBooking.objects.create(
+            patient=self.patient, doctor=self.doctor, appointment_date=self.day,
+            start_time=time(9, 15), end_time=time(9, 30),
+        )
+        slot = DoctorSlot.objects.get(doctor=self.doctor, date=self.day, slot_start=time(9, 15))
+        self.assertEqual(slot.state, DoctorSlot.BOOKED)
+        self.assertNotIn((555, 570), self.free_slots())
+
+        booking.status = "Cancelled"
+        booking.save()
+        self.assertIn((555, 570), self.free_slots())
+
+    def test_days_outside_the_window_fall_back(self):
+        window = DoctorSlotWindow.objects.get(doctor=self.doctor).generated_until
+        self.assertIsNone(materialized_slots(self.doctor.id, self.day, window + timedelta(days=1)))
+        DoctorSlotWindow.objects.all().delete()
+        self.assertIsNone(materialized_slots(self.doctor.id, self.day, self.day))
+
+    def test_invalid_rule_is_reported_like_on_the_fly_listing(self):
+        self.availability.slot_duration = "soon"
+        with self.assertLogs("clinical_panel_app.slots", "WARNING"):
+            self.availability.save()
+        self.assertIsNone(materialized_slots(self.doctor.id, self.day, self.day))
+
+        response = self.client.get(reverse("list-doctor-availability", args=[self.doctor.id, self.day.isoformat()]))
+        self.assertEqual(response.status_code, 404)
+        self.assertIn("slot_duration", response.json()["message"])
+
+
+class DashboardCounterTests(ClinicFixtures, TestCase):
+    fields = ("date", "appointments", "completed", "waiting_list", "no_show", "patients")
+
+    def setUp(self):
+        clinic = self.create_clinic()
+        self.doctors = [self.create_doctor(clinic, number) for number in range(2)]
+        self.patients = [self.create_patient(number) for number in range(2)]
+
+    def counter_rows(self):
+        # rows left at zero by the signals are never created by a rebuild
+        rows = set()
+        for model, owner in ((DoctorDailyStats, "doctor_id"), (ClinicDailyStats, "clinic_id")):
+            for values in model.objects.values_list(owner, *self.fields):
+                if any(values[2:]):
+                    rows.add((model.__name__, *values))
+        return rows
+
+    def assert_matches_rebuild(self):
+        maintained = self.counter_rows()
+        rebuild_counters()
+        self.assertEqual(maintained, self.counter_rows())
+
+    def test_signals_match_a_rebuild(self):
+        today = date.today()
+        bookings = [
+            AppointmentBooking.objects.create(
+                patient=patient, doctor=doctor, appointment_date=today + timedelta(days=number),
+                start_time=time(9 + number, 0), end_time=time(9 + number, 30),
+            )
+            for number, (patient, doctor) in enumerate(
+                [(self.patients[0], self.doctors[0]), (self.patients[0], self.doctors[1]), (self.patients[1], self.doctors[0])]
+            )
+        ]
+        self.assert_matches_rebuild()
+
+        bookings[0].status = "Completed"
+        bookings[0].save()
+        bookings[1].status = "No-Show"
+        bookings[1].appointment_date = today + timedelta(days=5)
+        bookings[1].save()
+        self.assert_matches_rebuild()
+
+        bookings[2].delete()
+        self.assert_matches_rebuild()
+
+    def test_migrate_backfills_missing_counters(self):
+        AppointmentBooking.objects.create(
+            patient=self.patients[0], doctor=self.doctors[0], appointment_date=date.today(),
+            start_time=time(9, 0), end_time=time(9, 30),
+        )
+        expected = self.counter_rows()
+        DoctorDailyStats.objects.all().delete()
+        ClinicDailyStats.objects.all().delete()
+        self.assertGreater(backfill_counters(), 0)
+        self.assertEqual(self.counter_rows(), expected)
+        # existing counters are left alone
+        self.assertEqual(backfill_counters(), 0)
+
+
+class DoctorListQueryCountTests(ClinicFixtures, TestCase):
+    def setUp(self):
+        # cached users (and search versions) would outlive the rolled back rows
+        cache.clear()
+        self.clinic = self.create_clinic()
+        self.clinic_user = self.clinic.user
+        # a real token, so requests go through the authentication class
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.clinic_user).access_token}")
+        self.patient_number = 0
+
+    def add_doctors(self, count):
+        for _ in range(count):
+            doctor = self.create_doctor(self.clinic, Doctor.objects.count())
+            for hour in (9, 10):
+                self.patient_number += 1
+                patient = self.create_patient(self.patient_number)
+                AppointmentBooking.objects.create(
+                    patient=patient, doctor=doctor, appointment_date=date.today(),
+                    start_time=time(hour, 0), end_time=time(hour, 30),
+                )
+
+    def assert_constant_queries(self, url, queries):
+        for count in (1, 5):
+            # run the on_commit hooks that keep the doctor search index current
+            with self.captureOnCommitCallbacks(execute=True):
+                self.add_doctors(count)
+            # the first request warms the per-process caches; the counts
+            # include the authentication query (no shared cache in tests)
+            self.client.get(url, {"q": "doctor"})
+            with self.assertNumQueries(queries):
+                response = self.client.get(url, {"q": "doctor"})
+            self.assertEqual(response.status_code, 200)
+            for doctor in response.json()["data"]:
+                self.assertEqual(doctor["patients_count"], 2)
+                self.assertEqual(doctor["clinic_name"], "Clinic")
+
+    def test_clinic_doctors_list(self):
+        self.assert_constant_queries(reverse("list-all-doctors"), 2)
+
+    def test_doctor_search(self):
+        # a warm index answers from memory: only the user, watermark and doctors queries remain
+        get_doctor_search().rebuild()
+        self.assert_constant_queries(reverse("search-doctors"), 3)
+
+    def test_doctor_search_ranking(self):
+        get_doctor_search().rebuild()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_doctors(3)
+            doctor = Doctor.objects.get(doctor_name="Doctor 2")
+            doctor.specialization = "Cardiology"
+            doctor.bio = "Heart rhythm"
+            doctor.save()
+
+        # a typo still finds the indexed specialization, bio words count too
+        for query in ("cardiolgy", "rhythm"):
+            names = [doctor["doctor_name"] for doctor in self.client.get(reverse("search-doctors"), {"q": query}).json()["data"]]
+            self.assertEqual(names, ["Doctor 2"])
+
+        names = [doctor["doctor_name"] for doctor in self.client.get(reverse("search-doctors"), {"q": "doctor 0"}).json()["data"]]
+        self.assertEqual(names[0], "Doctor 0")
+
+        for limit in ("0", "-1"):
+            response = self.client.get(reverse("search-doctors"), {"q": "doctor", "limit": limit})
+            self.assertEqual(response.status_code, 404)
+
+    def test_doctors_by_specialty(self):
+        self.assert_constant_queries(reverse("list-doctor-by-specialization", args=["general"]), 2)
+
+
+class AppointmentListQueryCountTests(ClinicFixtures, TestCase):
+    def setUp(self):
+        # cached users (and search versions) would outlive the rolled back rows
+        cache.clear()
+        clinic = self.create_clinic()
+        self.doctor = self.create_doctor(clinic)
+        self.patient = self.create_patient()
+        self.users = {"Clinic": clinic.user, "Doctor": self.doctor.user, "Patient": self.patient.user}
+        self.created = 0
+
+    def add_appointments(self, total):
+        AppointmentBooking.objects.bulk_create([
+            AppointmentBooking(
+                patient=self.patient, doctor=self.doctor,
+                appointment_date=date.today() + timedelta(days=number),
+                start_time=time(9, 0), end_time=time(9, 30),
+            )
+            for number in range(self.created, total)
+        ])
+        self.created = total
+
+    def assert_constant_queries(self, role, url, queries):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.users[role]).access_token}")
+        for total in (1, 25):
+            self.add_appointments(total)
+            # the first request warms the per-process caches; the counts
+            # include the authentication query (no shared cache in tests)
+            client.get(url)
+            with self.assertNumQueries(queries):
+                response = client.get(url)
+            self.assertEqual(len(response.json()["data"]), total)
+            self.assertEqual(response.json()["data"][0]["doctor_name"], "Doctor")
+            self.assertEqual(response.json()["data"][0]["patient_name"], "Patient")
+
+    def test_clinic_appointments(self):
+        self.assert_constant_queries("Clinic", reverse("list-all-appointments-clinic"), 2)
+
+    def test_doctor_appointments(self):
+        self.assert_constant_queries("Doctor", reverse("list-doctor-appointments"), 2)
+
+    def test_patient_appointments(self):
+        self.assert_constant_queries("Patient", reverse("list-patient-appointments"), 2)
+
+    def test_appointments_by_specialization(self):
+        self.assert_constant_queries("Clinic", reverse("list-appointments-by-specialization", args=["general"]), 3)
+
+    def test_keyset_pages_cover_every_appointment_once(self):
+        self.add_appointments(12)
+        client = APIClient()
+        client.force_authenticate(self.users["Clinic"])
+        seen, params = [], {"page_size": 5}
+        while True:
+            body = client.get(reverse("list-all-appointments-clinic"), params).json()
+            seen.extend(row["id"] for row in body["data"])
+            if not body["pagination"]["next_cursor"]:
+                break
+            params["cursor"] = body["pagination"]["next_cursor"]
+        expected = AppointmentBooking.objects.order_by("-appointment_date", "-start_time", "-id")
+        self.assertEqual(seen, list(expected.values_list("id", flat=True)))
+
+    def test_tampered_cursor_is_rejected(self):
+        client = APIClient()
+        client.force_authenticate(self.users["Clinic"])
+        for values in (["x", "y", 1], ["2024-01-01", "09:00", "x"], [None, [], {}]):
+            response = client.get(reverse("list-all-appointments-clinic"), {"cursor": encode_cursor(values)})
+            self.assertEqual(response.status_code, 404, values)
+            self.assertEqual(response.json()["message"], "Invalid cursor")
+
+
+class ExportTests(ClinicFixtures, TestCase):
+    def setUp(self):
+        self.day = date.today() + timedelta(days=7)
+        self.clinics = []
+        for n in range(2):
+            clinic = self.create_clinic(n)
+            doctor = self.create_doctor(clinic, n)
+            patient = self.create_patient(n, full_name=f'Patient, "{n}"')
+            for hour in (9, 10):
+                AppointmentBooking.objects.create(
+                    doctor=doctor, patient=patient, appointment_date=self.day,
+                    start_time=time(hour, 0), end_time=time(hour, 30), reason_for_visit="Checkup",
+                )
+            self.clinics.append((clinic.user, patient))
+        self.client = APIClient()
+        self.client.force_authenticate(self.clinics[0][0])
+
+    def export(self, name, export_format):
+        response = self.client.get(reverse(name, args=[export_format]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response["Content-Disposition"],
+            f'attachment; filename="{name.removeprefix("export-clinic-")}.{export_format}"',
+        )
+        return response["Content-Type"], b"".join(response.streaming_content).decode()
+
+    def test_appointments_as_ndjson(self):
+        content_type, body = self.export("export-clinic-appointments", "ndjson")
+        self.assertEqual(content_type, "application/x-ndjson")
+        rows = [json.loads(line) for line in body.splitlines()]
+        # only the clinic's own doctor's appointments, in date and time order
+        self.assertEqual([row["doctor_name"] for row in rows], ["Doctor 0", "Doctor 0"])
+        self.assertEqual([row["start_time"] for row in rows], ["09:00:00", "10:00:00"])
+        self.assertEqual(rows[0]["appointment_date"], self.day.isoformat())
+        self.assertEqual(rows[0]["patient_name"], 'Patient, "0"')
+        self.assertEqual(list(rows[0]), [column for column, _ in APPOINTMENT_EXPORT_FIELDS])
+
+    def test_patients_as_csv(self):
+        content_type, body = self.export("export-clinic-patients", "csv")
+        self.assertEqual(content_type, "text/csv")
+        rows = list(csv.DictReader(io.StringIO(body)))
+        patient = self.clinics[0][1]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["id"], str(patient.id))
+        self.assertEqual(rows[0]["full_name"], 'Patient, "0"')
+        self.assertEqual(rows[0]["email"], "patient0@example.com")
+
+    def test_unknown_format_and_other_roles_are_refused(self):
+        response = self.client.get(reverse("export-clinic-patients", args=["xml"]))
+        self.assertEqual(response.json()["message"], "export_format must be one of: ndjson, csv")
+
+        self.client.force_authenticate(self.clinics[0][1].user)
+        response = self.client.get(reverse("export-clinic-appointments", args=["csv"]))
+        self.assertEqual(response.json()["message"], "Only Clinic users can access this endpoint")
+
+
+class SyntheticBenchmarkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_benchmarks_run_against_synthetic_data(self):
+        counts = generate_synthetic_data(clinics=1, doctors_per_clinic=2, patients=20, days=14, bookings_per_day=3)
+        self.assertEqual(counts["doctors"], 2)
+        self.assertEqual(AppointmentBooking.objects.count(), counts["appointments"])
+
+        # the booking scenario is over the default query budget; keep the log quiet
+        with mock.patch("superadmin_app.metrics.QUERY_BUDGET", None):
+            report = run_benchmarks(repeat=2, warmup=0)
+        for name, result in report["results"].items():
+            self.assertTrue(all(200 <= status < 300 for status in result["status"]), name)
+        # the booking requests were rolled back
+        self.assertEqual(AppointmentBooking.objects.count(), counts["appointments"])
+
+    def test_list_benchmark_pages_through_every_row(self):
+        out = io.StringIO()
+        with mock.patch("superadmin_app.metrics.QUERY_BUDGET", None):
+            call_command("benchmark_appointment_lists", sizes=[450], repeat=1, stdout=out)
+        lines = out.getvalue().splitlines()[1:]
+        self.assertEqual(len(lines), 4)
+        for line in lines:
+            name, rows, pages = line[:22].strip(), *line[22:].split()[:2]
+            self.assertEqual((rows, pages), ("450", "3"), name)
+        self.assertFalse(AppointmentBooking.objects.exists())
+
+
+# PBKDF2 would make every imported row take most of a second
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class PatientImportTests(ClinicFixtures, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.clinic_user = self.create_clinic().user
+
+    def row(self, number, **fields):
+        row = {
+            "full_name": f"Patient {number}", "age": 30, "gender": "Other", "phone_number": f"98765{number:05d}",
+            "email": f"patient{number}@example.com", "blood_group": "O+",
+            "emergency_contact_name": "x", "emergency_contact_phone": "1", "address": "x",
+        }
+        row.update(fields)
+        return row
+
+    def csv_file(self, rows):
+        text = io.StringIO()
+        writer = csv.DictWriter(text, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+        return io.BytesIO(text.getvalue().encode())
+
+    def test_import_skips_invalid_and_duplicate_rows(self):
+        rows = [self.row(number) for number in range(5)] + [
+            self.row(1),
+            self.row(5, age=-1),
+            self.row(6, email="clinic@example.com"),
+        ]
+
+        summary = import_patients(read_records(self.csv_file(rows), "csv"), chunk_size=2, workers=1)
+        self.assertEqual((summary["created"], summary["skipped"]), (5, 3))
+        self.assertEqual([error["row"] for error in summary["errors"]], [6, 7, 8])
+
+        patient = Patient.objects.get(user__email="patient3@example.com")
+        self.assertEqual(patient.search_phone, "9876500003")
+        self.assertTrue(patient.user.password.startswith("md5$"))
+        self.assertEqual(OutboxEmail.objects.count(), 5)
+
+    def test_passwords_are_hashed_in_a_process_pool(self):
+        rows = [self.row(number) for number in range(4)]
+        summary = import_patients(read_records(self.csv_file(rows), "csv"), chunk_size=3, workers=2)
+        self.assertEqual(summary["created"], 4)
+        user = ProfileUser.objects.get(email="patient2@example.com")
+        self.assertTrue(user.password.startswith("md5$"))
+        self.assertTrue(user.has_usable_password())
+
+    def test_email_registered_during_the_import_is_skipped(self):
+        rows = [self.row(number) for number in range(3)]
+        ProfileUser.objects.create_user(email="patient1@example.com", password="x", role="Patient")
+        taken_emails = imports.taken_emails
+        # the chunk is validated before patient1 registers, the insert after
+        checks = iter([lambda rows: set(), taken_emails])
+
+        with mock.patch("clinical_panel_app.imports.taken_emails", side_effect=lambda rows: next(checks)(rows)):
+            summary = import_patients(read_records(self.csv_file(rows), "csv"), workers=1)
+        self.assertEqual((summary["created"], summary["skipped"]), (2, 1))
+        self.assertEqual(summary["errors"][0]["row"], 2)
+        self.assertEqual(Patient.objects.count(), 2)
+
+    def test_import_endpoint(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.clinic_user).access_token}")
+        upload = "\n".join(json.dumps(self.row(number)) for number in range(3))
+
+        response = client.post(
+            reverse("import-patients", args=["ndjson"]),
+            {"file": SimpleUploadedFile("patients.ndjson", upload.encode())}, format="multipart",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["data"]["created"], 3)
+
+        response = client.post(
+            reverse("import-patients", args=["xml"]),
+            {"file": SimpleUploadedFile("patients.xml", b"<patients/>")}, format="multipart",
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class DoctorOnboardingTests(ClinicFixtures, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.clinic_user = self.create_clinic().user
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.clinic_user).access_token}")
+
+    def doctor(self, number, *availability, **fields):
+        doctor = {
+            "doctor_name": f"Doctor {number}", "specialization": "Cardiology", "phone": "1",
+            "email": f"doctor{number}@example.com", "availability": list(availability),
+        }
+        doctor.update(fields)
+        return doctor
+
+    def rule(self, days, start, end):
+        return {"day_of_week": days, "start_time": start, "end_time": end, "slot_duration": "15"}
+
+    def test_bulk_registration(self):
+        doctors = [
+            self.doctor(1, self.rule(["Monday"], "09:00", "12:00"), self.rule(["Monday"], "14:00", "17:00")),
+            self.doctor(2),
+            self.doctor(3, self.rule(["Monday", "Tuesday"], "09:00", "12:00"), self.rule(["Tuesday"], "11:00", "13:00")),
+            self.doctor(4, email="doctor1@example.com"),
+            self.doctor(5, email="clinic@example.com"),
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("register-doctors-bulk"), {"doctors": doctors}, format="json")
+        self.assertEqual(response.status_code, 201)
+        data = response.json()["data"]
+        self.assertEqual((data["created"], data["skipped"]), (2, 3))
+        self.assertEqual([error["row"] for error in data["errors"]], [3, 4, 5])
+        self.assertIn("availability", data["errors"][0]["errors"])
+
+        first = data["doctors"][0]
+        self.assertEqual(first["row"], 1)
+        self.assertEqual(
+            sorted(DoctorAvailability.objects.filter(doctor_id=first["doctor_id"]).values_list("id", flat=True)),
+            first["availability_ids"],
+        )
+        self.assertEqual(len(first["availability_ids"]), 2)
+        self.assertEqual(Doctor.objects.get(email="doctor2@example.com").user.role, "Doctor")
+        self.assertEqual(OutboxEmail.objects.count(), 2)
+        self.assertEqual(
+            sorted(get_doctor_search().search("cardiology", 10)),
+            sorted(doctor["doctor_id"] for doctor in data["doctors"]),
+        )
+
+    def test_email_registered_during_onboarding_is_skipped(self):
+        ProfileUser.objects.create_user(email="doctor2@example.com", password="x", role="Doctor")
+        taken_emails = imports.taken_emails
+        checks = iter([lambda rows: set(), taken_emails])
+
+        with mock.patch("clinical_panel_app.imports.taken_emails", side_effect=lambda rows: next(checks)(rows)):
+            response = self.client.post(
+                reverse("register-doctors-bulk"), {"doctors": [self.doctor(1), self.doctor(2)]}, format="json",
+            )
+        data = response.json()["data"]
+        self.assertEqual((data["created"], data["skipped"]), (1, 1))
+        self.assertEqual([doctor["row"] for doctor in data["doctors"]], [1])
+        self.assertEqual(data["errors"][0]["row"], 2)
+
+    def test_rejects_empty_and_oversized_batches(self):
+        response = self.client.post(reverse("register-doctors-bulk"), {"doctors": []}, format="json")
+        self.assertEqual(response.status_code, 404)
+        with mock.patch("clinical_panel_app.views.DOCTOR_ONBOARDING_MAX_BATCH", 1):
+            response = self.client.post(
+                reverse("register-doctors-bulk"), {"doctors": [self.doctor(1), self.doctor(2)]}, format="json",
+            )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Doctor.objects.exists())
@@ -5,6 +5,7 @@ urlpatterns = [
     path('get-clinic-profile/', ClinicProfileAPIView.as_view(), name='get-clinic-profile'),
     path('register-doctor/', DoctorRegisterAPIView.as_view(), name='register-doctor'),  
     path('register-doctor/', DoctorRegisterAPIView.as_view(), name='register-doctor'),
+    path('register-doctors/bulk/', DoctorBulkRegisterAPIView.as_view(), name='register-doctors-bulk'),
     path('list-clinic-specializations/', ClinicSpecialtiesListAPIView.as_view(), name='list-clinic-specializations'),
     path('list-doctor-by-specialization/<str:specialty_name>/', ClinicDoctorsBySpecialtyAPIView.as_view(), name='list-doctor-by-specialization'),
     path('list-all-doctors/', ClinicDoctorsListAPIView.as_view(), name='list-all-doctors'),
@@ -15,10 +16,18 @@ urlpatterns = [
     path('update-doctor-availability/<int:availability_id>/', DoctorAvailabilityUpdateAPIView.as_view(), name='update-doctor-availability'),
     path('list-doctor-availability/<int:doctor_id>/<str:date>/', DoctorAvailabilityListAPIView.as_view(), name='list-doctor-availability'),
     path('list-doctor-availability/<str:date>/', DoctorAvailabilityListAPIView.as_view(), name='list-doctor-availability'),
+    path('list-doctor-availability-range/<int:doctor_id>/<str:start_date>/<str:end_date>/', DoctorAvailabilityRangeListAPIView.as_view(), name='list-doctor-availability-range'),
+    path('list-doctor-availability-range/<str:start_date>/<str:end_date>/', DoctorAvailabilityRangeListAPIView.as_view(), name='list-doctor-availability-range'),
+    path('search-earliest-slots/', EarliestAvailableSlotsSearchAPIView.as_view(), name='search-earliest-slots'),
     path('delete-doctor-slots/',DoctorSlotDeleteAPIView.as_view(),name='delete-doctor-slots'),
     path('slots-block-unblock/', DoctorSlotBlockUnblockAPIView.as_view(), name='slots-block-unblock'),
+    path('slot-hold/', SlotHoldAPIView.as_view(), name='slot-hold'),
+    path('slot-hold/<int:hold_id>/', SlotHoldAPIView.as_view(), name='release-slot-hold'),
     path('appointment-booking/', AppointmentBookingAPI.as_view(), name='appointment-booking'),
     path('list-all-appointments-clinic/', ClinicAppointmentsListAPIView.as_view(), name='list-all-appointments-clinic'),
+    path('export-clinic-appointments/<str:export_format>/', ClinicAppointmentsExportAPIView.as_view(), name='export-clinic-appointments'),
+    path('export-clinic-patients/<str:export_format>/', ClinicPatientsExportAPIView.as_view(), name='export-clinic-patients'),
+    path('import-patients/<str:import_format>/', ClinicPatientsImportAPIView.as_view(), name='import-patients'),
     path('list-appointments-by-specialization/<str:specialization>/', AppointmentFilterBySpecializationAPI.as_view(), name='list-appointments-by-specialization'),
     path('list-todays-appointments/<str:specialization>/', TodaysAppointmentFilterBySpecializationAPI.as_view(), name='list-todays-appointments'),
 
@@ -36,7 +45,6 @@ urlpatterns = [
     # clinic or patient
     path('appointment-booking/', AppointmentBookingAPI.as_view(), name='appointment-booking'),
 
-    path("delete_users/<int:pk>/", PatientUserDeleteAPI.as_view(), name="user-delete"),
     path("delete_users/<int:pk>/", UserDeleteAPI.as_view(), name="user-delete"),
 
 
@@ -1,5 +1,5 @@
 import string, random
-from django.core.mail import send_mail
+from superadmin_app.outbox import queue_email
 from django.conf import settings
 import random
 import string
@@ -46,19 +46,17 @@ def send_appointment_email(appointment):
     """
 
     # Send email to patient
-    send_mail(
+    queue_email(
         subject,
         patient_message,
         settings.DEFAULT_FROM_EMAIL,
         [appointment.patient.user.email],
-        fail_silently=False,
     )
 
     # Send email to doctor
-    send_mail(
+    queue_email(
         subject,
         doctor_message,
         settings.DEFAULT_FROM_EMAIL,
         [appointment.doctor.user.email],
-        fail_silently=False,
     )
\ No newline at end of file
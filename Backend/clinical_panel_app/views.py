@@ -1,5 +1,3 @@
-from pyexpat import expat_CAPI
-from tkinter import N
 from django.shortcuts import render
 from superadmin_app.models import *
 from rest_framework.views import APIView
@@ -11,6 +9,9 @@ from django.shortcuts import get_object_or_404
 from superadmin_app.serializers import *
 from .serializers import *
 from superadmin_app.utils import *
+from superadmin_app.idempotency import idempotent
+from superadmin_app.pagination import InvalidCursor, keyset_page
+from superadmin_app.search import DOCTOR_SEARCH_LIMIT, DOCTOR_SEARCH_MAX_LIMIT, get_doctor_search
 from django.db import IntegrityError
 from django.utils import timezone
 from rest_framework.permissions import IsAuthenticated
@@ -19,11 +20,12 @@ from .models import *
 from datetime import datetime, timedelta
 import calendar
 from authentication_app.authentication import CookieJWTAuthentication
+from authentication_app.permissions import IsDoctorOrClinic
 # Create your views here.
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.core.mail import send_mail
+from superadmin_app.outbox import queue_email
 from django.conf import settings
 from superadmin_app.models import Patient, ProfileUser
 from .serializers import *
@@ -31,6 +33,21 @@ from .utils import generate_random_password
 from django.shortcuts import get_object_or_404
 from rest_framework import status, permissions
 from .utils import *
+from .availability import (
+    MAX_RANGE_DAYS, InvalidSlotDuration, date_range, earliest_free_slots,
+    expand_day, format_slot, get_availability_index, load_busy_intervals,
+    normalize_days, overlapping_availabilities, rules_for_date, subtract_busy,
+)
+from .booking import SlotUnavailable, book_appointment, hold_slot
+from .slots import materialized_slots
+from .counters import read_counters
+from .exports import (
+    APPOINTMENT_EXPORT_FIELDS, EXPORT_CONTENT_TYPES, PATIENT_EXPORT_FIELDS, export_response,
+)
+from .imports import (
+    DOCTOR_ONBOARDING_MAX_BATCH, IMPORT_REQUEST_HASH_WORKERS, ImportFormatError, import_patients, onboard_doctors,
+    read_records,
+)
 
 class PatientRegisterAPI(APIView):
     def get(self, request, patient_id, *args, **kwargs):
@@ -82,12 +99,11 @@ class PatientRegisterAPI(APIView):
                 f"Password: {password}\n\n"
                 f"Please log in and change your password after first login."
             )
-            send_mail(
+            queue_email(
                 subject,
                 message,
                 settings.DEFAULT_FROM_EMAIL,
                 [user.email],
-                fail_silently=False,
             )
 
             return  custom_200("Patient registered successfully, login credentials sent to email.")
@@ -131,12 +147,6 @@ class UserDeleteAPI(APIView):
             return custom_404('This patient profile not found.')
 
 
-<<<<<<< HEAD
-# Custom permission: Only Doctors and Clinics can access.
-class IsDoctorOrClinic(permissions.BasePermission):
-    def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.role in ["Doctor", "Clinic"]
-
 class AddPatientVitalsAPI(APIView):
     permission_classes = [IsDoctorOrClinic]
     def post(self, request, patient_id, *args, **kwargs):
@@ -168,8 +178,6 @@ class UpdatePatientVitalsAPI(APIView):
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-=======
->>>>>>> 8c4c14b04225f36ed5634b20fa4755841e0dfe89
 
 # get login clinic profile
 class ClinicProfileAPIView(APIView):
@@ -180,7 +188,7 @@ class ClinicProfileAPIView(APIView):
         if request.user.role != "Clinic":
             return custom_404("Only Clinic users can access this endpoint")
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -198,7 +206,7 @@ class DoctorRegisterAPIView(APIView):
             return custom_404("Only Clinic users can register doctors")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -224,6 +232,36 @@ class DoctorRegisterAPIView(APIView):
         return custom_404(serializer.errors)
     
 
+# register many doctors (with their availability) in one request
+class DoctorBulkRegisterAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if request.user.role != "Clinic":
+            return custom_404("Only Clinic users can register doctors")
+
+        try:
+            clinic = request.user.clinic_profile
+        except Clinic.DoesNotExist:
+            return custom_404("Clinic profile not found")
+
+        doctors = request.data.get("doctors") if isinstance(request.data, dict) else None
+        if not isinstance(doctors, list) or not doctors:
+            return custom_404("doctors must be a non-empty list")
+        if len(doctors) > DOCTOR_ONBOARDING_MAX_BATCH:
+            return custom_404(f"At most {DOCTOR_ONBOARDING_MAX_BATCH} doctors can be registered at once")
+
+        # emails taken meanwhile are reported per row; this is anything else
+        try:
+            summary = onboard_doctors(clinic, doctors, workers=IMPORT_REQUEST_HASH_WORKERS)
+        except IntegrityError:
+            return custom_404("The doctors conflict with existing records; nothing was registered.")
+        return custom_201(
+            f"{summary['created']} doctor(s) registered, {summary['skipped']} skipped. Credentials sent to email.",
+            summary,
+        )
+
+
 # list all doctors of a clinic
 class ClinicDoctorsListAPIView(APIView):
     permission_classes = [IsAuthenticated]
@@ -233,13 +271,18 @@ class ClinicDoctorsListAPIView(APIView):
             return custom_404("Only Clinic users can access this endpoint")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
-        doctors = Doctor.objects.filter(clinic=clinic)
+        doctors = DoctorRegisterSerializer.setup_eager_loading(Doctor.objects.filter(clinic=clinic))
+        try:
+            doctors, pagination = keyset_page(request, doctors, ("id",))
+        except InvalidCursor as e:
+            return custom_404(str(e))
+
         serializer = DoctorRegisterSerializer(doctors, many=True)
-        return custom_200("Doctors fetched successfully", serializer.data)    
+        return custom_200("Doctors fetched successfully", serializer.data, pagination=pagination)    
     
 
 # list all patients of a clinic
@@ -248,11 +291,15 @@ class ClinicPatientsListAPIView(APIView):
 
     def get(self, request):
 
-        patients = Patient.objects.all()
+        try:
+            patients, pagination = keyset_page(request, Patient.objects.all(), ("id",))
+        except InvalidCursor as e:
+            return custom_404(str(e))
+
         serializer = PatientRegisterSerializer(patients, many=True)
-        return custom_200("Patients fetched successfully", serializer.data)
+        return custom_200("Patients fetched successfully", serializer.data, pagination=pagination)
 
-# search doctors by name or specialization
+# ranked, typo tolerant doctor search over name, specialization, clinic and bio
 class DoctorSearchAPIView(APIView):
     permission_classes = [IsAuthenticated]
     def get(self, request):
@@ -261,10 +308,18 @@ class DoctorSearchAPIView(APIView):
         if not query:
             return custom_404("Please provide a search query")
 
-        # Search by doctor_name OR specialization (case-insensitive)
-        doctors = Doctor.objects.filter(
-            Q(doctor_name__icontains=query) | Q(specialization__icontains=query)
-        )
+        try:
+            limit = min(int(request.query_params.get("limit", DOCTOR_SEARCH_LIMIT)), DOCTOR_SEARCH_MAX_LIMIT)
+        except ValueError:
+            return custom_404("limit must be an integer")
+        if limit <= 0:
+            return custom_404("limit must be a positive integer")
+
+        # ranked ids from the search backend (name, specialization, clinic, bio),
+        # then one query for the doctors, kept in rank order
+        ranked = get_doctor_search().search(query, limit)
+        doctors = DoctorRegisterSerializer.setup_eager_loading(Doctor.objects.filter(id__in=ranked))
+        doctors = sorted(doctors, key=lambda doctor: ranked.index(doctor.id))
 
         serializer = DoctorRegisterSerializer(doctors, many=True)
         return custom_200("Doctor listed successfully",serializer.data) 
@@ -504,7 +559,7 @@ class AddDoctorAvailabilityAPIView(APIView):
         # Determine doctor (doctor sets their own OR clinic sets for a doctor)
         if user.role == "Doctor":
             try:
-                doctor = Doctor.objects.get(user=user)
+                doctor = user.doctor_profile
             except Doctor.DoesNotExist:
                 return custom_404("Doctor profile not found")
 
@@ -525,40 +580,6 @@ class AddDoctorAvailabilityAPIView(APIView):
             return custom_404(serializer.errors)
 
         # Helper functions -------------------------------------------------
-        def normalize_days(value):
-            """
-            Accept list or comma-separated string or single string.
-            Return set of weekday names like {'Monday', 'Tuesday', ...}.
-            If empty or None -> treat as ALL days (for duplication safety).
-            """
-            ALL_DAYS = {d for d in calendar.day_name}
-            if not value:
-                return ALL_DAYS
-            if isinstance(value, str):
-                # tolerate single day or comma separated e.g. "Monday,Tuesday"
-                items = [s.strip() for s in value.split(",") if s.strip()]
-            elif isinstance(value, (list, tuple, set)):
-                items = [str(s).strip() for s in value if s is not None]
-            else:
-                # unknown type -> treat as all days (safe)
-                return ALL_DAYS
-
-            days = set()
-            for it in items:
-                # unify to full weekday name if possible
-                name = it.strip()
-                if not name:
-                    continue
-                # allow lower/upper variants
-                for d in calendar.day_name:
-                    if d.lower() == name.lower():
-                        days.add(d)
-                        break
-                else:
-                    # if not recognized, ignore
-                    continue
-            return days or ALL_DAYS
-
         def parse_date(val):
             if val is None:
                 return None
@@ -581,32 +602,6 @@ class AddDoctorAvailabilityAPIView(APIView):
                     continue
             return None
 
-        def date_ranges_overlap(start1, end1, start2, end2):
-            # treat None as open-ended range
-            s1 = start1 or date_cls.min
-            e1 = end1 or date_cls.max
-            s2 = start2 or date_cls.min
-            e2 = end2 or date_cls.max
-            return not (e1 < s2 or e2 < s1)
-
-        def time_ranges_overlap(t1_start, t1_end, t2_start, t2_end):
-            # treat None end as end of day
-            def _norm_start(s):
-                if s is None:
-                    return time_cls(0, 0, 0)
-                return s
-            def _norm_end(e):
-                if e is None:
-                    return time_cls(23, 59, 59)
-                return e
-
-            a1 = _norm_start(t1_start)
-            b1 = _norm_end(t1_end)
-            a2 = _norm_start(t2_start)
-            b2 = _norm_end(t2_end)
-            # overlap if intervals intersect
-            return (a1 < b2) and (a2 < b1)
-
         # Extract new availability values (use validated data when possible)
         validated = serializer.validated_data
 
@@ -620,38 +615,14 @@ class AddDoctorAvailabilityAPIView(APIView):
         if new_start_time is None:
             return custom_404("start_time is required or must be in HH:MM or HH:MM:SS format for duplication check")
 
-        # Query existing availabilities for this doctor
-        existing_qs = DoctorAvailability.objects.filter(doctor=doctor)
-
-        # Check overlaps
-        for exist in existing_qs:
-            exist_day_set = normalize_days(exist.day_of_week)
-            # If weekdays do not intersect, skip
-            if new_day_set.isdisjoint(exist_day_set):
-                continue
-
-            # Parse existing date/time fields
-            exist_start_date = exist.start_date
-            exist_end_date = exist.end_date
-            # if either range doesn't intersect in date dimension -> skip
-            if not date_ranges_overlap(new_start_date, new_end_date, exist_start_date, exist_end_date):
-                continue
-
-            exist_start_time = exist.start_time
-            exist_end_time = exist.end_time
-
-            # If times overlap -> this is a duplication / overlap
-            if time_ranges_overlap(new_start_time, new_end_time, exist_start_time, exist_end_time):
-                # Build useful message with conflict details
-                conflict_days = sorted(list(new_day_set.intersection(exist_day_set)))
-                msg = (
-                    "Availability overlaps with an existing availability."
-                    f" Existing availability id={exist.id}, days={exist.day_of_week},"
-                    f" time={exist.start_time} - {exist.end_time},"
-                    f" date_range={exist.start_date} - {exist.end_date}."
-                    f" Overlapping weekdays: {conflict_days}."
-                )
-                return custom_404(msg)
+        # Only availabilities overlapping in date and time range come back from
+        # the (indexed) query; weekdays are compared on that short list
+        conflicts = overlapping_availabilities(
+            doctor, new_day_set, new_start_time, new_end_time, new_start_date, new_end_date
+        )
+
+        if conflicts:
+            return custom_404(availability_conflict_message(conflicts[0], new_day_set))
 
         # No overlaps found -> safe to save
         availability = serializer.save(doctor=doctor)
@@ -666,6 +637,17 @@ class AddDoctorAvailabilityAPIView(APIView):
         })
 
 
+def availability_conflict_message(exist, day_set):
+    conflict_days = sorted(day_set.intersection(normalize_days(exist.day_of_week)))
+    return (
+        "Availability overlaps with an existing availability."
+        f" Existing availability id={exist.id}, days={exist.day_of_week},"
+        f" time={exist.start_time} - {exist.end_time},"
+        f" date_range={exist.start_date} - {exist.end_date}."
+        f" Overlapping weekdays: {conflict_days}."
+    )
+
+
 # update availability by clinic or doctor
 class DoctorAvailabilityUpdateAPIView(APIView):
     permission_classes = [IsAuthenticated]
@@ -681,7 +663,7 @@ class DoctorAvailabilityUpdateAPIView(APIView):
         # Case 1: Doctor updating their own availability
         if user.role == "Doctor":
             try:
-                doctor = Doctor.objects.get(user=user)
+                doctor = user.doctor_profile
             except Doctor.DoesNotExist:
                 return custom_404("Doctor profile not found")
 
@@ -704,11 +686,26 @@ class DoctorAvailabilityUpdateAPIView(APIView):
             availability, data=request.data, partial=True
         )
 
-        if serializer.is_valid():
-            serializer.save()
-            return custom_200("Availability updated successfully", serializer.data)
+        if not serializer.is_valid():
+            return custom_404(serializer.errors)
 
-        return custom_404(serializer.errors)
+        # the rule as it will be after the update must not overlap the
+        # doctor's other rules (it is allowed to overlap its old self)
+        validated = serializer.validated_data
+
+        def updated(field):
+            return validated[field] if field in validated else getattr(availability, field)
+
+        day_set = normalize_days(updated("day_of_week"))
+        conflicts = overlapping_availabilities(
+            updated("doctor"), day_set, updated("start_time"), updated("end_time"),
+            updated("start_date"), updated("end_date"), exclude_pk=availability.pk,
+        )
+        if conflicts:
+            return custom_404(availability_conflict_message(conflicts[0], day_set))
+
+        serializer.save()
+        return custom_200("Availability updated successfully", serializer.data)
 
 
 
@@ -838,7 +835,7 @@ class DoctorAvailabilityListAPIView(APIView):
         # Logged-in Doctor (no doctor_id required)
         if user.role == "Doctor" and doctor_id is None:
             try:
-                doctor = Doctor.objects.get(user=user)
+                doctor = user.doctor_profile
             except Doctor.DoesNotExist:
                 return custom_404("Doctor profile not found")
 
@@ -851,82 +848,35 @@ class DoctorAvailabilityListAPIView(APIView):
             except Doctor.DoesNotExist:
                 return custom_404("Doctor not found")
 
-        day_of_week = calendar.day_name[selected_date.weekday()]
-
-        # Query doctor availability
-        availabilities_qs = DoctorAvailability.objects.filter(
-            doctor=doctor,
-            start_date__lte=selected_date
-        ).filter(
-            models.Q(end_date__isnull=True) | models.Q(end_date__gte=selected_date)
-        )
+        # Materialized slots are a single range scan when the day is covered
+        materialized = materialized_slots(doctor.id, selected_date, selected_date, viewer=user)
+        if materialized is not None:
+            if selected_date not in materialized:
+                return custom_404("No availability found for this doctor on given date")
+            return custom_200("Available slots fetched successfully", {
+                "doctor_id": doctor.id,
+                "doctor_name": doctor.doctor_name,
+                "date": selected_date.strftime("%Y-%m-%d"),
+                "slots": [format_slot(slot_start, slot_end) for slot_start, slot_end in materialized[selected_date]]
+            })
 
-        # Filter by weekday in Python
-        availabilities = [
-            a for a in availabilities_qs
-            if day_of_week in a.day_of_week
-        ]
+        # Compiled availability rules (weekday bitmask, minute offsets)
+        rules = get_availability_index(doctor.id)
 
-        if not availabilities:
+        if not rules_for_date(rules, selected_date):
             return custom_404("No availability found for this doctor on given date")
 
-        all_slots = []
-
-        for availability in availabilities:
-            start_time = datetime.combine(selected_date, availability.start_time)
-            end_time = datetime.combine(selected_date, availability.end_time)
-
-            try:
-                slot_minutes = int("".join([c for c in availability.slot_duration if c.isdigit()]))
-                duration = timedelta(minutes=slot_minutes)
-            except (ValueError, TypeError):
-                return custom_404("Invalid slot_duration format, must contain integer minutes")
-
-            break_periods = []
-            if availability.break_duration:
-                breaks = availability.break_duration if isinstance(availability.break_duration, list) else [availability.break_duration]
-
-                for b in breaks:
-                    try:
-                        break_minutes = int("".join([c for c in str(b) if c.isdigit()]))
-                        mid_point = start_time + (end_time - start_time) / 2
-                        break_start = mid_point
-                        break_end = break_start + timedelta(minutes=break_minutes)
-                        break_periods.append((break_start, break_end))
-                    except (ValueError, TypeError):
-                        continue
-
-            # ✅ Generate slots
-            current_time = start_time
-            while current_time + duration <= end_time:
-                slot_start = current_time
-                slot_end = current_time + duration
-
-                # Exclude break overlaps
-                in_break = any(
-                    slot_start < b_end and slot_end > b_start
-                    for b_start, b_end in break_periods
-                )
-
-                if not in_break:
-                    all_slots.append({
-                        "slot_start": slot_start.strftime("%H:%M"),
-                        "slot_end": slot_end.strftime("%H:%M"),
-                    })
-
-                current_time += duration
-
-        # 🚫 Exclude unavailable slots from DoctorUnavailableSlot
-        unavailable = DoctorUnavailableSlot.objects.filter(
-            doctor=doctor,
-            date=selected_date
-        ).values_list("slot_start", "slot_end")
+        try:
+            all_slots = expand_day(rules, selected_date)
+        except InvalidSlotDuration:
+            return custom_404("Invalid slot_duration format, must contain integer minutes")
 
-        unavailable_set = {(s.strftime("%H:%M"), e.strftime("%H:%M")) for s, e in unavailable}
+        # 🚫 Exclude deleted (DoctorUnavailableSlot), blocked, booked and held slots
+        busy = load_busy_intervals([doctor.id], selected_date, selected_date, viewer=user)
 
         filtered_slots = [
-            slot for slot in all_slots
-            if (slot["slot_start"], slot["slot_end"]) not in unavailable_set
+            format_slot(slot_start, slot_end)
+            for slot_start, slot_end in subtract_busy(all_slots, busy.get((doctor.id, selected_date)))
         ]
 
         return custom_200("Available slots fetched successfully", {
@@ -935,10 +885,150 @@ class DoctorAvailabilityListAPIView(APIView):
             "date": selected_date.strftime("%Y-%m-%d"),
             "slots": filtered_slots
         })
-<<<<<<< HEAD
-=======
 
->>>>>>> 8c4c14b04225f36ed5634b20fa4755841e0dfe89
+
+# list available slots for a doctor over a date range (week / month views)
+class DoctorAvailabilityRangeListAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, start_date, end_date, doctor_id=None):
+        user = request.user
+
+        try:
+            first_day = datetime.strptime(start_date, "%Y-%m-%d").date()
+            last_day = datetime.strptime(end_date, "%Y-%m-%d").date()
+        except ValueError:
+            return custom_404("Invalid date format, expected YYYY-MM-DD")
+
+        if last_day < first_day:
+            return custom_404("end_date must be on or after start_date")
+
+        if (last_day - first_day).days + 1 > MAX_RANGE_DAYS:
+            return custom_404(f"Date range cannot exceed {MAX_RANGE_DAYS} days")
+
+        # Logged-in Doctor (no doctor_id required)
+        if user.role == "Doctor" and doctor_id is None:
+            try:
+                doctor = user.doctor_profile
+            except Doctor.DoesNotExist:
+                return custom_404("Doctor profile not found")
+
+        # Clinic or Patient providing doctor_id
+        else:
+            if not doctor_id:
+                return custom_404("doctor_id is required for this request")
+            try:
+                doctor = Doctor.objects.get(id=doctor_id)
+            except Doctor.DoesNotExist:
+                return custom_404("Doctor not found")
+
+        materialized = materialized_slots(doctor.id, first_day, last_day, viewer=user)
+        if materialized is None:
+            rules = get_availability_index(doctor.id)
+            # deleted, blocked, booked and held slots for the whole range, one query each
+            busy = load_busy_intervals([doctor.id], first_day, last_day, viewer=user)
+
+        days = []
+        for day in date_range(first_day, last_day):
+            if materialized is not None:
+                slots = materialized.get(day, [])
+            else:
+                try:
+                    slots = expand_day(rules, day)
+                except InvalidSlotDuration:
+                    return custom_404("Invalid slot_duration format, must contain integer minutes")
+
+                slots = subtract_busy(slots, busy.get((doctor.id, day)))
+            days.append({
+                "date": day.strftime("%Y-%m-%d"),
+                "slots": [format_slot(slot_start, slot_end) for slot_start, slot_end in slots],
+            })
+
+        return custom_200("Available slots fetched successfully", {
+            "doctor_id": doctor.id,
+            "doctor_name": doctor.doctor_name,
+            "start_date": first_day.strftime("%Y-%m-%d"),
+            "end_date": last_day.strftime("%Y-%m-%d"),
+            "days": days
+        })
+
+
+# earliest free slots across all doctors of a specialization and/or clinic
+class EarliestAvailableSlotsSearchAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Query params: specialization, clinic_id, start_date, end_date (YYYY-MM-DD), limit
+        Clinic login without clinic_id searches its own doctors.
+        """
+        user = request.user
+        specialization = request.query_params.get("specialization", "").strip()
+        clinic_id = request.query_params.get("clinic_id")
+
+        if not clinic_id and user.role == "Clinic":
+            try:
+                clinic_id = Clinic.objects.only("id").get(user=user).id
+            except Clinic.DoesNotExist:
+                return custom_404("Clinic profile not found")
+
+        if not specialization and not clinic_id:
+            return custom_404("specialization or clinic_id is required")
+
+        now = timezone.localtime()
+        try:
+            first_day = (
+                datetime.strptime(request.query_params["start_date"], "%Y-%m-%d").date()
+                if request.query_params.get("start_date") else now.date()
+            )
+            last_day = (
+                datetime.strptime(request.query_params["end_date"], "%Y-%m-%d").date()
+                if request.query_params.get("end_date") else first_day + timedelta(days=13)
+            )
+        except ValueError:
+            return custom_404("Invalid date format, expected YYYY-MM-DD")
+
+        if last_day < first_day:
+            return custom_404("end_date must be on or after start_date")
+
+        if (last_day - first_day).days + 1 > MAX_RANGE_DAYS:
+            return custom_404(f"Date range cannot exceed {MAX_RANGE_DAYS} days")
+
+        try:
+            limit = min(int(request.query_params.get("limit", 10)), 100)
+        except ValueError:
+            return custom_404("limit must be an integer")
+        if limit <= 0:
+            return custom_404("limit must be a positive integer")
+
+        doctors = Doctor.objects.all()
+        if specialization:
+            doctors = doctors.filter(specialization__iexact=specialization)
+        if clinic_id:
+            doctors = doctors.filter(clinic_id=clinic_id)
+        doctors = {d["id"]: d for d in doctors.values("id", "doctor_name", "specialization", "clinic_id")}
+
+        if not doctors:
+            return custom_404("No doctors found for the given filters")
+
+        # slots that already started today can't be booked any more
+        not_before = (now.date(), now.hour * 60 + now.minute)
+        slots = earliest_free_slots(list(doctors), first_day, last_day, limit, not_before, viewer=user)
+
+        results = []
+        for day, slot_start, slot_end, doctor_id in slots:
+            doctor = doctors[doctor_id]
+            results.append({
+                "doctor_id": doctor_id,
+                "doctor_name": doctor["doctor_name"],
+                "specialization": doctor["specialization"],
+                "clinic_id": doctor["clinic_id"],
+                "date": day.strftime("%Y-%m-%d"),
+                **format_slot(slot_start, slot_end),
+            })
+
+        return custom_200("Earliest available slots fetched successfully", results)
+
 
 
 # Block or unblock doctor slots
@@ -963,7 +1053,7 @@ class DoctorSlotBlockUnblockAPIView(APIView):
        
         if user.role == "Doctor":
             try:
-                doctor = Doctor.objects.get(user=user)
+                doctor = user.doctor_profile
             except Doctor.DoesNotExist:
                 return custom_404("Doctor profile not found")
      
@@ -1016,7 +1106,7 @@ class DoctorSlotBlockUnblockAPIView(APIView):
         # Case 1: If Doctor is logged in
         if user.role == "Doctor":
             try:
-                doctor = Doctor.objects.get(user=user)
+                doctor = user.doctor_profile
             except Doctor.DoesNotExist:
                 return custom_404("Doctor profile not found")
         # Case 2: Clinic/Staff must provide doctor_id
@@ -1080,7 +1170,7 @@ class DoctorSlotDeleteAPIView(APIView):
         # If doctor logs in, use their ID
         if user.role == "Doctor" and doctor_id is None:
             try:
-                doctor = Doctor.objects.get(user=user)
+                doctor = user.doctor_profile
             except Doctor.DoesNotExist:
                 return custom_404("Doctor profile not found")
         else:
@@ -1161,12 +1251,11 @@ class PatientRegisterAPI(APIView):
                 f"Password: {password}\n\n"
                 f"Please log in and change your password after first login."
             )
-            send_mail(
+            queue_email(
                 subject,
                 message,
                 settings.DEFAULT_FROM_EMAIL,
                 [user.email],
-                fail_silently=False,
             )
 
             return custom_201( "Patient registered successfully, login credentials sent to email.")
@@ -1234,7 +1323,62 @@ class UserDeleteAPI(APIView):
 #         serializer = PatientRegisterSerializer(patients, many=True)
 #         return custom_200("Patients fetched successfully", serializer.data)
 
-<<<<<<< HEAD
+# hold a slot for a few minutes while the user finishes booking / payment
+class SlotHoldAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Payload: { "doctor_id": 1, "date": "2025-08-26", "slot_start": "10:00", "slot_end": "10:30" }
+        """
+        doctor_id = request.data.get("doctor_id")
+        date = request.data.get("date")
+        slot_start = request.data.get("slot_start")
+        slot_end = request.data.get("slot_end")
+
+        if not all([doctor_id, date, slot_start, slot_end]):
+            return custom_404("doctor_id, date, slot_start, slot_end are required")
+
+        try:
+            doctor = Doctor.objects.get(id=doctor_id)
+        except Doctor.DoesNotExist:
+            return custom_404("Doctor not found")
+
+        try:
+            slot_date = datetime.strptime(date, "%Y-%m-%d").date()
+            slot_start_time = datetime.strptime(slot_start, "%H:%M").time()
+            slot_end_time = datetime.strptime(slot_end, "%H:%M").time()
+        except ValueError:
+            return custom_404("Invalid date/time format")
+
+        if slot_end_time <= slot_start_time:
+            return custom_404("slot_end must be after slot_start")
+
+        starts_at = timezone.make_aware(datetime.combine(slot_date, slot_start_time), timezone.get_current_timezone())
+        if starts_at < timezone.now():
+            return custom_404("Cannot hold a slot in the past")
+
+        try:
+            hold = hold_slot(request.user, doctor, slot_date, slot_start_time, slot_end_time)
+        except SlotUnavailable:
+            return custom_404("This time slot is already booked or held")
+
+        return custom_201("Slot held successfully", {
+            "hold_id": hold.id,
+            "doctor_id": doctor.id,
+            "date": slot_date,
+            "slot_start": slot_start,
+            "slot_end": slot_end,
+            "expires_at": hold.expires_at
+        })
+
+    def delete(self, request, hold_id):
+        deleted, _ = SlotHold.objects.filter(id=hold_id, held_by=request.user).delete()
+        if not deleted:
+            return custom_404("Hold not found")
+        return custom_200("Slot hold released successfully")
+
+
 # booking appointment by clinic or patient
 class AppointmentBookingAPI(APIView):
     permission_classes = [IsAuthenticated]
@@ -1250,21 +1394,17 @@ class AppointmentBookingAPI(APIView):
             return SuperAdminAppointmentBookingSerializer
         return BaseAppointmentBookingSerializer
 
-=======
-#booking appointment by clinic or patient
-
-class AppointmentBookingAPI(APIView):
-    permission_classes = [IsAuthenticated]
-
->>>>>>> 8c4c14b04225f36ed5634b20fa4755841e0dfe89
+    @idempotent
     def post(self, request):
         user = request.user
         data = request.data.copy()
 
-<<<<<<< HEAD
-        # Patient auto-attach
+        save_kwargs = {}
+
+        # Patient auto-attach (patient is read-only on the patient serializer)
         if user.role == "Patient" and hasattr(user, "patient_profile"):
             data["patient"] = user.patient_profile.id
+            save_kwargs["patient"] = user.patient_profile
         print('----------',data)
 
         # Doctor auto-attach doctor_id if not provided
@@ -1272,34 +1412,20 @@ class AppointmentBookingAPI(APIView):
             data["doctor"] = user.doctor_profile.id
 
         serializer_class = self.get_serializer_class(user)
-        serializer = serializer_class(data=data)
+        serializer = serializer_class(data=data, context={"request": request})
 
         if serializer.is_valid():
-            appointment = serializer.save()
+            # validate() already rejected known overlaps; this re-checks and
+            # inserts under the doctor/day lock so concurrent requests can't
+            # both get the slot
+            try:
+                appointment = book_appointment(serializer, **save_kwargs)
+            except SlotUnavailable:
+                return custom_404({"appointment": ["This time slot is already booked."]})
             send_appointment_email(appointment)
             return custom_201("Appointment booked successfully", serializer.data)
 
         # Now you’ll get field-level validation errors like in your example
-=======
-        # Case 1: Patient booking themselves
-        if hasattr(user, "patient_profile"):  
-            data["patient"] = user.patient_profile.id
-
-        # Case 2: Clinic/staff booking by giving patient_id
-        else:
-            patient_id = data.get("patient")
-            if not patient_id:
-                return custom_404("patient_id is required when clinic is booking")
-            data["patient"] = patient_id
-
-        serializer = AppointmentBookingSerializer(data=data)
-        if serializer.is_valid():
-            appointment = serializer.save()
-
-            # Send notification emails
-            send_appointment_email(appointment)
-
-            return custom_201( "Appointment booked successfully", serializer.data )
         return custom_404(serializer.errors)
 
 
@@ -1321,16 +1447,20 @@ class TodaysAppointmentFilterBySpecializationAPI(APIView):
         today = timezone.now().date()
 
         # Fetch today's appointments for those doctors
-        appointments = AppointmentBooking.objects.filter(
+        appointments = AppointmentBookingSerializer.setup_eager_loading(AppointmentBooking.objects.filter(
             doctor__in=doctors,
             appointment_date=today
-        ).order_by("appointment_date", "start_time")
+        ))
+        try:
+            appointments, pagination = keyset_page(request, appointments, ("appointment_date", "start_time", "id"))
+        except InvalidCursor as e:
+            return custom_404(str(e))
 
-        if not appointments.exists():
+        if not appointments:
             return custom_404(f"No appointments found for specialization '{specialization}' today")
 
         serializer = AppointmentBookingSerializer(appointments, many=True)
-        return custom_200("Today's appointments listed successfully", serializer.data)
+        return custom_200("Today's appointments listed successfully", serializer.data, pagination=pagination)
 # list all appointments of doctors in the clinic
 class ClinicAppointmentsListAPIView(APIView):
     permission_classes = [IsAuthenticated]
@@ -1340,7 +1470,7 @@ class ClinicAppointmentsListAPIView(APIView):
             return custom_404("Only Clinic users can access this endpoint")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -1348,10 +1478,82 @@ class ClinicAppointmentsListAPIView(APIView):
         doctors = Doctor.objects.filter(clinic=clinic)
 
        
-        appointments = AppointmentBooking.objects.filter(doctor__in=doctors).order_by('-appointment_date', '-start_time')
+        appointments = AppointmentBookingSerializer.setup_eager_loading(
+            AppointmentBooking.objects.filter(doctor__in=doctors)
+        )
+        try:
+            appointments, pagination = keyset_page(request, appointments, ("-appointment_date", "-start_time", "-id"))
+        except InvalidCursor as e:
+            return custom_404(str(e))
 
         serializer = AppointmentBookingSerializer(appointments, many=True)
-        return custom_200("Appointments fetched successfully", serializer.data)    
+        return custom_200("Appointments fetched successfully", serializer.data, pagination=pagination)    
+
+# stream all appointments of doctors in the clinic as NDJSON or CSV
+class ClinicAppointmentsExportAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, export_format):
+        if request.user.role != "Clinic":
+            return custom_404("Only Clinic users can access this endpoint")
+
+        if export_format not in EXPORT_CONTENT_TYPES:
+            return custom_404("export_format must be one of: " + ", ".join(EXPORT_CONTENT_TYPES))
+
+        try:
+            clinic = request.user.clinic_profile
+        except Clinic.DoesNotExist:
+            return custom_404("Clinic profile not found")
+
+        appointments = AppointmentBooking.objects.filter(
+            doctor__clinic=clinic
+        ).order_by("appointment_date", "start_time", "id")
+
+        return export_response(appointments, APPOINTMENT_EXPORT_FIELDS, export_format, "appointments")
+
+
+# stream the patients who booked with the clinic's doctors as NDJSON or CSV
+class ClinicPatientsExportAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, export_format):
+        if request.user.role != "Clinic":
+            return custom_404("Only Clinic users can access this endpoint")
+
+        if export_format not in EXPORT_CONTENT_TYPES:
+            return custom_404("export_format must be one of: " + ", ".join(EXPORT_CONTENT_TYPES))
+
+        try:
+            clinic = request.user.clinic_profile
+        except Clinic.DoesNotExist:
+            return custom_404("Clinic profile not found")
+
+        patients = Patient.objects.filter(
+            id__in=AppointmentBooking.objects.filter(doctor__clinic=clinic).values("patient_id")
+        ).order_by("id")
+
+        return export_response(patients, PATIENT_EXPORT_FIELDS, export_format, "patients")
+
+
+# bulk patient import from a CSV / NDJSON / JSON upload (field "file")
+class ClinicPatientsImportAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, import_format):
+        if request.user.role != "Clinic":
+            return custom_404("Only Clinic users can access this endpoint")
+
+        upload = request.FILES.get("file")
+        if upload is None:
+            return custom_404("Upload the patients as a 'file' field")
+        upload.seek(0)
+
+        try:
+            summary = import_patients(read_records(upload.file, import_format), workers=IMPORT_REQUEST_HASH_WORKERS)
+        except ImportFormatError as e:
+            return custom_404(str(e))
+        return custom_201(f"{summary['created']} patient(s) imported, {summary['skipped']} skipped", summary)
+
 
 # list appointments based on each specialization
 
@@ -1371,10 +1573,16 @@ class AppointmentFilterBySpecializationAPI(APIView):
             return custom_404(f"No doctors found for specialization '{specialization}'" )
 
         # Fetch appointments for those doctors
-        appointments = AppointmentBooking.objects.filter(doctor__in=doctors).order_by("appointment_date", "start_time")
+        appointments = AppointmentBookingSerializer.setup_eager_loading(
+            AppointmentBooking.objects.filter(doctor__in=doctors)
+        )
+        try:
+            appointments, pagination = keyset_page(request, appointments, ("appointment_date", "start_time", "id"))
+        except InvalidCursor as e:
+            return custom_404(str(e))
 
         serializer = AppointmentBookingSerializer(appointments, many=True)
-        return custom_200("Appointment listed successfully",serializer.data)
+        return custom_200("Appointment listed successfully",serializer.data, pagination=pagination)
 
 
 
@@ -1387,7 +1595,7 @@ class ClinicSpecialtiesListAPIView(APIView):
             return custom_404("Only Clinic users can access this endpoint")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -1405,20 +1613,24 @@ class ClinicDoctorsBySpecialtyAPIView(APIView):
             return custom_404("Only Clinic users can access this endpoint")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
-        doctors = Doctor.objects.filter(
+        doctors = DoctorRegisterSerializer.setup_eager_loading(Doctor.objects.filter(
             clinic=clinic,
             specialization__iexact=specialty_name
-        )
+        ))
+        try:
+            doctors, pagination = keyset_page(request, doctors, ("id",))
+        except InvalidCursor as e:
+            return custom_404(str(e))
 
-        if not doctors.exists():
+        if not doctors:
             return custom_404("No doctors found for this specialty in your clinic")
 
         serializer = DoctorRegisterSerializer(doctors, many=True)
-        return custom_200("Doctors fetched successfully", serializer.data)   
+        return custom_200("Doctors fetched successfully", serializer.data, pagination=pagination)   
     
 
 # total patients , todays appointments , todays appointments completed , total wiating list and total no shows appointments count for clinic dashboard
@@ -1430,40 +1642,23 @@ class ClinicDashboardStatsCountAPIView(APIView):
             return custom_404("Only Clinic users can access this endpoint")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
-        # Total patients associated with this clinic's doctors
-        doctors = Doctor.objects.filter(clinic=clinic)
-        total_patients = Patient.objects.count()
-
         # Today's date
         today = datetime.now().date()
 
-        # Today's appointments for this clinic's doctors
-        todays_appointments = AppointmentBooking.objects.filter(
-            doctor__in=doctors,
-            appointment_date=today
-        )
-
-        total_todays_appointments = todays_appointments.count()
-        total_completed_appointments = todays_appointments.filter(status="Completed").count()
-        total_waiting_list = AppointmentBooking.objects.filter(
-            doctor__in=doctors,
-            status="Waiting List"
-        ).count()
-        total_no_shows = AppointmentBooking.objects.filter(
-            doctor__in=doctors,
-            status="No-Show"
-        ).count()
+        # lifetime and today's counter rows, kept up to date by signals
+        lifetime, todays = read_counters(ClinicDailyStats, "clinic_id", clinic.id, today)
 
         stats = {
-            "total_patients": total_patients,
-            "total_todays_appointments": total_todays_appointments,
-            "total_completed_appointments": total_completed_appointments,
-            "total_waiting_list": total_waiting_list,
-            "total_no_shows": total_no_shows
+            # patients associated with this clinic's doctors
+            "total_patients": lifetime.patients,
+            "total_todays_appointments": todays.appointments,
+            "total_completed_appointments": todays.completed,
+            "total_waiting_list": lifetime.waiting_list,
+            "total_no_shows": lifetime.no_show
         }
 
         return custom_200("Dashboard stats fetched successfully", stats)    
@@ -1481,7 +1676,7 @@ class ClinicProfileEditAPIView(APIView):
             return custom_404("Only Clinic users can edit clinic profile")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -1504,7 +1699,7 @@ class ClinicAccreditationAPIView(APIView):
             return custom_404("Only Clinic users can view accreditations")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -1533,7 +1728,7 @@ class ClinicAccreditationAPIView(APIView):
             return custom_404("Only Clinic users can add accreditations")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -1560,7 +1755,7 @@ class ClinicAccreditationAPIView(APIView):
             return custom_404("Only Clinic users can update accreditations")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -1586,7 +1781,7 @@ class ClinicAccreditationDeleteAPIView(APIView):
             return custom_404("Only Clinic users can delete accreditations")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -1610,7 +1805,7 @@ class ClinicMedicalFacilityAPIView(APIView):
             return custom_404("Only Clinic users can view medical patient facilities")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -1643,7 +1838,7 @@ class ClinicMedicalFacilityAPIView(APIView):
             return custom_404("Only Clinic users can add medical patient facilities")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -1668,7 +1863,7 @@ class ClinicMedicalFacilityAPIView(APIView):
             return custom_404("Only Clinic users can update accreditations")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -1696,7 +1891,7 @@ class ClinicMedicalFacilitiesDeleteAPIView(APIView):
             return custom_404("Only Clinic users can delete accreditations")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -1720,7 +1915,7 @@ class ClinicPatientAmenitiesAPIView(APIView):
             return custom_404("Only Clinic users can view medical patient facilities")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -1751,7 +1946,7 @@ class ClinicPatientAmenitiesAPIView(APIView):
             return custom_404("Only Clinic users can add patient amenities")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -1776,7 +1971,7 @@ class ClinicPatientAmenitiesAPIView(APIView):
             return custom_404("Only Clinic users can update accreditations")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -1801,7 +1996,7 @@ class ClinicPatientAmenityDeleteAPIView(APIView):
             return custom_404("Only Clinic users can delete accreditations")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -1886,7 +2081,7 @@ class ClinicAddressEditAPIView(APIView):
             return custom_404("Only Clinic users can edit clinic address")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -1909,7 +2104,7 @@ class ClinicContactInfoEditAPIView(APIView):
             return custom_404("Only Clinic users can edit clinic contact information")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -1933,7 +2128,7 @@ class ClinicSpecialtiesAddListAPIView(APIView):
             return custom_404("Only Clinic users can view specialties")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -1946,7 +2141,7 @@ class ClinicSpecialtiesAddListAPIView(APIView):
             return custom_404("Only Clinic users can add specialties")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -1970,15 +2165,10 @@ class ClinicSpecialtiesAddListAPIView(APIView):
             clinic.save()
             return custom_201("Specialties added successfully", SpecialtySerializer(clinic.specialties.all(), many=True).data)
 
->>>>>>> 8c4c14b04225f36ed5634b20fa4755841e0dfe89
         return custom_404(serializer.errors)
 
 
 
-<<<<<<< HEAD
-
- 
-=======
 # edit specialties
     
 # delete clinic specialty
@@ -1991,7 +2181,7 @@ class ClinicSpecialtyDeleteAPIView(APIView):
             return custom_404("Only Clinic users can delete specialties")
 
         try:
-            clinic = Clinic.objects.get(user=request.user)
+            clinic = request.user.clinic_profile
         except Clinic.DoesNotExist:
             return custom_404("Clinic profile not found")
 
@@ -2018,9 +2208,13 @@ class MedicalReportAPIView(APIView):
             serializer = MedicalReportSerializer(report)
             return custom_200("Medical reports listed",serializer.data)
 
-        reports = MedicalReport.objects.all()
+        try:
+            reports, pagination = keyset_page(request, MedicalReport.objects.all(), ("-created_at", "-id"))
+        except InvalidCursor as e:
+            return custom_404(str(e))
+
         serializer = MedicalReportSerializer(reports, many=True)
-        return custom_200("Medical report listed",serializer.data)
+        return custom_200("Medical report listed",serializer.data, pagination=pagination)
 
     def post(self, request):
         """Add a new report"""
@@ -2076,7 +2270,12 @@ class PatientMedicalReportsAPIView(APIView):
         except Patient.DoesNotExist:
             return custom_404("Patient not found")
 
-        reports = MedicalReport.objects.filter(patient=patient)
+        try:
+            reports, pagination = keyset_page(
+                request, MedicalReport.objects.filter(patient=patient), ("-created_at", "-id")
+            )
+        except InvalidCursor as e:
+            return custom_404(str(e))
+
         serializer = MedicalReportSerializer(reports, many=True)
-        return custom_200("Medical reports fetched successfully", serializer.data)    
->>>>>>> 8c4c14b04225f36ed5634b20fa4755841e0dfe89
+        return custom_200("Medical reports fetched successfully", serializer.data, pagination=pagination)    
@@ -14,7 +14,6 @@ from pathlib import Path
 import os
 from datetime import timedelta
 import environ
-import stripe
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -63,6 +62,7 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 MIDDLEWARE = [
+    'superadmin_app.metrics.MetricsMiddleware',
       'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -107,33 +107,26 @@ DATABASES = {
     }
 }
 
+# Cache
+# per-process LocMemCache unless CACHE_URL points to a shared one (e.g.
+# redis://host:6379/1); caches that must agree across workers check this
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES':(
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication_app.authentication.ProfileJWTAuthentication',
             # "authentication_app.authentication.CookieJWTAuthentication",
     )
 }
 
 
-<<<<<<< HEAD
-# SMTP configs
-EMAIL_BACKEND = config('EMAIL_BACKEND')
-EMAIL_HOST = config('EMAIL_HOST')
-EMAIL_PORT = config('EMAIL_PORT', cast=int)
-EMAIL_USE_TLS = config('EMAIL_USE_TLS', cast=bool)
-EMAIL_HOST_USER = config('EMAIL_HOST_USER')
-EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
-DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL')
-
 # Stripe configs
-STRIPE_SECRET_KEY = config("STRIPE_SECRET_KEY")
-STRIPE_PUBLISHABLE_KEY = config("STRIPE_PUBLISHABLE_KEY")
-
-stripe.api_key = STRIPE_SECRET_KEY
-=======
-
->>>>>>> 8c4c14b04225f36ed5634b20fa4755841e0dfe89
+STRIPE_SECRET_KEY = env("STRIPE_SECRET_KEY")
+STRIPE_PUBLISHABLE_KEY = env("STRIPE_PUBLISHABLE_KEY")
+# the SDK itself is imported on first use (patient_app/payments.py)
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
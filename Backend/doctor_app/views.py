@@ -10,6 +10,9 @@ from django.shortcuts import get_object_or_404
 from superadmin_app.serializers import *
 from . serializers import *
 from clinical_panel_app.serializers import *
+from clinical_panel_app.counters import read_counters
+from superadmin_app.pagination import keyset_page
+from superadmin_app.search import PATIENT_SEARCH_LIMIT, PATIENT_SEARCH_MAX_LIMIT, search_patients
 from superadmin_app.utils import *
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Q
@@ -32,7 +35,7 @@ class DoctorProfileAPIView(APIView):
             if user.role != "Doctor":
                 return custom_404("You are not authorized to view this profile.")
 
-            doctor = get_object_or_404(Doctor, user=user)
+            doctor = user.doctor_profile
             serializer = DoctorProfileSerializer(doctor)
             return custom_200("Doctor profile retrieved successfully.", serializer.data)
         except Exception as e:
@@ -49,7 +52,7 @@ class DoctorProfileEditAPIView(APIView):
             if user.role != "Doctor":
                 return custom_404("You are not authorized to edit this profile.")
 
-            doctor = get_object_or_404(Doctor, user=user)
+            doctor = user.doctor_profile
             serializer = DoctorProfileSerializer(doctor, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
@@ -71,10 +74,14 @@ class DoctorAppointmentsListAPIView(APIView):
             if user.role != "Doctor":
                 return custom_404("You are not authorized to view these appointments.")
 
-            doctor = get_object_or_404(Doctor, user=user)
-            appointments = AppointmentBooking.objects.filter(doctor=doctor).order_by('-appointment_date', '-start_time')
+            doctor = user.doctor_profile
+            appointments, pagination = keyset_page(
+                request,
+                AppointmentBookingSerializer.setup_eager_loading(AppointmentBooking.objects.filter(doctor=doctor)),
+                ("-appointment_date", "-start_time", "-id"),
+            )
             serializer = AppointmentBookingSerializer(appointments, many=True)
-            return custom_200("Appointments retrieved successfully.", serializer.data)
+            return custom_200("Appointments retrieved successfully.", serializer.data, pagination=pagination)
         except Exception as e:
             return custom_404(str(e))
 
@@ -89,9 +96,11 @@ class TodaysDoctorAppointmentsListAPIView(APIView):
             if user.role != "Doctor":
                 return custom_404("You are not authorized to view these appointments.")
 
-            doctor = get_object_or_404(Doctor, user=user)
+            doctor = user.doctor_profile
             today = timezone.now().date()
-            appointments = AppointmentBooking.objects.filter(doctor=doctor, appointment_date=today).order_by('start_time')
+            appointments = AppointmentBookingSerializer.setup_eager_loading(
+                AppointmentBooking.objects.filter(doctor=doctor, appointment_date=today).order_by('start_time')
+            )
             serializer = AppointmentBookingSerializer(appointments, many=True)
             return custom_200("Today's appointments retrieved successfully.", serializer.data)
         except Exception as e:
@@ -126,7 +135,7 @@ class DoctorAppointmentsByDateAPIView(APIView):
             if user.role != "Doctor":
                 return custom_404("You are not authorized to view these appointments.")
 
-            doctor = get_object_or_404(Doctor, user=user)
+            doctor = user.doctor_profile
             appointments = AppointmentBooking.objects.filter(doctor=doctor, appointment_date=date).order_by('start_time')
             serializer = AppointmentBookingSerializer(appointments, many=True)
             return custom_200(f"Appointments for {date} retrieved successfully.", serializer.data)
@@ -145,7 +154,7 @@ class DoctorPatientsListAPIView(APIView):
             if user.role != "Doctor":
                 return custom_404("You are not authorized to view these patients.")
 
-            doctor = get_object_or_404(Doctor, user=user)
+            doctor = user.doctor_profile
             appointments = AppointmentBooking.objects.filter(doctor=doctor).select_related('patient').distinct('patient')
             patients = [appointment.patient for appointment in appointments]
             serializer = PatientRegisterSerializer(patients, many=True)
@@ -165,24 +174,23 @@ class DoctorPatientSearchAPIView(APIView):
             if user.role != "Doctor":
                 return custom_404("You are not authorized to search patients.")
 
-            doctor = get_object_or_404(Doctor, user=user)
+            doctor = user.doctor_profile
             query = request.query_params.get('query', '')
 
-            appointments = AppointmentBooking.objects.filter(
-                doctor=doctor,
-                patient__isnull=False
-            ).select_related('patient').distinct('patient')
+            try:
+                limit = min(int(request.query_params.get('limit', PATIENT_SEARCH_LIMIT)), PATIENT_SEARCH_MAX_LIMIT)
+            except ValueError:
+                return custom_404("limit must be an integer")
+            if limit <= 0:
+                return custom_404("limit must be a positive integer")
 
-            patients = [appointment.patient for appointment in appointments]
-
-            filtered_patients = [
-                patient for patient in patients
-                if query.lower() in patient.full_name.lower() or
-                   query.lower() in patient.user.email.lower() or
-                   query in patient.phone_number
-            ]
+            # patients the doctor has seen, filtered and ranked in SQL
+            patients = Patient.objects.filter(
+                id__in=AppointmentBooking.objects.filter(doctor=doctor).values('patient_id')
+            ).select_related('user')
+            patients = search_patients(patients, query)[:limit]
 
-            serializer = PatientRegisterSerializer(filtered_patients, many=True)
+            serializer = PatientRegisterSerializer(patients, many=True)
             return custom_200("Search results retrieved successfully.", serializer.data)
         except Exception as e:
             return custom_404(str(e))        
@@ -245,21 +253,18 @@ class DoctorDashboardStatsAPIView(APIView):
             if user.role != "Doctor":
                 return custom_404("You are not authorized to view these stats.")
 
-            doctor = get_object_or_404(Doctor, user=user)
+            doctor = user.doctor_profile
             today = timezone.now().date()
 
-            total_patients = AppointmentBooking.objects.filter(doctor=doctor).values('patient').distinct().count()
-            todays_appointments = AppointmentBooking.objects.filter(doctor=doctor, appointment_date=today).count()
-            todays_completed_appointments = AppointmentBooking.objects.filter(doctor=doctor, appointment_date=today, status="Completed").count()
-            waiting_list_appointments = AppointmentBooking.objects.filter(doctor=doctor, appointment_date=today, status="Waiting List").count()
-            todays_no_show_appointments = AppointmentBooking.objects.filter(doctor=doctor, appointment_date=today, status="No-Show").count()
+            # lifetime and today's counter rows, kept up to date by signals
+            lifetime, todays = read_counters(DoctorDailyStats, "doctor_id", doctor.id, today)
 
             data = {
-                "total_patients": total_patients,
-                "todays_appointments": todays_appointments,
-                "todays_completed_appointments": todays_completed_appointments,
-                "waiting_list_appointments": waiting_list_appointments,
-                "todays_no_show_appointments": todays_no_show_appointments
+                "total_patients": lifetime.patients,
+                "todays_appointments": todays.appointments,
+                "todays_completed_appointments": todays.completed,
+                "waiting_list_appointments": todays.waiting_list,
+                "todays_no_show_appointments": todays.no_show
             }
 
             return custom_200("Dashboard stats retrieved successfully.", data)
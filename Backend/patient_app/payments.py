@@ -0,0 +1,22 @@
+"""
+Lazily loaded Stripe SDK.
+
+Importing stripe costs more than a second and a sizeable chunk of memory,
+and only the payment endpoints need it, so it is imported and configured on
+first use instead of at worker start.
+"""
+from django.conf import settings
+
+
+_stripe = None
+
+
+def get_stripe():
+    """The stripe module, configured with STRIPE_SECRET_KEY."""
+    global _stripe
+    if _stripe is None:
+        import stripe
+
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        _stripe = stripe
+    return _stripe
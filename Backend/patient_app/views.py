@@ -1,22 +1,36 @@
-<<<<<<< HEAD
-from django.shortcuts import render
-# Create your views here.
-import stripe
 from django.shortcuts import render, redirect
+# Create your views here.
 from django.conf import settings
 from decimal import Decimal 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import *
+from superadmin_app.models import *
+from clinical_panel_app.models import *
+from superadmin_app. mixins import *
+import pyotp
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.shortcuts import get_object_or_404
+from superadmin_app.serializers import *
+from clinical_panel_app.serializers import *
+from . serializers import *
 from .serializers import PaymentSerializer
+from .models import *
+from superadmin_app.utils import *
+from superadmin_app.idempotency import idempotent
+from superadmin_app.pagination import InvalidCursor, keyset_page
+from rest_framework.permissions import IsAuthenticated
+from django.db.models import Q
+from datetime import datetime, timedelta
+import calendar
+from authentication_app.authentication import CookieJWTAuthentication
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
 from decouple import config
 
+from .payments import get_stripe
 
-
-stripe.api_key = settings.STRIPE_SECRET_KEY
 # print( '---------', settings.STRIPE_SECRET_KEY)
 
 # class CreatePaymentIntentAPI(APIView):
@@ -109,6 +123,7 @@ stripe.api_key = settings.STRIPE_SECRET_KEY
 
 
 class CreatePaymentIntentAPI(APIView):
+    @idempotent
     def post(self, request, *args, **kwargs):
         patient_id = request.data.get("patient_id")
         appointment_id = request.data.get("appointment_id")
@@ -156,6 +171,7 @@ class CreatePaymentIntentAPI(APIView):
 
         try:
             # Stripe PaymentIntent
+            stripe = get_stripe()
             intent = stripe.PaymentIntent.create(
                 amount=int(amount * 100),  # amount in paise
                 currency="inr",
@@ -187,6 +203,7 @@ def stripe_webhook(request):
     payload = request.body
     sig_header = request.META["HTTP_STRIPE_SIGNATURE"]
     endpoint_secret = config("STRIPE_WEBHOOK_SECRET")
+    stripe = get_stripe()
 
     try:
         event = stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
@@ -208,28 +225,8 @@ def stripe_webhook(request):
             payment.save()
 
     return JsonResponse({"status": "success"}, status=200)
-=======
 
-from superadmin_app.models import *
-from clinical_panel_app.models import *
-from rest_framework.views import APIView
-from rest_framework.response import Response
-from superadmin_app. mixins import *
-import pyotp
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.shortcuts import get_object_or_404
-from superadmin_app.serializers import *
-from . serializers import *
-from clinical_panel_app.serializers import *
-from superadmin_app.utils import *
-from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q
-from datetime import datetime, timedelta
-import calendar
-from authentication_app.authentication import CookieJWTAuthentication
-from django.utils import timezone
 
-# Create your views here.
 # get login patient profile
 class PatientProfileAPIView(APIView):
     # authentication_classes = [CookieJWTAuthentication]
@@ -237,7 +234,7 @@ class PatientProfileAPIView(APIView):
 
     def get(self, request):
         try:
-            patient = Patient.objects.get(user=request.user)
+            patient = request.user.patient_profile
             serializer = PatientProfileSerializer(patient)
             return custom_200("Patient profile fetched successfully", serializer.data)
         except Patient.DoesNotExist:
@@ -251,7 +248,7 @@ class PatientProfileEditAPIView(APIView):
 
     def patch(self, request):
         try:
-            patient = Patient.objects.get(user=request.user)
+            patient = request.user.patient_profile
             serializer = PatientProfileSerializer(patient, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
@@ -267,12 +264,18 @@ class PatientAppointmentsListAPIView(APIView):
 
     def get(self, request):
         try:
-            patient = Patient.objects.get(user=request.user)
-            appointments = AppointmentBooking.objects.filter(patient=patient).order_by('-appointment_date', '-start_time')
+            patient = request.user.patient_profile
+            appointments, pagination = keyset_page(
+                request,
+                AppointmentBookingSerializer.setup_eager_loading(AppointmentBooking.objects.filter(patient=patient)),
+                ("-appointment_date", "-start_time", "-id"),
+            )
             serializer = AppointmentBookingSerializer(appointments, many=True)
-            return custom_200("Patient appointments fetched successfully", serializer.data)
+            return custom_200("Patient appointments fetched successfully", serializer.data, pagination=pagination)
         except Patient.DoesNotExist:
             return custom_404("Patient profile not found")
+        except InvalidCursor as e:
+            return custom_404(str(e))
 
 
 # list appointments by date
@@ -283,8 +286,10 @@ class PatientAppointmentsByDateAPIView(APIView):
     def get(self, request, date):
         try:
 
-            patient = Patient.objects.get(user=request.user)
-            appointments = AppointmentBooking.objects.filter(patient=patient, appointment_date=date).order_by('start_time')
+            patient = request.user.patient_profile
+            appointments = AppointmentBookingSerializer.setup_eager_loading(
+                AppointmentBooking.objects.filter(patient=patient, appointment_date=date).order_by('start_time')
+            )
             serializer = AppointmentBookingSerializer(appointments, many=True)
             return custom_200(f"Patient appointments for {date} fetched successfully", serializer.data)
         except Patient.DoesNotExist:
@@ -298,7 +303,7 @@ class PatientAppointmentDetailAPIView(APIView):
 
     def get(self, request, appointment_id):
         try:
-            patient = Patient.objects.get(user=request.user)
+            patient = request.user.patient_profile
             appointment = get_object_or_404(AppointmentBooking, id=appointment_id, patient=patient)
             serializer = AppointmentBookingSerializer(appointment)
             return custom_200("Patient appointment details fetched successfully", serializer.data)
@@ -314,7 +319,7 @@ class PatientAppointmentsReportsHistoryAPIView(APIView):
         try:
             # Case 1: Logged-in patient
             if request.user.role == "Patient" and not patient_id:
-                patient = Patient.objects.get(user=request.user)
+                patient = request.user.patient_profile
 
             # Case 2: Pass patient_id (for clinic/admin usage)
             elif patient_id:
@@ -331,4 +336,3 @@ class PatientAppointmentsReportsHistoryAPIView(APIView):
 
         except Patient.DoesNotExist:
             return custom_404("Patient not found.")      
->>>>>>> 8c4c14b04225f36ed5634b20fa4755841e0dfe89
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SuperadminAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'superadmin_app'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,124 @@
+"""
+Idempotency-Key support for POST endpoints that must not run twice.
+
+Authenticated clients send an `Idempotency-Key` header (any unique string,
+e.g. a UUID) with a POST.  The key is claimed by inserting an IdempotencyKey
+row, unique per user, path and key, so every worker and process sees the
+same claim.  The first successful response is stored on that row for
+IDEMPOTENCY_KEY_TTL seconds; a retry with the same key gets the stored
+response back without running the view again (no DB writes, emails or
+Stripe calls).
+
+Keys are scoped by the authenticated user, which the client can't forge;
+anonymous requests carrying a key are rejected rather than sharing one
+namespace.  A user's expired keys are deleted when they claim a new one.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_KEY_TTL = getattr(settings, "IDEMPOTENCY_KEY_TTL", 24 * 60 * 60)
+
+# how long a key stays "in progress" if the first request dies half way
+IN_PROGRESS_TTL = 60
+
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field("key").max_length
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.method}:{request.path}:{body}".encode()).hexdigest()
+
+
+def _error(message, status_code):
+    return Response({"status": False, "message": message, "data": None}, status=status_code)
+
+
+def claim_key(user, path, key, fingerprint):
+    """
+    Claim a key for this request: returns (entry, None) when the view should
+    run, or (None, response) with the replayed or refused response.
+    """
+    now = timezone.now()
+    IdempotencyKey.objects.filter(user=user, created_at__lt=now - timedelta(seconds=IDEMPOTENCY_KEY_TTL)).delete()
+
+    try:
+        with transaction.atomic():
+            entry = IdempotencyKey.objects.create(
+                user=user, path=path, key=key, fingerprint=fingerprint, created_at=now,
+            )
+        return entry, None
+    except IntegrityError:
+        pass
+
+    stored = IdempotencyKey.objects.filter(user=user, path=path, key=key).first()
+    if stored is None:
+        # the first request failed and released the key just now
+        return None, _error("A request with this Idempotency-Key is still in progress", status.HTTP_409_CONFLICT)
+    if stored.fingerprint != fingerprint:
+        return None, _error(
+            "Idempotency-Key was already used with a different request",
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+
+    if stored.response_status is None:
+        if stored.created_at > now - timedelta(seconds=IN_PROGRESS_TTL):
+            return None, _error("A request with this Idempotency-Key is still in progress", status.HTTP_409_CONFLICT)
+        # the first request died half way; only one retry gets to take over
+        taken = IdempotencyKey.objects.filter(
+            pk=stored.pk, response_status__isnull=True, created_at=stored.created_at,
+        ).update(created_at=now)
+        if not taken:
+            return None, _error("A request with this Idempotency-Key is still in progress", status.HTTP_409_CONFLICT)
+        return stored, None
+
+    response = Response(stored.response_data, status=stored.response_status)
+    response["Idempotent-Replayed"] = "true"
+    return None, response
+
+
+def idempotent(view_method):
+    """Decorate an APIView handler so requests with an Idempotency-Key replay."""
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+
+        if not (request.user and request.user.is_authenticated):
+            return _error("Idempotency-Key requires an authenticated request", status.HTTP_400_BAD_REQUEST)
+        if len(key) > MAX_KEY_LENGTH:
+            return _error(f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters", status.HTTP_400_BAD_REQUEST)
+
+        entry, response = claim_key(request.user, request.path, key, _fingerprint(request))
+        if response is not None:
+            return response
+        # release the claim unless this request stores its response
+        pending = IdempotencyKey.objects.filter(pk=entry.pk, response_status__isnull=True)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            pending.delete()
+            raise
+
+        # only successful responses are replayed; failures may be retried
+        if 200 <= response.status_code < 300:
+            pending.update(response_status=response.status_code, response_data=response.data)
+        else:
+            pending.delete()
+        return response
+
+    return wrapper
@@ -0,0 +1,54 @@
+"""
+Startup import audit.
+
+Runs a fresh interpreter with `python -X importtime`, sets Django up and
+imports the URLconf (everything a worker loads before serving), and parses
+the per-module timings.  Used by `manage.py audit_imports` and by the budget
+test that keeps heavy optional SDKs out of worker start.
+"""
+import os
+import subprocess
+import sys
+from collections import namedtuple
+
+from django.conf import settings
+
+
+# SDKs only some endpoints need; they must be imported on first use
+LAZY_MODULES = ("stripe", "tkinter")
+
+# whole-startup import budget in milliseconds, generous enough for slow CI
+IMPORT_TIME_BUDGET_MS = getattr(settings, "IMPORT_TIME_BUDGET_MS", 3000)
+
+ModuleTime = namedtuple("ModuleTime", ["name", "self_us", "cumulative_us", "depth"])
+
+STARTUP_CODE = "import django; django.setup(); import {urlconf}"
+
+
+def measure_imports(urlconf=None):
+    """Timings of every module a fresh worker imports, in import order."""
+    code = STARTUP_CODE.format(urlconf=urlconf or settings.ROOT_URLCONF)
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "clinical_project.settings"))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # the column header
+        name = parts[2].rstrip()
+        stripped = name.lstrip()
+        modules.append(ModuleTime(
+            stripped, int(parts[0]), int(parts[1]), (len(name) - len(stripped) - 1) // 2,
+        ))
+    return modules
+
+
+def total_ms(modules):
+    """Wall time spent importing, from the top level entries."""
+    return sum(module.cumulative_us for module in modules if module.depth == 0) / 1000
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from superadmin_app.importtime import IMPORT_TIME_BUDGET_MS, LAZY_MODULES, measure_imports, total_ms
+
+
+class Command(BaseCommand):
+    help = "Measure what a fresh worker imports at startup (python -X importtime)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=20, help="how many of the slowest modules to list")
+        parser.add_argument("--repeat", type=int, default=3, help="runs to take the fastest of")
+
+    def handle(self, *args, **options):
+        runs = [measure_imports() for _ in range(options["repeat"])]
+        modules = min(runs, key=total_ms)
+
+        self.stdout.write(f"{len(modules)} modules, {total_ms(modules):.0f} ms (budget {IMPORT_TIME_BUDGET_MS} ms)")
+        self.stdout.write(f"{'cumulative ms':>14} {'self ms':>8}  module")
+        for module in sorted(modules, key=lambda module: -module.cumulative_us)[:options["top"]]:
+            self.stdout.write(f"{module.cumulative_us / 1000:14.1f} {module.self_us / 1000:8.1f}  {module.name}")
+
+        eager = sorted({module.name for module in modules if module.name.split(".")[0] in LAZY_MODULES})
+        if eager:
+            self.stdout.write(self.style.WARNING(f"Imported at startup but meant to be lazy: {', '.join(eager)}"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from superadmin_app.search import backfill_patient_search
+
+
+class Command(BaseCommand):
+    help = "Recompute the Patient search columns and name tokens (migrate fills new rows; run after bulk writes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = backfill_patient_search(batch_size=options["batch_size"])
+        self.stdout.write(f"Updated {updated} patient(s)")
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from superadmin_app.search import get_doctor_search
+
+
+class Command(BaseCommand):
+    help = "Make every process rebuild its doctor search index (after bulk writes to doctors or clinics)"
+
+    def handle(self, *args, **options):
+        backend = get_doctor_search()
+        backend.invalidate()
+        self.stdout.write(f"Invalidated {type(backend).__name__}")
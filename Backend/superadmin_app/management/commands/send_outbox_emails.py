@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from superadmin_app.outbox import OUTBOX_BATCH_SIZE, OUTBOX_RETENTION_DAYS, purge_outbox, send_pending
+
+
+# seconds between retention sweeps with --loop
+PURGE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = "Send queued outbox emails in batches (once, or continuously with --loop)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=OUTBOX_BATCH_SIZE)
+        parser.add_argument("--loop", action="store_true", help="keep polling for new messages")
+        parser.add_argument("--interval", type=float, default=2.0, help="seconds to sleep when the outbox is empty")
+        parser.add_argument(
+            "--retention-days", type=int, default=OUTBOX_RETENTION_DAYS,
+            help="delete sent and failed messages older than this",
+        )
+
+    def purge(self, retention_days):
+        deleted = purge_outbox(retention_days)
+        if deleted:
+            self.stdout.write(f"Purged {deleted} old email(s)")
+        return time.monotonic()
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        purged_at = self.purge(options["retention_days"])
+        while True:
+            sent, failed = send_pending(options["batch_size"])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f"Sent {sent} email(s), {failed} failed")
+            # a full batch means more may be waiting right away
+            if sent + failed < options["batch_size"]:
+                if not options["loop"]:
+                    break
+                if time.monotonic() - purged_at > PURGE_INTERVAL:
+                    purged_at = self.purge(options["retention_days"])
+                time.sleep(options["interval"])
+        self.stdout.write(f"Done: sent {total_sent} email(s), {total_failed} failed")
@@ -0,0 +1,196 @@
+"""
+Per-endpoint request metrics.
+
+MetricsMiddleware records, for every request and keyed by the resolved URL
+name and method: latency (as a histogram), the number of database queries
+and the time spent in them (through connection.execute_wrapper), and the
+response size.  A request running more queries than its budget
+(METRICS_QUERY_BUDGET, or METRICS_QUERY_BUDGETS[url_name]) is logged and
+counted, which is how N+1 regressions show up in production.
+
+Each thread writes only to its own shard, so recording takes no lock; the
+shards are summed when the metrics endpoint renders them in the Prometheus
+text format.  Figures are per process: scrape every worker.  The endpoint
+only answers scrapers sending `Authorization: Bearer <METRICS_TOKEN>`, and
+nobody while METRICS_TOKEN is unset.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+
+logger = logging.getLogger(__name__)
+
+# histogram bucket bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+QUERY_BUDGET = getattr(settings, "METRICS_QUERY_BUDGET", 20)
+QUERY_BUDGETS = getattr(settings, "METRICS_QUERY_BUDGETS", {})
+
+
+class EndpointStats:
+    __slots__ = ("requests", "buckets", "seconds", "queries", "query_seconds", "response_bytes", "over_budget")
+
+    def __init__(self):
+        self.requests = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.seconds = 0.0
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.response_bytes = 0
+        self.over_budget = 0
+
+    def merge(self, other):
+        self.requests += other.requests
+        self.buckets = [mine + theirs for mine, theirs in zip(self.buckets, other.buckets)]
+        self.seconds += other.seconds
+        self.queries += other.queries
+        self.query_seconds += other.query_seconds
+        self.response_bytes += other.response_bytes
+        self.over_budget += other.over_budget
+
+
+_local = threading.local()
+_shards = {}                            # thread -> its stats
+_retired = defaultdict(EndpointStats)   # stats of threads that have exited
+_shards_lock = threading.Lock()
+
+
+def fold_dead_shards():
+    """Move the stats of exited threads into _retired (hold _shards_lock)."""
+    for thread, stats in list(_shards.items()):
+        # a dead thread can't write any more, so its shard is final
+        if not thread.is_alive():
+            for key, endpoint in stats.items():
+                _retired[key].merge(endpoint)
+            del _shards[thread]
+
+
+def shard():
+    """This thread's {(view, method): EndpointStats}."""
+    stats = getattr(_local, "stats", None)
+    if stats is None:
+        stats = _local.stats = defaultdict(EndpointStats)
+        # once per thread; recording never takes the lock.  Servers starting
+        # a thread per connection would otherwise pile up shards forever
+        with _shards_lock:
+            fold_dead_shards()
+            _shards[threading.current_thread()] = stats
+    return stats
+
+
+def snapshot():
+    """Stats of every thread summed per (view, method)."""
+    totals = defaultdict(EndpointStats)
+    with _shards_lock:
+        fold_dead_shards()
+        shards = list(_shards.values())
+        for key, endpoint in _retired.items():
+            totals[key].merge(endpoint)
+    for stats in shards:
+        for key, endpoint in list(stats.items()):
+            totals[key].merge(endpoint)
+    return totals
+
+
+def reset():
+    with _shards_lock:
+        for stats in _shards.values():
+            stats.clear()
+        _retired.clear()
+
+
+class QueryCounter:
+    """execute_wrapper that counts queries and the time spent in them."""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.seconds += time.perf_counter() - start
+
+
+def query_budget(view):
+    return QUERY_BUDGETS.get(view, QUERY_BUDGET)
+
+
+def record(view, method, seconds, queries, query_seconds, response_bytes):
+    endpoint = shard()[(view, method)]
+    endpoint.requests += 1
+    for index, bound in enumerate(LATENCY_BUCKETS):
+        if seconds <= bound:
+            endpoint.buckets[index] += 1
+            break
+    endpoint.seconds += seconds
+    endpoint.queries += queries
+    endpoint.query_seconds += query_seconds
+    endpoint.response_bytes += response_bytes
+
+    budget = query_budget(view)
+    if budget is not None and queries > budget:
+        endpoint.over_budget += 1
+        logger.warning("%s %s ran %d queries (budget %d)", method, view, queries, budget)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        seconds = time.perf_counter() - start
+
+        match = getattr(request, "resolver_match", None)
+        view = (match.url_name or match.view_name) if match else "unmatched"
+        # streamed bodies (exports) have no known size
+        size = 0 if response.streaming else len(response.content)
+        record(view, request.method, seconds, counter.queries, counter.seconds, size)
+        return response
+
+
+def label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus():
+    """All endpoint stats in the Prometheus text exposition format."""
+    totals = snapshot()
+    lines = [
+        "# HELP http_request_duration_seconds Request latency by URL name.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (view, method), endpoint in sorted(totals.items()):
+        labels = f'view="{label(view)}",method="{label(method)}"'
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, endpoint.buckets):
+            cumulative += count
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {endpoint.requests}')
+        lines.append(f"http_request_duration_seconds_sum{{{labels}}} {endpoint.seconds}")
+        lines.append(f"http_request_duration_seconds_count{{{labels}}} {endpoint.requests}")
+
+    counters = (
+        ("http_request_db_queries_total", "Database queries run by requests.", "queries"),
+        ("http_request_db_query_seconds_total", "Time spent in database queries.", "query_seconds"),
+        ("http_response_bytes_total", "Response body bytes (streamed responses excluded).", "response_bytes"),
+        ("http_request_query_budget_exceeded_total", "Requests that ran more queries than their budget.", "over_budget"),
+    )
+    for name, help_text, field in counters:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for (view, method), endpoint in sorted(totals.items()):
+            lines.append(f'{name}{{view="{label(view)}",method="{label(method)}"}} {getattr(endpoint, field)}')
+    return "\n".join(lines) + "\n"
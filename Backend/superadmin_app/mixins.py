@@ -2,12 +2,16 @@ from rest_framework.response import Response
 from rest_framework import status
 
 
-def custom_200(message, data=None):
-    return Response({
+def custom_200(message, data=None, pagination=None):
+    body = {
         "status": True,
         "message": message,
         "data": data
-    }, status=status.HTTP_200_OK)
+    }
+    # list endpoints add the keyset pagination block, see pagination.py
+    if pagination is not None:
+        body["pagination"] = pagination
+    return Response(body, status=status.HTTP_200_OK)
 
 def custom_201(message, data=None):
     return Response({
@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
@@ -128,6 +129,27 @@ class Doctor(models.Model):
 
 
 #Patient Registration model
+def normalize_search_name(value):
+    """Lower case with runs of whitespace collapsed, as stored in Patient.search_name."""
+    return " ".join((value or "").casefold().split())
+
+
+def normalize_phone(value):
+    """Digits only, as stored in Patient.search_phone."""
+    return "".join(c for c in (value or "") if c.isdigit())
+
+
+def normalize_search_email(value):
+    """Lower case without surrounding whitespace, as stored in Patient.search_email."""
+    return (value or "").strip().casefold()
+
+
+def name_tokens(search_name):
+    """The name from each of its later words on: "anna maria smith" -> "maria smith", "smith"."""
+    words = search_name.split(" ")
+    return [" ".join(words[number:]) for number in range(1, len(words))]
+
+
 class Patient(models.Model):
     GENDER_CHOICES = [
         ('Male', 'Male'),
@@ -157,9 +179,71 @@ class Patient(models.Model):
     known_allergies = models.TextField(blank=True, help_text="Enter allergies separated by commas (e.g., Penicillin, Peanuts)")
     # known_allergies = models.JSONField(blank=True, help_text="Enter allergies separated by commas (e.g., Penicillin, Peanuts)")
 
+    # normalized copies of full_name, phone_number and the user's email for
+    # indexed prefix search, set in save(); the later words of the name are
+    # PatientSearchToken rows
+    search_name = models.CharField(max_length=255, blank=True, default="", editable=False)
+    search_phone = models.CharField(max_length=20, blank=True, default="", editable=False)
+    search_email = models.CharField(max_length=254, blank=True, default="", editable=False)
+
+    SEARCH_FIELDS = ("search_name", "search_phone", "search_email")
+
+    class Meta:
+        indexes = [
+            # varchar_pattern_ops lets PostgreSQL use the index for prefix LIKE
+            # queries; other backends ignore the opclass
+            models.Index(fields=["search_name"], name="patient_search_name_idx", opclasses=["varchar_pattern_ops"]),
+            models.Index(fields=["search_phone"], name="patient_search_phone_idx", opclasses=["varchar_pattern_ops"]),
+            models.Index(fields=["search_email"], name="patient_search_email_idx", opclasses=["varchar_pattern_ops"]),
+        ]
+
+    @staticmethod
+    def search_values(full_name, phone_number, email):
+        """
+        The SEARCH_FIELDS values for a name, phone and email.  bulk_create
+        skips save(): pass these and call index_patient_names() afterwards.
+        """
+        return {
+            "search_name": normalize_search_name(full_name),
+            "search_phone": normalize_phone(phone_number),
+            "search_email": normalize_search_email(email),
+        }
+
+    def save(self, *args, **kwargs):
+        for field, value in self.search_values(self.full_name, self.phone_number, self.user.email).items():
+            setattr(self, field, value)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, *self.SEARCH_FIELDS}
+        super().save(*args, **kwargs)
+        if update_fields is None or "full_name" in update_fields:
+            index_patient_names([self])
+
     def __str__(self):
         return f"{self.full_name} ({self.user.email})"    
-    
+
+
+class PatientSearchToken(models.Model):
+    """One later word of a patient's name onwards (see name_tokens), for word-start search."""
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name="search_tokens")
+    token = models.CharField(max_length=255)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["token"], name="patient_search_token_idx", opclasses=["varchar_pattern_ops"]),
+        ]
+
+
+def index_patient_names(patients):
+    """Rewrite the PatientSearchToken rows of saved patients from their search_name."""
+    patients = list(patients)
+    PatientSearchToken.objects.filter(patient__in=patients).delete()
+    PatientSearchToken.objects.bulk_create([
+        PatientSearchToken(patient=patient, token=token)
+        for patient in patients
+        for token in name_tokens(patient.search_name)
+    ], batch_size=1000)
+
 
 # notification model
 class Notification(models.Model):
@@ -171,3 +255,57 @@ class Notification(models.Model):
 
     def __str__(self):
         return f"Notification for {self.user.email} - {self.title}"
+
+
+# transactional email outbox, drained by `manage.py send_outbox_emails` (see outbox.py)
+class OutboxEmail(models.Model):
+    PENDING = "Pending"
+    SENT = "Sent"
+    FAILED = "Failed"
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField()
+    status = models.CharField(max_length=20, choices=[
+        (PENDING, "Pending"),
+        (SENT, "Sent"),
+        (FAILED, "Failed"),
+    ], default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(auto_now_add=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+
+
+# stored responses of requests sent with an Idempotency-Key (see idempotency.py)
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(ProfileUser, on_delete=models.CASCADE, related_name="idempotency_keys")
+    path = models.CharField(max_length=255)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    # both empty while the first request is still running
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_data = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "path", "key"], name="unique_idempotency_key"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.path})"
@@ -0,0 +1,138 @@
+"""
+Transactional email outbox.
+
+Request code calls queue_email() instead of send_mail(): that is one INSERT
+in the request's transaction, so a rolled back request never sends its mail
+and a slow SMTP server never holds up a response.
+
+`manage.py send_outbox_emails` drains the table.  Each batch is claimed by
+pushing its next_attempt_at past a lease (rows locked by another worker are
+skipped where the database supports it), then sent over one SMTP connection.
+A failed message is retried with exponential backoff and marked failed after
+OUTBOX_MAX_ATTEMPTS tries; a worker that dies mid batch leaves its rows to be
+picked up again once the lease runs out.
+
+Bodies carry generated passwords and OTPs, so they are blanked as soon as a
+message is sent or given up on, and purge_outbox() (run by the command)
+deletes finished rows after OUTBOX_RETENTION_DAYS.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+
+OUTBOX_BATCH_SIZE = getattr(settings, "OUTBOX_BATCH_SIZE", 100)
+OUTBOX_MAX_ATTEMPTS = getattr(settings, "OUTBOX_MAX_ATTEMPTS", 5)
+# seconds before the first retry, doubled for every further one
+OUTBOX_RETRY_DELAY = getattr(settings, "OUTBOX_RETRY_DELAY", 60)
+# seconds a claimed batch is reserved for its worker
+OUTBOX_LEASE = getattr(settings, "OUTBOX_LEASE", 300)
+# days sent and failed rows are kept for troubleshooting
+OUTBOX_RETENTION_DAYS = getattr(settings, "OUTBOX_RETENTION_DAYS", 7)
+
+
+def queue_email(subject, message, from_email, recipient_list):
+    """Same arguments as send_mail(); stores the message for the outbox worker."""
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(recipient_list),
+    )
+
+
+def queue_emails(messages):
+    """Store many (subject, message, from_email, recipient_list) tuples in one bulk insert."""
+    return OutboxEmail.objects.bulk_create([
+        OutboxEmail(
+            subject=subject,
+            body=message,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            to=list(recipient_list),
+        )
+        for subject, message, from_email, recipient_list in messages
+    ], batch_size=1000)
+
+
+def claim_batch(batch_size=OUTBOX_BATCH_SIZE):
+    """Reserve up to batch_size due messages for this worker."""
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxEmail.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        OutboxEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            next_attempt_at=now + timedelta(seconds=OUTBOX_LEASE), attempts=F("attempts") + 1,
+        )
+    for email in emails:
+        email.attempts += 1
+    return emails
+
+
+def retry_at(attempts, now):
+    return now + timedelta(seconds=OUTBOX_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def record_failure(email, error):
+    email.last_error = str(error)
+    if email.attempts >= OUTBOX_MAX_ATTEMPTS:
+        email.status = OutboxEmail.FAILED
+        email.body = ""
+    else:
+        email.next_attempt_at = retry_at(email.attempts, timezone.now())
+    email.save(update_fields=["status", "next_attempt_at", "last_error", "body"])
+
+
+def deliver(emails):
+    """Send claimed messages over one connection; returns (sent, failed) counts."""
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        # the server is unreachable: the whole batch waits for its retry
+        for email in emails:
+            record_failure(email, e)
+        return 0, len(emails)
+
+    sent, failed = [], 0
+    try:
+        for email in emails:
+            try:
+                EmailMessage(email.subject, email.body, email.from_email, email.to, connection=connection).send()
+            except Exception as e:
+                failed += 1
+                record_failure(email, e)
+            else:
+                sent.append(email.pk)
+    finally:
+        connection.close()
+
+    OutboxEmail.objects.filter(pk__in=sent).update(
+        status=OutboxEmail.SENT, sent_at=timezone.now(), last_error="", body="",
+    )
+    return len(sent), failed
+
+
+def send_pending(batch_size=OUTBOX_BATCH_SIZE):
+    """Claim and send one batch; returns (sent, failed) counts."""
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0, 0
+    return deliver(emails)
+
+
+def purge_outbox(retention_days=OUTBOX_RETENTION_DAYS):
+    """Delete sent and failed messages older than retention_days; returns the count."""
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    deleted, _ = OutboxEmail.objects.filter(
+        status__in=[OutboxEmail.SENT, OutboxEmail.FAILED], created_at__lt=cutoff,
+    ).delete()
+    return deleted
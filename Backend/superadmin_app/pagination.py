@@ -0,0 +1,98 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+Instead of OFFSET, every page continues right after the ordering key of the
+last row of the previous page, so each page is one range scan on an indexed
+ordering no matter how deep the client pages.  The ordering has to end in a
+unique column (normally id) so the key is never ambiguous.
+
+    rows, pagination = keyset_page(request, queryset, ("-appointment_date", "-start_time", "-id"))
+    return custom_200("...", Serializer(rows, many=True).data, pagination=pagination)
+
+Clients pass `page_size` and, for the following pages, the `next_cursor` of
+the previous response as `cursor`.  `next_cursor` is null on the last page.
+"""
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+PAGE_SIZE = getattr(settings, "KEYSET_PAGE_SIZE", 50)
+MAX_PAGE_SIZE = getattr(settings, "KEYSET_MAX_PAGE_SIZE", 200)
+
+
+class InvalidCursor(ValueError):
+    """The cursor or page_size query parameter can't be used."""
+
+
+def encode_cursor(values):
+    # dates, times and datetimes go out as their ISO strings, which the
+    # field lookups parse back
+    raw = json.dumps(values, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor, length):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, binascii.Error):
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursor("Invalid cursor")
+    return values
+
+
+def rows_after(ordering, values):
+    """Q matching the rows that sort after the given ordering key."""
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def get_page_size(request):
+    value = request.query_params.get("page_size")
+    if value is None:
+        return PAGE_SIZE
+    try:
+        page_size = int(value)
+    except ValueError:
+        raise InvalidCursor("page_size must be an integer")
+    if not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise InvalidCursor(f"page_size must be between 1 and {MAX_PAGE_SIZE}")
+    return page_size
+
+
+def keyset_page(request, queryset, ordering):
+    """
+    One page of `queryset` in `ordering` and the pagination block for the
+    response envelope.  Raises InvalidCursor for bad query parameters.
+    """
+    page_size = get_page_size(request)
+    queryset = queryset.order_by(*ordering)
+
+    cursor = request.query_params.get("cursor")
+    if cursor:
+        # a cursor can decode fine and still hold values of the wrong type
+        try:
+            queryset = queryset.filter(rows_after(ordering, decode_cursor(cursor, len(ordering))))
+        except (ValidationError, ValueError, TypeError):
+            raise InvalidCursor("Invalid cursor")
+
+    # one extra row tells whether there is a next page
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor([getattr(rows[-1], field.lstrip("-")) for field in ordering])
+    return rows, {"next_cursor": next_cursor, "page_size": page_size, "has_more": has_more}
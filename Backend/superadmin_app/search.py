@@ -0,0 +1,307 @@
+"""
+Database-side patient search and ranked doctor search.
+
+Patients: Patient.search_name, search_phone and search_email hold
+normalized copies of the name, phone number and the user's email (see
+Patient.save), and PatientSearchToken holds the name from each of its later
+words on.  Matching is a prefix LIKE on those columns, which their
+varchar_pattern_ops indexes serve, instead of loading patients into Python:
+a query matches the start of the name, of any word in it, of the phone
+number or of the email.  Results are ranked: exact name, name prefix,
+word prefix, phone prefix, then email.  Rows written before these columns
+existed are filled by backfill_patient_search() after migrate (signals.py).
+
+Doctors: DoctorSearchAPIView goes through a pluggable backend chosen by the
+DOCTOR_SEARCH_BACKEND setting ("auto", "postgres", "ngram" or a dotted path
+to a class).  Both backends cover doctor name, specialization, clinic name
+and bio, weighted in that order, and return ranked doctor ids.
+
+* PostgresDoctorSearch matches through the doctor_search_vector_idx GIN
+  index, which ensure_doctor_search_index() creates after migrate on
+  PostgreSQL only (signals.py), so Doctor's migrations are the same on
+  every backend.  It ranks the matches and falls back to trigram
+  similarity on the name for typos (needs the pg_trgm extension).
+* NgramDoctorSearch keeps an in-process trigram inverted index, built on
+  first use.  Before each search it compares a watermark of the doctor
+  table (doctor count and latest doctor / clinic updated_at, one aggregate
+  query) with the one it was built from and rebuilds when they differ, so
+  a doctor or clinic added, edited or deleted by any process shows up
+  everywhere without a shared cache.  Writes that leave updated_at alone
+  (queryset.update()) need `manage.py invalidate_doctor_search`, which
+  bumps a version number in the cache; like the signals (signals.py) that
+  bump it too, that only reaches other processes through a shared cache.
+
+"auto" picks the Postgres backend on PostgreSQL with pg_trgm installed and
+the n-gram index everywhere else.
+"""
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.db.models import Case, Count, F, IntegerField, Max, Q, Value, When
+from django.utils.module_loading import import_string
+
+from .models import (
+    Clinic, Doctor, Patient, PatientSearchToken, index_patient_names,
+    normalize_phone, normalize_search_email, normalize_search_name,
+)
+
+
+PATIENT_SEARCH_LIMIT = getattr(settings, "PATIENT_SEARCH_LIMIT", 20)
+PATIENT_SEARCH_MAX_LIMIT = getattr(settings, "PATIENT_SEARCH_MAX_LIMIT", 100)
+
+DOCTOR_SEARCH_LIMIT = getattr(settings, "DOCTOR_SEARCH_LIMIT", 20)
+DOCTOR_SEARCH_MAX_LIMIT = getattr(settings, "DOCTOR_SEARCH_MAX_LIMIT", 100)
+
+
+def search_patients(queryset, query):
+    """Filter and rank a Patient queryset by a free-text query."""
+    name = normalize_search_name(query)
+    if not name:
+        return queryset.order_by("search_name", "id")
+
+    later_words = Q(id__in=PatientSearchToken.objects.filter(token__startswith=name).values("patient_id"))
+    matches = (
+        Q(search_name__startswith=name) | later_words
+        | Q(search_email__startswith=normalize_search_email(query))
+    )
+    phone = normalize_phone(query)
+    if phone:
+        matches |= Q(search_phone__startswith=phone)
+
+    ranks = [
+        When(search_name=name, then=Value(0)),
+        When(search_name__startswith=name, then=Value(1)),
+        When(later_words, then=Value(2)),
+    ]
+    if phone:
+        ranks.append(When(search_phone__startswith=phone, then=Value(3)))
+    rank = Case(*ranks, default=Value(4), output_field=IntegerField())
+    return queryset.filter(matches).annotate(search_rank=rank).order_by("search_rank", "search_name", "id")
+
+
+def backfill_patient_search(batch_size=1000, missing_only=False):
+    """
+    Recompute the search columns and name tokens of patients, in batches;
+    returns how many.  missing_only limits it to rows never filled, which
+    every patient with an email is once saved.
+    """
+    patients = Patient.objects.select_related("user").only("id", "full_name", "phone_number", "user__email")
+    if missing_only:
+        patients = patients.filter(search_email="")
+    batch, updated = [], 0
+    for patient in patients.order_by("id").iterator(chunk_size=batch_size):
+        values = Patient.search_values(patient.full_name, patient.phone_number, patient.user.email)
+        for field, value in values.items():
+            setattr(patient, field, value)
+        batch.append(patient)
+        if len(batch) >= batch_size:
+            updated += _save_search_batch(batch)
+            batch = []
+    if batch:
+        updated += _save_search_batch(batch)
+    return updated
+
+
+def _save_search_batch(patients):
+    with transaction.atomic():
+        Patient.objects.bulk_update(patients, Patient.SEARCH_FIELDS)
+        index_patient_names(patients)
+    return len(patients)
+
+
+# doctor fields searched, with their weight
+DOCTOR_SEARCH_FIELDS = (
+    ("doctor_name", 3.0),
+    ("specialization", 2.0),
+    ("clinic__clinic_name", 1.0),
+    ("bio", 0.5),
+)
+
+
+# text search configuration of the doctor full-text index
+DOCTOR_SEARCH_CONFIG = getattr(settings, "DOCTOR_SEARCH_CONFIG", "english")
+
+DOCTOR_SEARCH_INDEX = "doctor_search_vector_idx"
+
+
+def doctor_search_vector():
+    """The weighted tsvector of a doctor's own text, as indexed on PostgreSQL."""
+    from django.contrib.postgres.search import SearchVector
+
+    return (
+        SearchVector("doctor_name", weight="A", config=DOCTOR_SEARCH_CONFIG)
+        + SearchVector("specialization", weight="B", config=DOCTOR_SEARCH_CONFIG)
+        + SearchVector("bio", weight="D", config=DOCTOR_SEARCH_CONFIG)
+    )
+
+
+def ensure_doctor_search_index(using="default"):
+    """Create the doctor full-text GIN index on PostgreSQL; returns whether it was created."""
+    database = connections[using]
+    if database.vendor != "postgresql":
+        return False
+    from django.contrib.postgres.indexes import GinIndex
+
+    with database.cursor() as cursor:
+        if DOCTOR_SEARCH_INDEX in database.introspection.get_constraints(cursor, Doctor._meta.db_table):
+            return False
+    with database.schema_editor() as editor:
+        editor.add_index(Doctor, GinIndex(doctor_search_vector(), name=DOCTOR_SEARCH_INDEX))
+    return True
+
+
+class PostgresDoctorSearch:
+    """Full-text rank plus trigram name similarity, computed by PostgreSQL."""
+
+    # name similarity below this only counts together with a full-text match
+    min_similarity = 0.3
+
+    def search(self, query, limit):
+        from django.contrib.postgres.search import (
+            SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity,
+        )
+
+        search_query = SearchQuery(query, search_type="websearch", config=DOCTOR_SEARCH_CONFIG)
+        similarity = TrigramWordSimilarity(query, "doctor_name")
+
+        # the doctor's own text matches through doctor_search_vector_idx (the
+        # same expression), the clinic name on the much smaller clinic table
+        clinics = Clinic.objects.annotate(
+            document=SearchVector("clinic_name", config=DOCTOR_SEARCH_CONFIG),
+        ).filter(document=search_query).values("id")
+        matches = Doctor.objects.annotate(document=doctor_search_vector()).filter(
+            Q(document=search_query) | Q(clinic__in=clinics)
+        )
+        vector = doctor_search_vector() + SearchVector("clinic__clinic_name", weight="C", config=DOCTOR_SEARCH_CONFIG)
+        ranked = list(
+            matches.annotate(rank=SearchRank(vector, search_query), similarity=similarity)
+            .order_by((F("rank") + F("similarity")).desc(), "id").values_list("id", flat=True)[:limit]
+        )
+
+        # typos: names are compared by similarity (a scan of the name column)
+        # only when full text didn't fill the page
+        if len(ranked) < limit:
+            ranked += list(
+                Doctor.objects.exclude(id__in=ranked).annotate(similarity=similarity)
+                .filter(similarity__gte=self.min_similarity)
+                .order_by("-similarity", "id").values_list("id", flat=True)[:limit - len(ranked)]
+            )
+        return ranked
+
+    # the database is the index, nothing to keep in sync
+    def invalidate(self):
+        pass
+
+
+def trigrams(text):
+    """Character trigrams of every word, padded so word starts and ends count."""
+    grams = set()
+    for word in normalize_search_name(text).split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NgramDoctorSearch:
+    """In-process trigram inverted index, for backends without full-text search."""
+
+    VERSION_KEY = "doctor-search-index-version"
+
+    # share of the query's trigrams a doctor must contain to match
+    min_match = 0.5
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.postings = defaultdict(dict)   # trigram -> {doctor_id: weight}
+        self.documents = {}                 # doctor_id -> (name, {trigram: weight})
+        self.state = None                   # (version, watermark) the index was built from
+
+    def document(self, values):
+        grams = {}
+        for (field, weight), text in zip(DOCTOR_SEARCH_FIELDS, values):
+            for gram in trigrams(text or ""):
+                grams[gram] = max(grams.get(gram, 0), weight)
+        return grams
+
+    def current_state(self):
+        watermark = Doctor.objects.aggregate(
+            count=Count("id"), doctors=Max("updated_at"), clinics=Max("clinic__updated_at"),
+        )
+        return cache.get_or_set(self.VERSION_KEY, 1, None), tuple(watermark.values())
+
+    def rebuild(self, state=None):
+        state = state or self.current_state()
+        postings = defaultdict(dict)
+        documents = {}
+        fields = [field for field, _ in DOCTOR_SEARCH_FIELDS]
+        for doctor_id, *values in Doctor.objects.values_list("id", *fields).iterator():
+            grams = self.document(values)
+            documents[doctor_id] = (normalize_search_name(values[0]), grams)
+            for gram, weight in grams.items():
+                postings[gram][doctor_id] = weight
+        with self.lock:
+            self.postings, self.documents, self.state = postings, documents, state
+
+    def invalidate(self):
+        """Rebuild here, and in every process sharing the cache, on the next search."""
+        try:
+            cache.incr(self.VERSION_KEY)
+        except ValueError:
+            cache.add(self.VERSION_KEY, 1, None)
+        self.state = None
+
+    def search(self, query, limit):
+        state = self.current_state()
+        if state != self.state:
+            self.rebuild(state)
+
+        grams = trigrams(query)
+        if not grams:
+            return []
+
+        scores = defaultdict(float)
+        matched = defaultdict(int)
+        needed = self.min_match * len(grams)
+        # other request threads may swap in a rebuilt index meanwhile
+        with self.lock:
+            postings, documents = self.postings, self.documents
+        for gram in grams:
+            for doctor_id, weight in postings.get(gram, {}).items():
+                scores[doctor_id] += weight
+                matched[doctor_id] += 1
+        ranked = sorted(
+            (doctor_id for doctor_id, count in matched.items() if count >= needed),
+            key=lambda doctor_id: (-scores[doctor_id], documents[doctor_id][0], doctor_id),
+        )
+        return ranked[:limit]
+
+
+DOCTOR_SEARCH_BACKENDS = {
+    "postgres": PostgresDoctorSearch,
+    "ngram": NgramDoctorSearch,
+}
+
+_doctor_search = None
+
+
+def pg_trgm_installed():
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def get_doctor_search():
+    """The configured doctor search backend (one instance per process)."""
+    global _doctor_search
+    if _doctor_search is None:
+        name = getattr(settings, "DOCTOR_SEARCH_BACKEND", "auto")
+        if name == "auto":
+            name = "postgres" if pg_trgm_installed() else "ngram"
+        backend = DOCTOR_SEARCH_BACKENDS.get(name) or import_string(name)
+        _doctor_search = backend()
+    return _doctor_search
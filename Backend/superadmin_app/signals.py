@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.db.models.signals import post_migrate, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Clinic, Doctor, Patient, ProfileUser, normalize_search_email
+from .search import backfill_patient_search, ensure_doctor_search_index, get_doctor_search
+
+
+# tell the doctor search index (search.py) about doctor and clinic changes,
+# once they are committed so rolled back saves never reach it
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+def doctor_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: get_doctor_search().invalidate())
+
+
+@receiver(post_save, sender=Clinic)
+def clinic_saved(sender, instance, created, **kwargs):
+    # a renamed clinic changes the indexed clinic name of all its doctors
+    if not created:
+        transaction.on_commit(lambda: get_doctor_search().invalidate())
+
+
+# Patient.search_email follows the user's email
+@receiver(post_save, sender=ProfileUser)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    if instance.role != "Patient" or (update_fields is not None and "email" not in update_fields):
+        return
+    email = normalize_search_email(instance.email)
+    Patient.objects.filter(user=instance).exclude(search_email=email).update(search_email=email)
+
+
+# the doctor full-text index (PostgreSQL only), and the patient search
+# columns of rows saved before they existed
+@receiver(post_migrate)
+def search_indexes_ready(sender, using="default", **kwargs):
+    if sender.name == "superadmin_app":
+        ensure_doctor_search_index(using)
+        backfill_patient_search(missing_only=True)
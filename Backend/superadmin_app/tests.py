@@ -1,3 +1,282 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.management.sql import emit_post_migrate_signal
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from .idempotency import idempotent
+from .importtime import IMPORT_TIME_BUDGET_MS, LAZY_MODULES, measure_imports, total_ms
+from . import metrics
+from .models import Clinic, Doctor, IdempotencyKey, OutboxEmail, Patient, PatientSearchToken, ProfileUser
+from .outbox import OUTBOX_MAX_ATTEMPTS, OUTBOX_RETENTION_DAYS, purge_outbox, queue_email, send_pending
+from .search import (
+    DOCTOR_SEARCH_INDEX, NgramDoctorSearch, backfill_patient_search, ensure_doctor_search_index, search_patients,
+)
+
+
+class OutboxTests(TestCase):
+    def test_queued_email_is_sent_by_the_worker(self):
+        queue_email("Subject", "Body", None, ["patient@example.com"])
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.assertEqual(send_pending(), (1, 0))
+        self.assertEqual(mail.outbox[0].to, ["patient@example.com"])
+        self.assertEqual(OutboxEmail.objects.get().status, OutboxEmail.SENT)
+        self.assertEqual(send_pending(), (0, 0))
+
+    def test_failed_email_backs_off_then_gives_up(self):
+        email = queue_email("Subject", "Body", None, ["patient@example.com"])
+        with mock.patch("superadmin_app.outbox.EmailMessage.send", side_effect=OSError("down")):
+            for attempt in range(1, OUTBOX_MAX_ATTEMPTS + 1):
+                self.assertEqual(send_pending(), (0, 1))
+                email.refresh_from_db()
+                self.assertEqual(email.attempts, attempt)
+                self.assertEqual(email.last_error, "down")
+                # not due again until its backoff has passed
+                self.assertEqual(send_pending(), (0, 0))
+                OutboxEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(email.status, OutboxEmail.FAILED)
+        self.assertEqual(email.body, "")
+        self.assertEqual(send_pending(), (0, 0))
+
+    def test_credentials_are_not_kept_after_sending(self):
+        email = queue_email("Credentials", "Password: s3cret!", None, ["doctor@example.com"])
+        send_pending()
+        self.assertIn("s3cret!", mail.outbox[0].body)
+        email.refresh_from_db()
+        self.assertNotIn("s3cret!", email.body)
+
+        # finished rows are purged after the retention period; pending ones stay
+        pending = queue_email("Subject", "Body", None, ["patient@example.com"])
+        old = timezone.now() - timedelta(days=OUTBOX_RETENTION_DAYS + 1)
+        OutboxEmail.objects.update(created_at=old)
+        self.assertEqual(purge_outbox(), 1)
+        self.assertEqual(list(OutboxEmail.objects.values_list("pk", flat=True)), [pending.pk])
+
+
+class CountingView(APIView):
+    calls = 0
+
+    @idempotent
+    def post(self, request):
+        CountingView.calls += 1
+        return Response({"call": CountingView.calls}, status=201)
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        CountingView.calls = 0
+        self.user = ProfileUser.objects.create_user(email="patient@example.com", password="x", role="Patient")
+
+    def post(self, data, key="key-1", user=None):
+        request = APIRequestFactory().post("/pay/", data, format="json", HTTP_IDEMPOTENCY_KEY=key)
+        if user is not None:
+            force_authenticate(request, user)
+        return CountingView.as_view()(request)
+
+    def test_retry_replays_the_first_response(self):
+        first = self.post({"amount": 10}, user=self.user)
+        second = self.post({"amount": 10}, user=self.user)
+        self.assertEqual((first.status_code, first.data), (201, {"call": 1}))
+        self.assertEqual((second.status_code, second.data), (201, {"call": 1}))
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+
+        # keys are per user
+        other = ProfileUser.objects.create_user(email="other@example.com", password="x", role="Patient")
+        self.assertEqual(self.post({"amount": 10}, user=other).data, {"call": 2})
+
+    def test_in_progress_key_conflicts(self):
+        self.post({"amount": 10}, user=self.user)
+        IdempotencyKey.objects.update(response_status=None, response_data=None, created_at=timezone.now())
+        self.assertEqual(self.post({"amount": 10}, user=self.user).status_code, 409)
+
+        # a claim abandoned longer than the in-progress window is taken over
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(self.post({"amount": 10}, user=self.user).data, {"call": 2})
+
+    def test_key_reused_with_another_body_is_rejected(self):
+        self.post({"amount": 10}, user=self.user)
+        self.assertEqual(self.post({"amount": 20}, user=self.user).status_code, 422)
+        self.assertEqual(CountingView.calls, 1)
+
+    def test_anonymous_requests_cannot_use_keys(self):
+        self.assertEqual(self.post({"amount": 10}).status_code, 400)
+        self.assertEqual(CountingView.calls, 0)
+
+
+class PatientSearchTests(TestCase):
+    def setUp(self):
+        for number, (name, phone) in enumerate([
+            ("Anna Smith", "98765 00001"),
+            ("Smith Jones", "9876500002"),
+            ("Annabel  Lee", "9123400003"),
+            ("Joanna Annan", "9000000004"),
+            ("Mary Ann Lopez", "9000000005"),
+        ]):
+            user = ProfileUser.objects.create(email=f"Patient{number}@Example.com", role="Patient")
+            Patient.objects.create(
+                user=user, full_name=name, age=30, gender="Female", phone_number=phone, blood_group="A+",
+                emergency_contact_name="x", emergency_contact_phone="1", address="x",
+            )
+
+    def names(self, query):
+        return list(search_patients(Patient.objects.all(), query).values_list("full_name", flat=True))
+
+    def tokens(self, patient):
+        return sorted(patient.search_tokens.values_list("token", flat=True))
+
+    def test_search_columns_are_normalized_on_save(self):
+        patient = Patient.objects.get(full_name="Annabel  Lee")
+        self.assertEqual(
+            (patient.search_name, patient.search_phone, patient.search_email),
+            ("annabel lee", "9123400003", "patient2@example.com"),
+        )
+        self.assertEqual(self.tokens(patient), ["lee"])
+
+        patient.full_name = "Annabel Marie Lee"
+        patient.save(update_fields=["full_name"])
+        self.assertEqual(self.tokens(patient), ["lee", "marie lee"])
+
+        patient.user.email = "annabel@example.com"
+        patient.user.save()
+        patient.refresh_from_db()
+        self.assertEqual(patient.search_email, "annabel@example.com")
+
+    def test_matches_are_index_friendly_prefixes(self):
+        # name start, then the start of any later word; "nna" inside a word is no match
+        self.assertEqual(self.names("anna"), ["Anna Smith", "Annabel  Lee", "Joanna Annan"])
+        self.assertEqual(self.names("ann"), ["Anna Smith", "Annabel  Lee", "Joanna Annan", "Mary Ann Lopez"])
+        self.assertEqual(self.names("SMITH"), ["Smith Jones", "Anna Smith"])
+        self.assertEqual(self.names("lopez"), ["Mary Ann Lopez"])
+        self.assertEqual(self.names("ann lo"), ["Mary Ann Lopez"])
+        self.assertEqual(self.names("nna"), [])
+        self.assertEqual(self.names("98765"), ["Anna Smith", "Smith Jones"])
+        self.assertEqual(self.names("PATIENT3@"), ["Joanna Annan"])
+
+        sql = str(search_patients(Patient.objects.all(), "anna").query)
+        self.assertNotIn("%anna%", sql)
+
+    def test_migrate_backfills_rows_saved_before_the_columns(self):
+        Patient.objects.update(search_name="", search_phone="", search_email="")
+        PatientSearchToken.objects.all().delete()
+        self.assertEqual(self.names("lopez"), [])
+
+        emit_post_migrate_signal(verbosity=0, interactive=False, db="default")
+        self.assertEqual(self.names("lopez"), ["Mary Ann Lopez"])
+        self.assertEqual(self.names("9123"), ["Annabel  Lee"])
+        # filled rows are left alone
+        self.assertEqual(backfill_patient_search(missing_only=True), 0)
+        self.assertEqual(backfill_patient_search(), 5)
+
+
+class NgramDoctorSearchTests(TestCase):
+    def setUp(self):
+        clinic_user = ProfileUser.objects.create(email="clinic@example.com", role="Clinic")
+        self.clinic = Clinic.objects.create(
+            user=clinic_user, clinic_name="Riverside", license_number="L-1",
+            location="x", address="x", phone="1", email="clinic@example.com",
+        )
+        self.doctor = self.add_doctor("Grey", "General")
+
+    def add_doctor(self, name, specialization):
+        user = ProfileUser.objects.create(email=f"{name.lower()}@example.com", role="Doctor")
+        return Doctor.objects.create(
+            user=user, doctor_name=name, specialization=specialization, clinic=self.clinic,
+            phone="1", email=f"{name.lower()}@example.com", additional_qualification=[],
+        )
+
+    def test_changes_from_another_process_show_up_without_a_shared_cache(self):
+        # a warm index in "another process": the on_commit signal hooks never
+        # run here and the cache version stays put, as with a per-process cache
+        other = NgramDoctorSearch()
+        self.assertEqual(other.search("cardiology", 10), [])
+        version = cache.get(NgramDoctorSearch.VERSION_KEY)
+
+        added = self.add_doctor("House", "Cardiology")
+        self.assertEqual(other.search("cardiology", 10), [added.id])
+
+        self.doctor.specialization = "Cardiology"
+        self.doctor.save()
+        self.assertEqual(sorted(other.search("cardiology", 10)), sorted([added.id, self.doctor.id]))
+
+        added.delete()
+        self.assertEqual(other.search("cardiology", 10), [self.doctor.id])
+
+        self.clinic.clinic_name = "Lakeside"
+        self.clinic.save()
+        self.assertEqual(other.search("lakeside", 10), [self.doctor.id])
+        self.assertEqual(cache.get(NgramDoctorSearch.VERSION_KEY), version)
+
+    def test_full_text_index_is_created_on_postgres_only(self):
+        # the model (and so its migrations) never depends on the backend
+        self.assertNotIn(DOCTOR_SEARCH_INDEX, [index.name for index in Doctor._meta.indexes])
+        self.assertFalse(ensure_doctor_search_index())
+
+    def test_unchanged_index_is_not_rebuilt(self):
+        search = NgramDoctorSearch()
+        search.search("grey", 10)
+        with mock.patch.object(search, "rebuild") as rebuild, self.assertNumQueries(1):
+            self.assertEqual(search.search("grey", 10), [self.doctor.id])
+        rebuild.assert_not_called()
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        user = ProfileUser.objects.create_user(email="clinic@example.com", password="x", role="Clinic")
+        Clinic.objects.create(
+            user=user, clinic_name="Clinic", license_number="L-1",
+            location="x", address="x", phone="1", email="clinic@example.com",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_requests_are_exposed_per_url_name(self):
+        with mock.patch.dict(metrics.QUERY_BUDGETS, {"list-all-doctors": 0}):
+            with self.assertLogs("superadmin_app.metrics", "WARNING"):
+                self.client.get(reverse("list-all-doctors"))
+
+        # closed without a configured token, and to a wrong token
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        with self.settings(METRICS_TOKEN="scrape"):
+            self.assertEqual(self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer nope").status_code, 403)
+            body = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer scrape").content.decode()
+        labels = 'view="list-all-doctors",method="GET"'
+        self.assertIn(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1', body)
+        self.assertIn(f"http_request_duration_seconds_count{{{labels}}} 1", body)
+        self.assertIn(f"http_request_query_budget_exceeded_total{{{labels}}} 1", body)
+        self.assertRegex(body, rf"http_request_db_queries_total{{{labels}}} [1-9]")
+        self.assertNotRegex(body, rf"http_response_bytes_total{{{labels}}} 0\n")
+
+
+    def test_exited_threads_fold_into_the_totals(self):
+        def serve():
+            metrics.record("list-all-doctors", "GET", 0.01, 2, 0.001, 100)
+
+        for _ in range(3):
+            thread = threading.Thread(target=serve)
+            thread.start()
+            thread.join()
+        stats = metrics.snapshot()[("list-all-doctors", "GET")]
+        self.assertEqual((stats.requests, stats.queries), (3, 6))
+        self.assertTrue(all(thread.is_alive() for thread in metrics._shards))
+
+
+class StartupImportTests(SimpleTestCase):
+    def test_worker_startup_stays_lean(self):
+        # best of a few runs, so a busy machine doesn't fail the budget
+        runs = [measure_imports() for _ in range(3)]
+        modules = min(runs, key=total_ms)
+
+        eager = {module.name for module in modules if module.name.split(".")[0] in LAZY_MODULES}
+        self.assertEqual(eager, set())
+        self.assertLess(total_ms(modules), IMPORT_TIME_BUDGET_MS)
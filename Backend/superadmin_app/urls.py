@@ -3,6 +3,7 @@ from . views import *
 
 urlpatterns = [
     path('register-clinic/', ClinicRegisterAPIView.as_view(), name='register-clinic'),
+    path('metrics/', metrics_view, name='metrics'),
    
     
 ]
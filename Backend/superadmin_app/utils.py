@@ -1,5 +1,5 @@
 import pyotp
-from django.core.mail import send_mail
+from .outbox import queue_email
 from django.conf import settings
 import random
 import string
@@ -22,7 +22,7 @@ def send_otp_via_email(email, otp):
     message = f"Your OTP is {otp}. It will expire in 10 minutes."
     from_email = settings.DEFAULT_FROM_EMAIL
     recipient_list = [email]
-    send_mail(subject, message, from_email, recipient_list)
+    queue_email(subject, message, from_email, recipient_list)
 
 
 
@@ -36,14 +36,17 @@ def generate_random_password(length=10):
 def send_password_email(email, password):
     subject = "Your Clinic Account Credentials"
     message = f"Your clinic account has been created.\n\nEmail: {email}\nPassword: {password}\n\nPlease login and change your password."
-    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [email])
+    queue_email(subject, message, settings.DEFAULT_FROM_EMAIL, [email])
 
 
 # send doctor credentials email
-def send_doctor_credentials_email(email, password, clinic_name):
+def doctor_credentials_email(email, password, clinic_name):
     subject = "Your Doctor Account Credentials"
     message = f"Your doctor account has been created under the clinic '{clinic_name}'.\n\nEmail: {email}\nPassword: {password}\n\nPlease login and change your password."
-    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [email])
+    return subject, message, settings.DEFAULT_FROM_EMAIL, [email]
+
+def send_doctor_credentials_email(email, password, clinic_name):
+    queue_email(*doctor_credentials_email(email, password, clinic_name))
 
 
 
@@ -81,21 +84,19 @@ def send_appointment_email(appointment):
     """
 
     # Send email to patient
-    send_mail(
+    queue_email(
         subject,
         patient_message,
         settings.DEFAULT_FROM_EMAIL,
         [appointment.patient.user.email],
-        fail_silently=False,
     )
 
     # Send email to doctor
-    send_mail(
+    queue_email(
         subject,
         doctor_message,
         settings.DEFAULT_FROM_EMAIL,
         [appointment.doctor.user.email],
-        fail_silently=False,
     )
 
 
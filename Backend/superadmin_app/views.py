@@ -7,6 +7,10 @@ from .utils import *
 from .serializers import *
 from rest_framework.permissions import IsAuthenticated
 from django.db import IntegrityError
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from .metrics import render_prometheus
 # Create your views here.
 
 
@@ -37,4 +41,12 @@ class ClinicRegisterAPIView(APIView):
                 "role": clinic.user.role
             })
 
-        return custom_404(serializer.errors)
\ No newline at end of file
+        return custom_404(serializer.errors)
+
+# Prometheus scrape endpoint for the request metrics (metrics.py); closed
+# unless METRICS_TOKEN is set, since it lists every route and its traffic
+def metrics_view(request):
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if not token or not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse(status=403)
+    return HttpResponse(render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")